@@ -0,0 +1,66 @@
+'''
+Measure how concurrent chunks speed up multi-item DynamoDB work.
+
+Things are written, read and deleted through common.util.aioddb against an
+in-memory client that adds --latency-ms to every request, standing in for the
+round trip to DynamoDB. The wall time at each --concurrency is compared with
+the first, one chunk at a time by default.
+
+usage: python benchmarks/batch_concurrency.py [--items N] [--latency-ms MS] [--concurrency N ...]
+'''
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+from common.test.aws.ddb import LatencyDynamoDBClient  # noqa: E402
+from common.util.aioddb import AsyncDdbTable, run  # noqa: E402
+from common.util.ddb import DdbTable  # noqa: E402
+
+
+def measure(table: AsyncDdbTable, items: List[Dict[str, Any]], keys: List[Dict[str, Any]]) -> Dict[str, float]:
+    '''Return the ms taken to put, get and delete items'''
+    times = {}
+    for (name, coro) in (
+        ('put', lambda: table.put_many(items)),
+        ('get', lambda: table.get_many(keys)),
+        ('delete', lambda: table.delete_many(keys)),
+    ):
+        start = time.perf_counter()
+        run(coro())
+        times[name] = (time.perf_counter() - start) * 1000
+    return times
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark concurrent batch operations')
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=20, help='added to every request')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 2, 5, 10])
+    args = parser.parse_args(argv)
+
+    items = [{'pk': 'Thing#{}'.format(i), 'sk': 'Thing#{}'.format(i), 'id': str(i)} for i in range(args.items)]
+    keys = [{'pk': item['pk'], 'sk': item['sk']} for item in items]
+    table = DdbTable('benchmark', LatencyDynamoDBClient(latency=args.latency_ms / 1000))
+
+    print('{} items, {}ms per request'.format(args.items, args.latency_ms))
+    print('{:>11} {:>10} {:>10} {:>10} {:>8}'.format('concurrency', 'put ms', 'get ms', 'delete ms', 'speedup'))
+    baseline: Optional[float] = None
+    for concurrency in args.concurrency:
+        times = measure(AsyncDdbTable(table, max_concurrency=concurrency), items, keys)
+        total = sum(times.values())
+        baseline = baseline or total
+        print('{:>11} {:>10.1f} {:>10.1f} {:>10.1f} {:>7.1f}x'.format(
+            concurrency, times['put'], times['get'], times['delete'], baseline / total
+        ))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
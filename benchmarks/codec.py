@@ -0,0 +1,68 @@
+'''
+Compare the AttributeValue codec against boto3's TypeSerializer/TypeDeserializer.
+
+A representative Thing item, optionally padded with extra attributes, is
+encoded and decoded --iterations times with each implementation and the
+per-item cost is reported.
+
+usage: python benchmarks/codec.py [--iterations N] [--attributes N]
+'''
+
+import argparse
+import os
+import sys
+import timeit
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer  # noqa: E402
+
+from common.util.codec import decode_item, encode_item  # noqa: E402
+
+
+def make_item(attributes: int) -> Dict[str, Any]:
+    '''Return a Thing item with the given number of extra attributes'''
+    item: Dict[str, Any] = {
+        'pk': 'thing#0b7c7f2a6f1b4d0f9c1c4a8f5f0d7e21',
+        'sk': 'thing#0b7c7f2a6f1b4d0f9c1c4a8f5f0d7e21',
+        'id': '0b7c7f2a6f1b4d0f9c1c4a8f5f0d7e21',
+        'version': 3,
+        'tags': ['red', 'green', 'blue'],
+        'attrs': {'weight': 12, 'enabled': True, 'owner': 'someone'},
+    }
+    for i in range(attributes):
+        item['attr_{}'.format(i)] = 'value {}'.format(i) if i % 2 else i
+    return item
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark the DDB AttributeValue codec')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--attributes', type=int, default=10, help='Extra attributes per item')
+    args = parser.parse_args(argv)
+
+    item = make_item(args.attributes)
+    serializer = TypeSerializer()
+    deserializer = TypeDeserializer()
+    # boto3 rejects floats so it is given the Decimal form the resource layer uses
+    boto3_item = {k: Decimal(v) if isinstance(v, float) else v for (k, v) in item.items()}
+    encoded = encode_item(item)
+
+    cases = {
+        'boto3 serialize': lambda: {k: serializer.serialize(v) for (k, v) in boto3_item.items()},
+        'codec encode_item': lambda: encode_item(item),
+        'boto3 deserialize': lambda: {k: deserializer.deserialize(v) for (k, v) in encoded.items()},
+        'codec decode_item': lambda: decode_item(encoded),
+    }
+    for name, fn in cases.items():
+        seconds = min(timeit.repeat(fn, number=args.iterations, repeat=3))
+        print('{:<20} {:8.2f} us/item'.format(name, seconds / args.iterations * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+'''
+Compare cold starts of the per-route and single function API layouts.
+
+Mixed traffic is simulated as Poisson arrivals spread across the routes by
+--mix weights. Each function keeps a pool of containers: a request is served
+by an idle warm container when there is one and starts a new, cold, container
+otherwise. Containers are reclaimed after --idle-timeout-s without a request.
+The same arrivals are replayed against one pool per route and against a single
+pool shared by every route.
+
+With --measure-init the median time to import each handler, and the router
+plus the route it first serves, in a fresh interpreter is measured and used to
+estimate the total time spent in cold starts.
+
+usage: python benchmarks/coldstart.py [--rps RPS] [--hours H] [--idle-timeout-s S] [--measure-init] [--json FILE]
+'''
+
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Share of requests per route handler
+DEFAULT_MIX = {
+    'GetThingItem': 60,
+    'ListThingItems': 15,
+    'UpsertThingItem': 10,
+    'CreateThingItem': 8,
+    'PatchThingItem': 4,
+    'DeleteThingItem': 2,
+    'BatchGetThingItems': 0.5,
+    'BatchCreateThingItems': 0.5,
+}
+
+
+@dataclass
+class Pool:
+    '''Containers of one function'''
+    # Time each container finishes its current or last request
+    free_at: List[float] = field(default_factory=list)
+    cold_starts: int = 0
+
+
+@dataclass
+class Result:
+    '''Cold starts of one layout'''
+    layout: str
+    requests: int
+    cold_starts: int
+    cold_start_rate: float
+    cold_starts_by_route: Dict[str, int]
+    init_ms: Optional[float] = None
+
+
+def serve(pool: Pool, now: float, duration: float, idle_timeout: float) -> bool:
+    '''Serve a request arriving at now from pool and return whether it was a cold start'''
+    # Containers idle for longer than the timeout have been reclaimed
+    pool.free_at = [free_at for free_at in pool.free_at if now - free_at <= idle_timeout]
+
+    idle = [i for (i, free_at) in enumerate(pool.free_at) if free_at <= now]
+    if idle:
+        # The most recently used container is reused, as Lambda tends to
+        index = max(idle, key=lambda i: pool.free_at[i])
+        cold = False
+    else:
+        pool.free_at.append(now)
+        index = len(pool.free_at) - 1
+        pool.cold_starts += 1
+        cold = True
+
+    pool.free_at[index] = now + duration
+    return cold
+
+
+def arrivals(mix: Dict[str, float], rps: float, seconds: float, seed: int) -> List[Tuple[float, str]]:
+    '''Return (time, route) arrivals of Poisson traffic split across routes by mix'''
+    rng = random.Random(seed)
+    total = sum(mix.values())
+    streams = []
+    for (route, weight) in mix.items():
+        rate = rps * weight / total
+        if rate <= 0:
+            continue
+        times = []
+        now = rng.expovariate(rate)
+        while now < seconds:
+            times.append((now, route))
+            now += rng.expovariate(rate)
+        streams.append(times)
+    return list(heapq.merge(*streams))
+
+
+def simulate(
+    traffic: List[Tuple[float, str]],
+    single: bool,
+    duration: float,
+    idle_timeout: float
+) -> Result:
+    '''Replay traffic against the per-route or single function layout'''
+    pools: Dict[str, Pool] = {}
+    cold_by_route: Dict[str, int] = {}
+    for (now, route) in traffic:
+        pool = pools.setdefault('ThingApi' if single else route, Pool())
+        if serve(pool, now, duration, idle_timeout):
+            cold_by_route[route] = cold_by_route.get(route, 0) + 1
+
+    requests = len(traffic)
+    cold_starts = sum(pool.cold_starts for pool in pools.values())
+    return Result(
+        layout='single' if single else 'per-route',
+        requests=requests,
+        cold_starts=cold_starts,
+        cold_start_rate=cold_starts / requests if requests else 0.0,
+        cold_starts_by_route=dict(sorted(cold_by_route.items()))
+    )
+
+
+def import_ms(statement: str, runs: int) -> float:
+    '''Return the median wall time in ms to run statement in a fresh interpreter, less interpreter startup'''
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join([os.path.join(ROOT, 'src', 'common'), ROOT]),
+        'DDB_TABLE_NAME': os.environ.get('DDB_TABLE_NAME', 'benchmark'),
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+    }
+
+    def run(code: str) -> float:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True)
+        return (time.perf_counter() - start) * 1000
+
+    baseline = statistics.median(run('pass') for _ in range(runs))
+    return statistics.median(run(statement) for _ in range(runs)) - baseline
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Compare cold starts of the per-route and single function layouts')
+    parser.add_argument('--rps', type=float, default=0.2, help='mean requests per second across all routes')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--duration-ms', type=float, default=50, help='warm request duration')
+    parser.add_argument('--idle-timeout-s', type=float, default=600, help='idle time before a container is reclaimed')
+    parser.add_argument('--mix', type=json.loads, default=DEFAULT_MIX, help='JSON object of route weights')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--measure-init', action='store_true', help='measure handler import time')
+    parser.add_argument('--runs', type=int, default=5, help='import time runs with --measure-init')
+    parser.add_argument('--json', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    traffic = arrivals(args.mix, args.rps, args.hours * 3600, args.seed)
+    results = [
+        simulate(traffic, single, args.duration_ms / 1000, args.idle_timeout_s)
+        for single in (False, True)
+    ]
+
+    if args.measure_init:
+        per_route = {
+            route: import_ms('import src.handlers.{}.function'.format(route), args.runs)
+            for route in args.mix
+        }
+        # The router imports a route handler on its first request to that route
+        router = import_ms(
+            'import src.handlers.ThingApi.function as fn; fn._load_handler("GetThingItem")',
+            args.runs
+        )
+        results[0].init_ms = sum(
+            per_route[route] * count for (route, count) in results[0].cold_starts_by_route.items()
+        )
+        results[1].init_ms = router * results[1].cold_starts
+
+    print('{} requests over {}h at {} rps, idle timeout {}s'.format(
+        len(traffic), args.hours, args.rps, args.idle_timeout_s
+    ))
+    print('{:>10}  {:>11} {:>8}  {:>12}'.format('layout', 'cold starts', 'rate', 'init time s'))
+    for result in results:
+        print('{:>10}  {:>11} {:>7.2%}  {:>12}'.format(
+            result.layout,
+            result.cold_starts,
+            result.cold_start_rate,
+            '{:.1f}'.format(result.init_ms / 1000) if result.init_ms is not None else '-'
+        ))
+
+    print()
+    print('{:>22}  {:>9} {:>6}'.format('route', 'per-route', 'single'))
+    for route in args.mix:
+        print('{:>22}  {:>9} {:>6}'.format(
+            route,
+            results[0].cold_starts_by_route.get(route, 0),
+            results[1].cold_starts_by_route.get(route, 0)
+        ))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
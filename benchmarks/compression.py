@@ -0,0 +1,111 @@
+'''
+Show the size and latency tradeoff of compressing large Thing payloads.
+
+For each payload size a Thing with a free-form attribute bag of roughly that
+size is converted to a DDB item with and without compression. The item size,
+the write and read capacity units a single access consumes and the time spent
+packing and unpacking the item are reported.
+
+usage: python benchmarks/compression.py [--sizes BYTES ...] [--iterations N] [--level N]
+'''
+
+import argparse
+import math
+import os
+import random
+import sys
+import timeit
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+from common.model import thing  # noqa: E402
+from common.model.thing import ThingItem  # noqa: E402
+
+WORDS = (
+    'thing widget sensor reading status active pending region owner label '
+    'description value metric created updated enabled primary secondary'
+).split()
+
+
+def make_extra(size: int, seed: int = 0) -> Dict[str, Any]:
+    '''Return a free-form attribute bag of roughly size bytes'''
+    rng = random.Random(seed)
+    extra: Dict[str, Any] = {}
+    index = 0
+    while sum(len(k) + len(str(v)) for (k, v) in extra.items()) < size:
+        if index % 3:
+            extra['attr_{}'.format(index)] = ' '.join(rng.choice(WORDS) for _ in range(12))
+        else:
+            extra['attr_{}'.format(index)] = rng.randint(0, 10 ** 6)
+        index += 1
+    return extra
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    '''Approximate DDB item size: attribute names plus values'''
+    size = 0
+    for (name, value) in item.items():
+        size += len(name.encode('utf-8'))
+        if isinstance(value, bytes):
+            size += len(value)
+        else:
+            size += len(str(value).encode('utf-8'))
+    return size
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark Thing payload compression')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[512, 2048, 8192, 32768, 131072])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--level', type=int, default=thing.COMPRESSION_LEVEL, help='zlib level')
+    args = parser.parse_args(argv)
+
+    thing.COMPRESSION_LEVEL = args.level
+
+    print(
+        '{:>8}  {:>9} {:>9} {:>6}  {:>5} {:>5}  {:>5} {:>5}  {:>10} {:>10}  {:>10} {:>10}'.format(
+            'payload', 'plain B', 'packed B', 'ratio', 'WCU', 'WCU z', 'RCU', 'RCU z',
+            'write us', 'write z', 'read us', 'read z'
+        )
+    )
+    for size in args.sizes:
+        item = ThingItem('thing#1234', 'thing#1234', '1234', etag='0' * 32, extra=make_extra(size))
+        plain = item.to_item(compression_threshold=0)
+        packed = item.to_item(compression_threshold=1)
+
+        timings = {}
+        for (name, fn) in {
+            'write': lambda: item.to_item(compression_threshold=0),
+            'write z': lambda: item.to_item(compression_threshold=1),
+            'read': lambda: ThingItem.from_item(plain),
+            'read z': lambda: ThingItem.from_item(packed),
+        }.items():
+            seconds = min(timeit.repeat(fn, number=args.iterations, repeat=3))
+            timings[name] = seconds / args.iterations * 1e6
+
+        plain_size = item_size(plain)
+        packed_size = item_size(packed)
+        print(
+            '{:>8}  {:>9} {:>9} {:>6.2f}  {:>5} {:>5}  {:>5} {:>5}  {:>10.1f} {:>10.1f}  {:>10.1f} {:>10.1f}'.format(
+                size,
+                plain_size,
+                packed_size,
+                packed_size / plain_size,
+                math.ceil(plain_size / 1024),
+                math.ceil(packed_size / 1024),
+                math.ceil(plain_size / 4096),
+                math.ceil(packed_size / 4096),
+                timings['write'],
+                timings['write z'],
+                timings['read'],
+                timings['read z'],
+            )
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
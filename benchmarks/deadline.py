@@ -0,0 +1,104 @@
+'''
+Measure how request deadlines bound the time spent on a stalled DynamoDB.
+
+A local endpoint answers every request after --stall-ms. GetItem is called
+through the shared client settings from common.util.aws, once with only the
+client's own timeouts and retries and once under with_deadline for a
+--timeout-ms function. A call still running at --timeout-ms would have been
+killed by Lambda with no response; the billed time is capped there.
+
+usage: python benchmarks/deadline.py [--timeout-ms MS] [--stall-ms MS ...]
+'''
+
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('POWERTOOLS_LOG_LEVEL', 'ERROR')
+
+from common.test.aws import create_lambda_function_context  # noqa: E402
+from common.util.aws import create_dynamodb_client  # noqa: E402
+from common.util.ddb import DdbTable  # noqa: E402
+from common.util.deadline import with_deadline  # noqa: E402
+
+
+class StalledDynamoDB(BaseHTTPRequestHandler):
+    '''Answers every request with an empty item after the server's stall'''
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.stall)  # type: ignore[attr-defined]
+        body = b'{}'
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-amz-json-1.0')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def call(table: DdbTable, deadline: bool, timeout_ms: int) -> Tuple[float, str]:
+    '''Return the ms taken by one GetItem and how it ended'''
+    def get(event: Any, context: Any) -> Any:
+        table.get_item(Key={'pk': 'Thing#1', 'sk': 'Thing#1'})
+        return None
+
+    handler = with_deadline(get) if deadline else get
+    context = create_lambda_function_context('Benchmark', remaining_time_in_millis=timeout_ms)
+    start = time.perf_counter()
+    try:
+        output = handler({}, context)
+        outcome = '503' if output is not None else '200'
+    except Exception as e:
+        outcome = type(e).__name__
+    elapsed = (time.perf_counter() - start) * 1000
+    if elapsed > timeout_ms:
+        outcome = 'killed'
+    return (elapsed, outcome)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark deadline aware DynamoDB calls')
+    parser.add_argument('--timeout-ms', type=int, default=5000, help='function timeout')
+    parser.add_argument('--stall-ms', type=int, nargs='*', default=[20, 2000, 10000])
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StalledDynamoDB)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    table = DdbTable('benchmark', create_dynamodb_client(endpoint_url=endpoint_url))
+
+    print('{}ms function timeout'.format(args.timeout_ms))
+    print('{:>9} {:>9} {:>10} {:>10} {:>18}'.format('stall ms', 'deadline', 'ms', 'billed ms', 'outcome'))
+    for stall_ms in args.stall_ms:
+        server.stall = stall_ms / 1000  # type: ignore[attr-defined]
+        for deadline in (False, True):
+            (elapsed, outcome) = call(table, deadline, args.timeout_ms)
+            print('{:>9} {:>9} {:>10.0f} {:>10.0f} {:>18}'.format(
+                stall_ms, 'yes' if deadline else 'no', elapsed, min(elapsed, args.timeout_ms), outcome
+            ))
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
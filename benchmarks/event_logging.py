@@ -0,0 +1,126 @@
+'''
+Measure the per-request cost of logging handler events and outputs.
+
+"before" is the previous policy: the raw event logged at INFO and the output
+converted with asdict() on every request whether it is emitted or not.
+"after" is common.util.log at several --sample-rates, the fraction of requests
+Powertools runs at DEBUG. Records are written to os.devnull, so the times are
+the CPU cost of building and serializing them.
+
+Every handler's fixture event and a Thing body of --body-bytes are used.
+
+usage: python benchmarks/event_logging.py [--iterations N] [--body-bytes BYTES] [--sample-rates RATE ...]
+'''
+
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+from aws_lambda_powertools.logging import Logger  # noqa: E402
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent  # noqa: E402
+
+from common.util.log import log_event, log_output  # noqa: E402
+from common.util.serialization import dumps  # noqa: E402
+
+
+@dataclass
+class Output:
+    '''Handler output'''
+    statusCode: int
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def load_events(body_bytes: int) -> List[APIGatewayProxyEvent]:
+    '''Return the fixture event of every handler with a body of roughly body_bytes'''
+    body = dumps({'name': 'thing', 'description': 'x' * body_bytes})
+    events = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'data', 'handlers', '*', 'event.json'))):
+        with open(path) as f:
+            raw_event = json.load(f)
+        if raw_event.get('body') is not None:
+            raw_event['body'] = body
+        events.append(APIGatewayProxyEvent(raw_event))
+    return events
+
+
+def make_logger(name: str) -> Logger:
+    '''Return a Logger writing to os.devnull'''
+    return Logger(service=name, logger_handler=logging.StreamHandler(open(os.devnull, 'w')), utc=True)
+
+
+def before(logger: Logger, event: APIGatewayProxyEvent, output: Output) -> None:
+    '''Log the way handlers did before common.util.log'''
+    logger.info('Event', extra={"message_object": event.raw_event})
+    logger.debug('Output', extra={"message_object": asdict(output)})
+
+
+def after(logger: Logger, event: APIGatewayProxyEvent, output: Output) -> None:
+    '''Log through common.util.log'''
+    log_event(logger, event)
+    log_output(logger, output)
+
+
+def run(
+    log: Callable[[Logger, APIGatewayProxyEvent, Output], None],
+    logger: Logger,
+    events: List[APIGatewayProxyEvent],
+    output: Output,
+    iterations: int,
+    sample_rate: float,
+    seed: int
+) -> float:
+    '''Return the mean us per request of log, with DEBUG enabled for a sample_rate fraction of requests'''
+    rng = random.Random(seed)
+    elapsed = 0.0
+    for i in range(iterations):
+        # Powertools picks the level per invocation, outside the handler
+        logger.setLevel(logging.DEBUG if rng.random() < sample_rate else logging.INFO)
+        event = events[i % len(events)]
+        start = time.perf_counter()
+        log(logger, event, output)
+        elapsed += time.perf_counter() - start
+    return elapsed / iterations * 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark per-request event and output logging')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--body-bytes', type=int, default=4096, help='request and response body size')
+    parser.add_argument('--sample-rates', type=float, nargs='*', default=[0.0, 0.01, 0.1, 1.0])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    events = load_events(args.body_bytes)
+    output = Output(
+        statusCode=200,
+        body={'id': 'a' * 36, 'name': 'thing', 'description': 'x' * args.body_bytes},
+        headers={'ETag': '"{}"'.format('0' * 32)}
+    )
+    logger = make_logger('event-logging-benchmark')
+
+    print('{} events, {} byte bodies, {} iterations'.format(len(events), args.body_bytes, args.iterations))
+    print('{:>8} {:>12} {:>12}'.format('policy', 'sample rate', 'us/request'))
+    print('{:>8} {:>12} {:>12.2f}'.format(
+        'before', '-', run(before, logger, events, output, args.iterations, 0.0, args.seed)
+    ))
+    for rate in args.sample_rates:
+        print('{:>8} {:>12} {:>12.2f}'.format(
+            'after', rate, run(after, logger, events, output, args.iterations, rate, args.seed)
+        ))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
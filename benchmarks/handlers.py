@@ -0,0 +1,399 @@
+'''
+Benchmark every handler end to end against a local DynamoDB.
+
+Each handler in src/handlers/*/function.py is invoked with its fixture event
+from data/handlers/*/event.json, given a random id and body on every call.
+Things the handlers read, replace or delete are seeded beforehand, outside
+the timed call. The table is moto's in-process DynamoDB unless --endpoint-url
+points at DynamoDB Local.
+
+For every handler the p50/p95/p99 and mean latency and the throughput are
+reported, along with the mean time per call spent in each phase:
+
+* parse: API Gateway event data class construction and JSON request body decoding
+* model: ThingData and ThingItem conversions
+* ddb: DdbTable calls, including attribute encoding and decoding
+* serialize: response body encoding and compression
+* other: everything else, such as validation, logging and decorators
+
+Time in a phase nested inside another is counted once, in the outer phase.
+Results can be written to a JSON file with --output. --baseline compares them
+with an earlier results file and exits non-zero when a latency percentile or
+the throughput regressed by more than --tolerance.
+
+usage: python benchmarks/handlers.py [--iterations N] [--output FILE] [--baseline FILE] [--tolerance F] [HANDLER ...]
+'''
+
+import argparse
+import copy
+import functools
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+sys.path.insert(0, ROOT)
+
+HANDLERS_DIR = os.path.join(ROOT, 'src', 'handlers')
+DATA_DIR = os.path.join(ROOT, 'data', 'handlers')
+TABLE_NAME = 'benchmark'
+PHASES = ('parse', 'model', 'ddb', 'serialize', 'other')
+WORDS = (
+    'thing widget sensor reading status active pending region owner label '
+    'description value metric created updated enabled primary secondary'
+).split()
+
+# Handlers log every event at INFO, which would dominate the measurements
+os.environ.setdefault('POWERTOOLS_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('DDB_TABLE_NAME', TABLE_NAME)
+os.environ.setdefault('CURSOR_SIGNING_KEY', 'benchmark')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from common.model.thing import (  # noqa: E402
+    COLLECTION_INDEX_NAME,
+    ThingData,
+    ThingItem,
+    create_keys,
+    get_id_from_keys
+)
+from common.test.aws import create_lambda_function_context  # noqa: E402
+from common.util.aws import create_dynamodb_client  # noqa: E402
+from common.util.ddb import DdbTable  # noqa: E402
+
+
+@dataclass
+class PhaseTimer:
+    '''Accumulates the time spent in each phase of a call'''
+    totals: Dict[str, float] = field(default_factory=dict)
+    current: Optional[str] = None
+
+    def wrap(self, phase: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        '''Return fn timed as phase when not already inside a phase'''
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if self.current is not None:
+                return fn(*args, **kwargs)
+            self.current = phase
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.totals[phase] = self.totals.get(phase, 0.0) + time.perf_counter() - start
+                self.current = None
+        return wrapper
+
+    def patch(self, phase: str, owner: Any, name: str) -> None:
+        '''Replace owner.name with a timed wrapper, keeping classmethods and staticmethods intact'''
+        attr = inspect.getattr_static(owner, name)
+        if isinstance(attr, classmethod):
+            setattr(owner, name, classmethod(self.wrap(phase, attr.__func__)))
+        elif isinstance(attr, staticmethod):
+            setattr(owner, name, staticmethod(self.wrap(phase, attr.__func__)))
+        else:
+            setattr(owner, name, self.wrap(phase, attr))
+
+    def reset(self) -> None:
+        '''Clear the accumulated times'''
+        self.totals = {}
+        self.current = None
+
+
+@dataclass
+class Result:
+    '''Measurements of one handler'''
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput_rps: float
+    phases_ms: Dict[str, float]
+
+
+def install_timers(timer: PhaseTimer, modules: List[ModuleType]) -> None:
+    '''Time the phases of every handler call'''
+    from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+    import common.util.dataclasses
+
+    timer.patch('parse', APIGatewayProxyEvent, '__init__')
+    timer.patch('parse', json, 'loads')
+    for name in ('from_dict',):
+        timer.patch('model', ThingData, name)
+    for name in ('from_data', 'from_item', 'to_item', 'to_pointer', 'to_public'):
+        timer.patch('model', ThingItem, name)
+    for name in ('get_item', 'put_item', 'update_item', 'delete_item', 'query', 'scan', 'batch_write_item', 'batch_get_item'):
+        timer.patch('ddb', DdbTable, name)
+    for name in ('to_response', 'compress_response'):
+        timer.patch('serialize', common.util.dataclasses, name)
+    for module in modules:
+        if hasattr(module, 'dumps'):
+            timer.patch('serialize', module, 'dumps')
+
+
+def create_table(table: DdbTable) -> None:
+    '''Create the Thing table with its collection index'''
+    table.client.create_table(
+        TableName=table.name,
+        KeySchema=[
+            {'AttributeName': 'pk', 'KeyType': 'HASH'},
+            {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'pk', 'AttributeType': 'S'},
+            {'AttributeName': 'sk', 'AttributeType': 'S'},
+            {'AttributeName': 'collection', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': COLLECTION_INDEX_NAME,
+                'KeySchema': [
+                    {'AttributeName': 'collection', 'KeyType': 'HASH'},
+                    {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+
+class Workload:
+    '''Builds randomized events for every handler and seeds the Things they need'''
+
+    def __init__(self, table: DdbTable, things: int, batch_size: int, seed: int) -> None:
+        self.table = table
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.ids = [self.put_thing() for _ in range(things)]
+
+    def random_extra(self) -> Dict[str, Any]:
+        '''Return random Thing attributes'''
+        return {
+            'name': ' '.join(self.rng.choice(WORDS) for _ in range(3)),
+            'status': self.rng.choice(WORDS),
+            'value': self.rng.randint(0, 10 ** 6),
+            'tags': self.rng.sample(WORDS, 3),
+        }
+
+    def put_thing(self) -> str:
+        '''Write a random Thing to the table and return its id'''
+        keys = create_keys()
+        _id = get_id_from_keys(keys)
+        item = ThingItem.from_data(keys, ThingData(_id, self.random_extra()))
+        self.table.put_item(Item=item.to_item())
+        return _id
+
+    def event(self, handler: str, fixture: Dict[str, Any]) -> Dict[str, Any]:
+        '''Return a randomized event for handler from its fixture event'''
+        event = copy.deepcopy(fixture)
+        event['requestContext']['requestId'] = str(uuid.uuid4())
+        build: Callable[[Dict[str, Any]], None] = getattr(self, '_' + handler, lambda e: None)
+        build(event)
+        return event
+
+    def _CreateThingItem(self, event: Dict[str, Any]) -> None:
+        event['body'] = json.dumps(self.random_extra())
+
+    def _GetThingItem(self, event: Dict[str, Any]) -> None:
+        event['pathParameters'] = {'id': self.rng.choice(self.ids)}
+
+    def _UpsertThingItem(self, event: Dict[str, Any]) -> None:
+        _id = self.rng.choice(self.ids)
+        event['pathParameters'] = {'id': _id}
+        event['body'] = json.dumps({'id': _id, **self.random_extra()})
+
+    def _PatchThingItem(self, event: Dict[str, Any]) -> None:
+        event['pathParameters'] = {'id': self.rng.choice(self.ids)}
+        event['body'] = json.dumps({'status': self.rng.choice(WORDS), 'value': self.rng.randint(0, 10 ** 6)})
+
+    def _DeleteThingItem(self, event: Dict[str, Any]) -> None:
+        event['pathParameters'] = {'id': self.put_thing()}
+
+    def _ListThingItems(self, event: Dict[str, Any]) -> None:
+        event['queryStringParameters'] = {'limit': str(self.batch_size)}
+        event['multiValueQueryStringParameters'] = {'limit': [str(self.batch_size)]}
+
+    def _BatchGetThingItems(self, event: Dict[str, Any]) -> None:
+        event['body'] = json.dumps({'ids': self.rng.sample(self.ids, min(self.batch_size, len(self.ids)))})
+
+    def _BatchCreateThingItems(self, event: Dict[str, Any]) -> None:
+        event['body'] = json.dumps({'items': [self.random_extra() for _ in range(self.batch_size)]})
+
+
+def discover_handlers() -> List[str]:
+    '''Return the names of all handlers with a fixture event'''
+    return sorted(
+        name for name in os.listdir(HANDLERS_DIR)
+        if os.path.isfile(os.path.join(HANDLERS_DIR, name, 'function.py'))
+        and os.path.isfile(os.path.join(DATA_DIR, name, 'event.json'))
+    )
+
+
+def percentile(samples: List[float], p: int) -> float:
+    '''Return the p-th percentile of samples'''
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[p - 1]
+
+
+def measure(
+    name: str,
+    module: ModuleType,
+    workload: Workload,
+    timer: PhaseTimer,
+    iterations: int,
+    warmup: int
+) -> Result:
+    '''Invoke a handler iterations times and return its measurements'''
+    with open(os.path.join(DATA_DIR, name, 'event.json')) as f:
+        fixture = json.load(f)
+    context = create_lambda_function_context(name)
+
+    latencies: List[float] = []
+    phases = {phase: 0.0 for phase in PHASES}
+    for index in range(warmup + iterations):
+        event = workload.event(name, fixture)
+        timer.reset()
+        start = time.perf_counter()
+        response = module.handler(event, context)
+        elapsed = time.perf_counter() - start
+        if response.get('statusCode', 500) >= 400:
+            raise RuntimeError('{} returned {}: {}'.format(name, response.get('statusCode'), response.get('body')))
+        if index < warmup:
+            continue
+
+        latencies.append(elapsed)
+        for (phase, seconds) in timer.totals.items():
+            phases[phase] += seconds
+        phases['other'] += elapsed - sum(timer.totals.values())
+
+    return Result(
+        iterations=iterations,
+        p50_ms=percentile(latencies, 50) * 1000,
+        p95_ms=percentile(latencies, 95) * 1000,
+        p99_ms=percentile(latencies, 99) * 1000,
+        mean_ms=statistics.fmean(latencies) * 1000,
+        throughput_rps=iterations / sum(latencies),
+        phases_ms={phase: seconds / iterations * 1000 for (phase, seconds) in phases.items()}
+    )
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    '''Return a description of every regression of results against baseline'''
+    regressions = []
+    for (name, result) in results['handlers'].items():
+        base = baseline.get('handlers', {}).get(name)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append('{} {}: {:.3f} -> {:.3f} (+{:.0%})'.format(
+                    name, metric, base[metric], result[metric], result[metric] / base[metric] - 1
+                ))
+        if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append('{} throughput_rps: {:.1f} -> {:.1f} ({:.0%})'.format(
+                name, base['throughput_rps'], result['throughput_rps'],
+                result['throughput_rps'] / base['throughput_rps'] - 1
+            ))
+    return regressions
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    '''Benchmark the selected handlers and return the results'''
+    import importlib
+
+    names = args.handlers or discover_handlers()
+    modules = {name: importlib.import_module('src.handlers.{}.function'.format(name)) for name in names}
+
+    table = DdbTable(TABLE_NAME, create_dynamodb_client(endpoint_url=args.endpoint_url))
+    if args.endpoint_url is None or args.create_table:
+        create_table(table)
+    for module in modules.values():
+        module.DDB_TABLE = table
+    workload = Workload(table, args.things, args.batch_size, args.seed)
+
+    timer = PhaseTimer()
+    install_timers(timer, list(modules.values()))
+
+    results = {}
+    for (name, module) in modules.items():
+        results[name] = asdict(measure(name, module, workload, timer, args.iterations, args.warmup))
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'things': args.things,
+            'batch_size': args.batch_size,
+            'dynamodb': args.endpoint_url or 'moto',
+        },
+        'handlers': results
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark handlers against a local DynamoDB')
+    parser.add_argument('handlers', nargs='*', help='handlers to run, all by default')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--things', type=int, default=500, help='Things seeded before the run')
+    parser.add_argument('--batch-size', type=int, default=25, help='Things per list page and batch request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--endpoint-url', help='DynamoDB Local endpoint, moto is used when not given')
+    parser.add_argument('--create-table', action='store_true', help='create the table at --endpoint-url')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+
+    if args.endpoint_url is None:
+        from moto import mock_aws
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+        with mock_aws():
+            results = run(args)
+    else:
+        results = run(args)
+
+    print('{:>22}  {:>8} {:>8} {:>8} {:>8}  {:>8}  {}'.format(
+        'handler', 'p50 ms', 'p95 ms', 'p99 ms', 'mean ms', 'req/s', '  '.join('{:>9}'.format(p) for p in PHASES)
+    ))
+    for (name, result) in results['handlers'].items():
+        print('{:>22}  {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}  {:>8.1f}  {}'.format(
+            name,
+            result['p50_ms'],
+            result['p95_ms'],
+            result['p99_ms'],
+            result['mean_ms'],
+            result['throughput_rps'],
+            '  '.join('{:>9.3f}'.format(result['phases_ms'][p]) for p in PHASES)
+        ))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION {}'.format(regression))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+'''
+Report the cold import cost of every handler using `python -X importtime`.
+
+Each handler module is imported in a fresh interpreter --runs times and the
+median cumulative import time is reported along with the heaviest modules it
+pulled in. --max-ms turns the report into a guard: the script exits non-zero
+if any handler's median import time exceeds the budget.
+
+usage: python benchmarks/importtime.py [--runs N] [--top N] [--max-ms MS] [--json FILE] [HANDLER ...]
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HANDLERS_DIR = os.path.join(ROOT, 'src', 'handlers')
+
+
+def discover_handlers() -> List[str]:
+    '''Return the names of all handler packages'''
+    return sorted(
+        name for name in os.listdir(HANDLERS_DIR)
+        if os.path.isfile(os.path.join(HANDLERS_DIR, name, 'function.py'))
+    )
+
+
+def import_once(statement: str) -> Dict[str, int]:
+    '''Run statement in a fresh interpreter and return cumulative import time per module in us'''
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.pathsep.join([os.path.join(ROOT, 'src', 'common'), ROOT]),
+        'DDB_TABLE_NAME': os.environ.get('DDB_TABLE_NAME', 'benchmark'),
+        'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+    }
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    cumulative: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _self, cumul, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        cumulative[name] = int(cumul)
+    return cumulative
+
+
+def measure(handler: str, runs: int, startup_modules: Set[str]) -> Tuple[float, List[Tuple[str, float]]]:
+    '''Return the median import time in ms and the median cost of each module it imports'''
+    module = 'src.handlers.{}.function'.format(handler)
+    samples = [import_once('import {}'.format(module)) for _ in range(runs)]
+    total = statistics.median(sample[module] for sample in samples) / 1000
+
+    # Modules the interpreter loads before running any code are not the handler's cost.
+    modules = set().union(*samples) - startup_modules
+    per_module = [
+        (name, statistics.median(sample.get(name, 0) for sample in samples) / 1000)
+        for name in modules if name != module and not name.startswith('src.')
+    ]
+    per_module.sort(key=lambda entry: entry[1], reverse=True)
+    return total, per_module
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Measure handler import time')
+    parser.add_argument('handlers', nargs='*', help='Handlers to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreter imports per handler')
+    parser.add_argument('--top', type=int, default=10, help='Heaviest modules to list per handler')
+    parser.add_argument('--max-ms', type=float, default=None, help='Fail if any handler exceeds this budget')
+    parser.add_argument('--json', dest='json_file', default=None, help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    startup_modules = set(import_once('pass'))
+    results = {}
+    over_budget = []
+    for handler in args.handlers or discover_handlers():
+        total, per_module = measure(handler, args.runs, startup_modules)
+        results[handler] = {
+            'import_ms': total,
+            'top_modules': [{'module': name, 'cumulative_ms': ms} for (name, ms) in per_module[:args.top]]
+        }
+
+        print('{:<24} {:8.1f} ms'.format(handler, total))
+        for name, ms in per_module[:args.top]:
+            print('    {:<56} {:8.1f} ms'.format(name, ms))
+
+        if args.max_ms is not None and total > args.max_ms:
+            over_budget.append(handler)
+
+    if args.json_file:
+        with open(args.json_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if over_budget:
+        print('Over {} ms budget: {}'.format(args.max_ms, ', '.join(over_budget)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+'''
+Find the response size above which compressing a body pays for itself.
+
+For each body size a JSON body of Things is compressed with every supported
+coding. The CPU time is scaled to the share of a vCPU Lambda gives a function
+of --memory-mb, 1 vCPU at 1769MB, and compared with the transfer time the
+smaller body saves at --bandwidth-mbps. The smallest size where the saving is
+larger than the cost is reported as the break-even threshold for each coding.
+
+usage: python benchmarks/response_compression.py [--sizes BYTES ...] [--memory-mb MB] [--bandwidth-mbps MBPS]
+'''
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from typing import Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src', 'common'))
+
+from common.util import encoding  # noqa: E402
+from common.util.serialization import dumps  # noqa: E402
+
+LAMBDA_FULL_VCPU_MB = 1769
+WORDS = (
+    'thing widget sensor reading status active pending region owner label '
+    'description value metric created updated enabled primary secondary'
+).split()
+
+
+def make_body(size: int, seed: int = 0) -> str:
+    '''Return an encoded list of Things of roughly size bytes'''
+    rng = random.Random(seed)
+    things: List[Dict[str, object]] = []
+    while len(dumps(things)) < size:
+        things.append({
+            'id': '{:08x}-0000-0000-0000-{:012x}'.format(rng.getrandbits(32), rng.getrandbits(48)),
+            'name': ' '.join(rng.choice(WORDS) for _ in range(3)),
+            'status': rng.choice(WORDS),
+            'value': rng.randint(0, 10 ** 6),
+        })
+    return dumps(things)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Benchmark response compression')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[256, 512, 1024, 2048, 4096, 16384, 65536, 262144])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--memory-mb', type=int, default=128, help='Lambda function memory size')
+    parser.add_argument('--bandwidth-mbps', type=float, default=10.0, help='client downlink bandwidth')
+    args = parser.parse_args(argv)
+
+    cpu_scale = max(LAMBDA_FULL_VCPU_MB / args.memory_mb, 1.0)
+    bytes_per_us = args.bandwidth_mbps * 1e6 / 8 / 1e6
+
+    print(
+        'memory {}MB (x{:.1f} CPU time), bandwidth {}Mbps, gzip level {}, brotli quality {}{}'.format(
+            args.memory_mb, cpu_scale, args.bandwidth_mbps, encoding.GZIP_LEVEL, encoding.BROTLI_QUALITY,
+            '' if 'br' in encoding.SUPPORTED_ENCODINGS else ' (brotli not installed)'
+        )
+    )
+    print('{:>8}  {:>6}  {:>9} {:>6}  {:>11} {:>11}  {:>6}'.format(
+        'body B', 'coding', 'coded B', 'ratio', 'lambda us', 'saved us', 'pays'
+    ))
+
+    break_even: Dict[str, Optional[int]] = {coding: None for coding in encoding.SUPPORTED_ENCODINGS}
+    for size in args.sizes:
+        data = make_body(size).encode('utf-8')
+        for coding in encoding.SUPPORTED_ENCODINGS:
+            coded = encoding.compress(data, coding)
+            seconds = min(timeit.repeat(lambda: encoding.compress(data, coding), number=args.iterations, repeat=3))
+            cost_us = seconds / args.iterations * 1e6 * cpu_scale
+            saved_us = (len(data) - len(coded)) / bytes_per_us
+            pays = saved_us > cost_us
+            if pays and break_even[coding] is None:
+                break_even[coding] = len(data)
+            elif not pays:
+                break_even[coding] = None
+            print('{:>8}  {:>6}  {:>9} {:>6.2f}  {:>11.1f} {:>11.1f}  {:>6}'.format(
+                len(data), coding, len(coded), len(coded) / len(data), cost_us, saved_us, 'yes' if pays else 'no'
+            ))
+
+    for (coding, size) in break_even.items():
+        print('{} break-even: {}'.format(coding, '{} bytes'.format(size) if size is not None else 'none in range'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
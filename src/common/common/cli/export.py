@@ -0,0 +1,158 @@
+'''
+Export every Thing in the table as gzip compressed NDJSON.
+
+The table is read with a parallel Scan: each of TotalSegments segments is
+scanned by its own worker thread and streamed a page at a time into its own
+part file, so memory use is bounded by the page size rather than the table
+size. A manifest describing the part files is written once all segments
+finish.
+
+usage: python -m common.cli.export --table-name TABLE --output-dir DIR
+           [--segments N] [--workers N] [--page-size N] [--endpoint-url URL]
+'''
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from common.model.thing import COLLECTION_NAME, ThingItem
+from common.util.aws import DEFAULT_REGION, create_dynamodb_client, default_region
+from common.util.ddb import DdbTable
+from common.util.overflow import resolve
+
+MANIFEST_NAME = 'manifest.json'
+
+@dataclass
+class ExportPart:
+    '''Part file written for a single scan segment'''
+    segment: int
+    file: str
+    records: int
+    bytes: int
+
+@dataclass
+class ExportManifest:
+    '''Description of a completed export'''
+    table_name: str
+    total_segments: int
+    started_at: float
+    finished_at: float
+    records: int
+    parts: List[ExportPart]
+
+
+def export_segment(
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    output_dir: str,
+    page_size: int,
+    region_name: str = DEFAULT_REGION,
+    endpoint_url: Optional[str] = None
+) -> ExportPart:
+    '''Scan one segment of the table into a gzip NDJSON part file'''
+    # Every segment gets its own client and connection pool.
+    table = DdbTable(table_name, create_dynamodb_client(region_name, endpoint_url))
+
+    file_name = 'part-{:05d}.ndjson.gz'.format(segment)
+    path = os.path.join(output_dir, file_name)
+    scan_args: Dict[str, Any] = {
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'Limit': page_size,
+        'FilterExpression': 'begins_with(pk, :prefix)',
+        'ExpressionAttributeValues': {':prefix': '{}#'.format(COLLECTION_NAME)}
+    }
+
+    records = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        while True:
+            response = table.scan(**scan_args)
+            for raw_item in response.get('Items', []):
+                f.write(json.dumps(resolve(ThingItem.from_item(raw_item)).to_public()))
+                f.write('\n')
+                records += 1
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return ExportPart(segment=segment, file=file_name, records=records, bytes=os.path.getsize(path))
+
+
+def export_table(
+    table_name: str,
+    output_dir: str,
+    total_segments: int = 4,
+    workers: Optional[int] = None,
+    page_size: int = 1000,
+    region_name: str = DEFAULT_REGION,
+    endpoint_url: Optional[str] = None
+) -> ExportManifest:
+    '''Export the table with a parallel Scan and write the manifest'''
+    os.makedirs(output_dir, exist_ok=True)
+    started_at = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers or total_segments) as executor:
+        parts = list(
+            executor.map(
+                lambda segment: export_segment(
+                    table_name, segment, total_segments, output_dir, page_size, region_name, endpoint_url
+                ),
+                range(total_segments)
+            )
+        )
+
+    manifest = ExportManifest(
+        table_name=table_name,
+        total_segments=total_segments,
+        started_at=started_at,
+        finished_at=time.time(),
+        records=sum(part.records for part in parts),
+        parts=parts
+    )
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(asdict(manifest), f, indent=2)
+
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Export Things as gzip NDJSON')
+    parser.add_argument('--table-name', default=os.environ.get('DDB_TABLE_NAME'), required='DDB_TABLE_NAME' not in os.environ)
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--segments', type=int, default=4, help='Scan TotalSegments')
+    parser.add_argument('--workers', type=int, default=None, help='Worker threads (default: one per segment)')
+    parser.add_argument('--page-size', type=int, default=1000, help='Items per Scan page')
+    parser.add_argument('--region', default=default_region())
+    parser.add_argument('--endpoint-url', default=None, help='DDB endpoint, eg. a local DynamoDB')
+    args = parser.parse_args(argv)
+
+    manifest = export_table(
+        args.table_name,
+        args.output_dir,
+        total_segments=args.segments,
+        workers=args.workers,
+        page_size=args.page_size,
+        region_name=args.region,
+        endpoint_url=args.endpoint_url
+    )
+
+    duration = manifest.finished_at - manifest.started_at
+    print(
+        'Exported {} records in {} parts in {:.2f}s'.format(manifest.records, len(manifest.parts), duration),
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,488 @@
+'''
+Load Things into the table from NDJSON or CSV.
+
+Records are streamed from a file, gzip compressed when it ends in .gz, or from
+stdin and validated against a JSON schema. Records with an id are written
+under that id, replacing any Thing already there, and the rest get new keys.
+Valid records are grouped into BatchWriteItem requests written by a pool of
+worker threads. At most two requests per worker are in flight, so memory use
+does not grow with the size of the input.
+
+The write rate adapts to the table: it starts at --rate items/s, grows while
+writes succeed and halves whenever DynamoDB throttles a request or leaves
+items unprocessed.
+
+With --checkpoint the number of records fully handled, every one before it
+written or rejected, is saved to a file every few seconds and on exit. Running
+the same command again resumes after that record. Records written after the
+last checkpoint are written again on resume, which replaces them when they
+have an id and duplicates them when they do not.
+
+Invalid records and items DynamoDB refused are written to --rejects as NDJSON.
+
+usage: python -m common.cli.load --table-name TABLE [--format ndjson|csv] [--checkpoint FILE]
+           [--rejects FILE] [--workers N] [--rate N] [--endpoint-url URL] [FILE]
+'''
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from importlib.resources import files
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from botocore.exceptions import ClientError
+
+from common.model.thing import ThingData, ThingItem, create_keys, get_id_from_keys, get_keys_from_id
+from common.util.aws import DEFAULT_REGION, create_dynamodb_client, default_region
+from common.util.batch import BATCH_WRITE_MAX_ITEMS, AdaptiveRateLimiter, backoff_delay
+from common.util.ddb import DdbTable
+from common.util.overflow import to_storage_item
+
+# Shipped in the common package, a copy of data/common/thing-data.schema.json
+DEFAULT_SCHEMA = 'data/thing-data.schema.json'
+FORMATS = ('ndjson', 'csv')
+
+# Errors DynamoDB returns when a request is over the table's or account's capacity
+THROTTLING_ERRORS = frozenset(('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'))
+
+Validator = Callable[[Dict[str, Any]], Optional[str]]
+
+@dataclass
+class Entry:
+    '''Record being written'''
+    index: int
+    record: Dict[str, Any]
+    item: Dict[str, Any]
+
+@dataclass
+class Batch:
+    '''Records start to end of the input, the valid ones in a single BatchWriteItem request'''
+    start: int
+    end: int
+    entries: List[Entry] = field(default_factory=list)
+    rejected: int = 0
+
+@dataclass
+class Checkpoint:
+    '''Progress of a load'''
+    source: str
+    # Every record before this index has been written or rejected
+    position: int = 0
+    written: int = 0
+    rejected: int = 0
+    failed: int = 0
+    finished: bool = False
+
+@dataclass
+class LoadResult:
+    '''Description of a completed load'''
+    records: int
+    written: int
+    rejected: int
+    failed: int
+    duration: float
+    items_per_second: float
+
+
+def open_source(path: str) -> TextIO:
+    '''Open a file, gzip compressed when it ends in .gz, or stdin for -'''
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path: str) -> str:
+    '''Return the format of a file from its name, NDJSON unless it is a CSV file'''
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def read_records(source: TextIO, fmt: str, skip: int = 0) -> Iterator[Tuple[int, Any]]:
+    '''Yield (index, record) for every record of source after the first skip
+
+    A record that cannot be parsed is yielded as the ValueError describing why.
+    Blank NDJSON lines are skipped but keep their index so indexes are stable
+    across runs. CSV columns become string attributes and empty cells are left
+    out.
+    '''
+    if fmt == 'csv':
+        rows = islice(csv.DictReader(source), skip, None)
+        for (index, row) in enumerate(rows, skip):
+            if None in row:
+                yield index, ValueError('Row has more cells than the header')
+            else:
+                yield index, {k: v for (k, v) in row.items() if v not in ('', None)}
+        return
+
+    for (index, line) in enumerate(islice(source, skip, None), skip):
+        if not line.strip():
+            continue
+        try:
+            yield index, json.loads(line)
+        except ValueError as e:
+            yield index, ValueError('Invalid JSON: {}'.format(e))
+
+
+def load_validator(path: Optional[str] = None) -> Validator:
+    '''Return a function returning why a record does not match the JSON schema at path, or None
+
+    Without a path records are validated against the packaged Thing data schema.
+    '''
+    try:
+        import jsonschema
+    except ImportError:
+        raise SystemExit('Validating records requires jsonschema, pip install src/common[load]')
+
+    if path is None:
+        schema = json.loads(files('common').joinpath(DEFAULT_SCHEMA).read_text(encoding='utf-8'))
+    else:
+        with open(path) as f:
+            schema = json.load(f)
+    validator = jsonschema.Draft7Validator(schema)
+
+    def validate(record: Dict[str, Any]) -> Optional[str]:
+        error = jsonschema.exceptions.best_match(validator.iter_errors(record))
+        return None if error is None else error.message
+
+    return validate
+
+
+def to_item(record: Dict[str, Any]) -> Dict[str, Any]:
+    '''Return the DDB item for a record, keyed by its id when it has one'''
+    data = ThingData.from_dict(record)
+    keys = get_keys_from_id(data.id) if data.id else create_keys()
+    data.id = get_id_from_keys(keys)
+    return to_storage_item(ThingItem.from_data(keys, data))
+
+
+class Rejects:
+    '''NDJSON file of records that were not loaded, shared by every worker'''
+
+    def __init__(self, path: Optional[str]) -> None:
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+
+    def add(self, index: int, error: str, record: Any) -> None:
+        '''Record why the record at index was not loaded'''
+        if self._file is None:
+            return
+        line = json.dumps({'index': index, 'error': error, 'record': record}, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self) -> None:
+        '''Flush and close the file'''
+        if self._file is not None:
+            self._file.close()
+
+
+class Progress:
+    '''Counts of finished batches and the position before which every record is handled
+
+    Batches finish out of order, so the position only moves past a batch once
+    every batch before it has finished too.
+    '''
+
+    def __init__(self, checkpoint: Checkpoint) -> None:
+        self.checkpoint = checkpoint
+        self._finished: Dict[int, Tuple[int, int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def finish(self, batch: Batch, failed: int) -> None:
+        '''Record a batch as written, with failed of its items refused'''
+        with self._lock:
+            self._finished[batch.start] = (batch.end, len(batch.entries) - failed, batch.rejected, failed)
+            while self.checkpoint.position in self._finished:
+                (end, written, rejected, failed) = self._finished.pop(self.checkpoint.position)
+                self.checkpoint.position = end
+                self.checkpoint.written += written
+                self.checkpoint.rejected += rejected
+                self.checkpoint.failed += failed
+
+    def snapshot(self) -> Checkpoint:
+        '''Return a copy of the checkpoint'''
+        with self._lock:
+            return Checkpoint(**asdict(self.checkpoint))
+
+
+def read_checkpoint(path: str, source: str) -> Checkpoint:
+    '''Return the checkpoint saved at path for source, or a new one'''
+    if not os.path.exists(path):
+        return Checkpoint(source=source)
+
+    with open(path) as f:
+        checkpoint = Checkpoint(**json.load(f))
+    if checkpoint.source != source:
+        raise SystemExit('Checkpoint {} is for {}, not {}'.format(path, checkpoint.source, source))
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint) -> None:
+    '''Replace the checkpoint at path atomically'''
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(asdict(checkpoint), f)
+    os.replace(tmp_path, path)
+
+
+def batches(
+    records: Iterator[Tuple[int, Any]],
+    start: int,
+    validate: Validator,
+    rejects: Rejects
+) -> Iterator[Batch]:
+    '''Group records read from start into batches of at most BATCH_WRITE_MAX_ITEMS valid items
+
+    Batches cover the input without gaps. A batch is closed early rather than
+    hold two items with the same key, which BatchWriteItem rejects.
+    '''
+    batch = Batch(start=start, end=start)
+    keys: Set[Tuple[str, str]] = set()
+    for (index, record) in records:
+        if isinstance(record, ValueError):
+            error: Optional[str] = str(record)
+        elif not isinstance(record, dict):
+            error = 'Record is not an object'
+        else:
+            error = validate(record)
+
+        if error is None:
+            try:
+                item = to_item(record)
+            except (RuntimeError, ValueError) as e:
+                error = str(e)
+
+        if error is None:
+            key = (item['pk'], item['sk'])
+            if key in keys:
+                yield batch
+                (batch, keys) = (Batch(start=batch.end, end=batch.end), set())
+            keys.add(key)
+            batch.entries.append(Entry(index, record, item))
+        else:
+            rejects.add(index, error, record)
+            batch.rejected += 1
+        batch.end = index + 1
+
+        if len(batch.entries) == BATCH_WRITE_MAX_ITEMS:
+            yield batch
+            (batch, keys) = (Batch(start=batch.end, end=batch.end), set())
+
+    if batch.end > batch.start:
+        yield batch
+
+
+class Writer:
+    '''Writes batches on worker threads, each with its own DDB client'''
+
+    def __init__(
+        self,
+        table_name: str,
+        limiter: AdaptiveRateLimiter,
+        rejects: Rejects,
+        max_attempts: int = 10,
+        region_name: str = DEFAULT_REGION,
+        endpoint_url: Optional[str] = None
+    ) -> None:
+        self.table_name = table_name
+        self.limiter = limiter
+        self.rejects = rejects
+        self.max_attempts = max_attempts
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self._local = threading.local()
+
+    def _table(self) -> DdbTable:
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = DdbTable(self.table_name, create_dynamodb_client(self.region_name, self.endpoint_url))
+            self._local.table = table
+        return table
+
+    def write(self, batch: Batch) -> int:
+        '''Write a batch, returning the number of items that could not be written'''
+        table = self._table()
+        pending = {(entry.item['pk'], entry.item['sk']): entry for entry in batch.entries}
+        failed = 0
+        attempt = 0
+        while pending:
+            requests = [{'PutRequest': {'Item': entry.item}} for entry in pending.values()]
+            self.limiter.acquire(len(requests))
+            try:
+                response = table.batch_write_item(RequestItems={self.table_name: requests})
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code', 'ClientError')
+                if code not in THROTTLING_ERRORS or attempt + 1 >= self.max_attempts:
+                    for entry in pending.values():
+                        self.rejects.add(entry.index, code, entry.record)
+                    return failed + len(pending)
+                unprocessed = requests
+            else:
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+
+            if not unprocessed:
+                self.limiter.succeeded()
+                return failed
+
+            self.limiter.throttled()
+            attempt += 1
+            keys = {(r['PutRequest']['Item']['pk'], r['PutRequest']['Item']['sk']) for r in unprocessed}
+            pending = {key: entry for (key, entry) in pending.items() if key in keys}
+            if attempt >= self.max_attempts:
+                for entry in pending.values():
+                    self.rejects.add(entry.index, 'UnprocessedItem', entry.record)
+                return failed + len(pending)
+            time.sleep(backoff_delay(attempt))
+        return failed
+
+
+def load(
+    source: TextIO,
+    fmt: str,
+    writer: Writer,
+    validate: Validator,
+    checkpoint: Checkpoint,
+    workers: int = 8,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_interval: float = 5.0,
+    report: Optional[Callable[[Checkpoint, float], None]] = None,
+    report_interval: float = 10.0
+) -> Checkpoint:
+    '''Load the records of source after the checkpoint position and return the final checkpoint'''
+    progress = Progress(checkpoint)
+    start = checkpoint.position
+    started_at = time.monotonic()
+    saved_at = reported_at = started_at
+    # Bounds the batches read ahead of the workers
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    errors: List[BaseException] = []
+
+    def write(batch: Batch) -> None:
+        try:
+            progress.finish(batch, writer.write(batch) if batch.entries else 0)
+        except BaseException as e:
+            # The batch never finishes, so the checkpoint stays before it
+            errors.append(e)
+        finally:
+            in_flight.release()
+
+    read_all = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for batch in batches(read_records(source, fmt, start), start, validate, writer.rejects):
+                in_flight.acquire()
+                if errors:
+                    break
+                executor.submit(write, batch)
+
+                now = time.monotonic()
+                if checkpoint_path and now - saved_at >= checkpoint_interval:
+                    save_checkpoint(checkpoint_path, progress.snapshot())
+                    saved_at = now
+                if report is not None and now - reported_at >= report_interval:
+                    report(progress.snapshot(), now - started_at)
+                    reported_at = now
+            else:
+                read_all = True
+        finally:
+            executor.shutdown(wait=True)
+            final = progress.snapshot()
+            final.finished = read_all and not errors
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, final)
+
+    if errors:
+        raise errors[0]
+    return final
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''CLI entry'''
+    parser = argparse.ArgumentParser(description='Load Things from NDJSON or CSV')
+    parser.add_argument('file', nargs='?', default='-', help='NDJSON or CSV file, optionally .gz (default: stdin)')
+    parser.add_argument('--table-name', default=os.environ.get('DDB_TABLE_NAME'), required='DDB_TABLE_NAME' not in os.environ)
+    parser.add_argument('--format', choices=FORMATS, default=None, help='Input format (default: from the file name)')
+    parser.add_argument('--schema', default=None, help='JSON schema every record must match (default: the Thing data schema)')
+    parser.add_argument('--checkpoint', default=None, help='File to save progress to and resume from')
+    parser.add_argument('--checkpoint-interval', type=float, default=5.0, help='Seconds between checkpoints')
+    parser.add_argument('--rejects', default=None, help='NDJSON file to append records that were not loaded to')
+    parser.add_argument('--workers', type=int, default=8, help='Writer threads')
+    parser.add_argument('--rate', type=float, default=1000, help='Initial items/s')
+    parser.add_argument('--min-rate', type=float, default=25, help='Lowest items/s after throttling')
+    parser.add_argument('--max-rate', type=float, default=40000, help='Highest items/s')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='Seconds between progress reports')
+    parser.add_argument('--region', default=default_region())
+    parser.add_argument('--endpoint-url', default=None, help='DDB endpoint, eg. a local DynamoDB')
+    args = parser.parse_args(argv)
+
+    source_name = os.path.abspath(args.file) if args.file != '-' else '-'
+    checkpoint = read_checkpoint(args.checkpoint, source_name) if args.checkpoint else Checkpoint(source=source_name)
+    if checkpoint.finished:
+        print('Already loaded {} per {}'.format(args.file, args.checkpoint), file=sys.stderr)
+        return 0
+
+    limiter = AdaptiveRateLimiter(args.rate, min_rate=args.min_rate, max_rate=args.max_rate)
+    rejects = Rejects(args.rejects)
+    writer = Writer(args.table_name, limiter, rejects, region_name=args.region, endpoint_url=args.endpoint_url)
+    initial = Checkpoint(**asdict(checkpoint))
+
+    def report(progress: Checkpoint, elapsed: float) -> None:
+        print(
+            '{} records, {} written, {} rejected, {} failed, {:.0f} items/s (limit {:.0f})'.format(
+                progress.position, progress.written, progress.rejected, progress.failed,
+                (progress.written - initial.written) / elapsed, limiter.rate
+            ),
+            file=sys.stderr
+        )
+
+    started_at = time.monotonic()
+    source = open_source(args.file)
+    try:
+        final = load(
+            source,
+            args.format or detect_format(args.file),
+            writer,
+            load_validator(args.schema),
+            checkpoint,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            checkpoint_interval=args.checkpoint_interval,
+            report=report,
+            report_interval=args.report_interval
+        )
+    finally:
+        rejects.close()
+        if source is not sys.stdin:
+            source.close()
+
+    duration = time.monotonic() - started_at
+    written = final.written - initial.written
+    result = LoadResult(
+        records=final.position - initial.position,
+        written=written,
+        rejected=final.rejected - initial.rejected,
+        failed=final.failed - initial.failed,
+        duration=duration,
+        items_per_second=written / duration if duration else 0.0
+    )
+    print(
+        'Loaded {} of {} records in {:.2f}s, {:.0f} items/s, {} rejected, {} failed'.format(
+            result.written, result.records, result.duration, result.items_per_second, result.rejected, result.failed
+        ),
+        file=sys.stderr
+    )
+    return 1 if result.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,36 +1,178 @@
-from dataclasses import dataclass
-from typing import Optional
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Mapping, Optional
 from uuid import uuid4 as uuid
 
 COLLECTION_NAME = 'thing'
+COLLECTION_INDEX_NAME = 'CollectionIndex'
 
-@dataclass
+# Attributes holding a Thing's compressed extra attributes and the codec they were packed with
+PAYLOAD_ATTRIBUTE = 'payload'
+PAYLOAD_CODEC_ATTRIBUTE = 'payload_codec'
+# zlib compressed compact JSON
+PAYLOAD_CODEC_ZLIB_JSON = 1
+
+# Extra attributes larger than this, when encoded as JSON, are stored compressed. 0 disables compression.
+COMPRESSION_THRESHOLD_BYTES = int(os.environ.get('THING_COMPRESSION_THRESHOLD_BYTES', '0'))
+COMPRESSION_LEVEL = int(os.environ.get('THING_COMPRESSION_LEVEL', '6'))
+
+# Attribute of a pointer record holding the blob store key of an offloaded Thing
+BLOB_ATTRIBUTE = 'blob'
+
+# Table TTL attribute, epoch seconds; DynamoDB deletes items once it has passed
+TTL_ATTRIBUTE = '_ttl'
+
+# DDB attributes owned by the table layout that a Thing's data may not set
+RESERVED_ATTRIBUTES = frozenset(
+    ('pk', 'sk', 'collection', 'etag', PAYLOAD_ATTRIBUTE, PAYLOAD_CODEC_ATTRIBUTE, BLOB_ATTRIBUTE, TTL_ATTRIBUTE)
+)
+
+@dataclass(slots=True)
 class BaseThingData:
     '''Base attributes of Thing type'''
     pass
 
 
-@dataclass
+@dataclass(slots=True)
 class ThingData(BaseThingData):
-    '''Thing data'''
+    '''Thing data
+
+    Attributes beyond the declared fields are kept in extra.
+    '''
     id: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'ThingData':
+        '''Create from a public representation, eg. a request body'''
+        extra = {
+            k: v for (k, v) in data.items()
+            if k not in _THING_DATA_FIELDS and k not in RESERVED_ATTRIBUTES
+        }
+        return cls(data.get('id'), extra)
+
+    def to_public(self) -> Dict[str, Any]:
+        '''Return the public representation'''
+        return {'id': self.id, **self.extra}
+
+@dataclass(slots=True)
 class ThingItemKeys:
     '''Thing DDB item keys'''
     pk: str
     sk: str
 
+    def to_item(self) -> Dict[str, Any]:
+        '''Return the DDB key'''
+        return {'pk': self.pk, 'sk': self.sk}
+
     def get_data(self):
-        return { k:v for (k, v) in self.__dict__.items() if k not in ThingItemKeys.__dict__.keys() }
+        return self.to_item()
 
-@dataclass
-class ThingItem(ThingData, ThingItemKeys):
+@dataclass(slots=True)
+class ThingItem(ThingItemKeys):
     '''Thing DDB item'''
     id: str
+    # Partition key of COLLECTION_INDEX_NAME so Things can be listed without a Scan
+    collection: str = COLLECTION_NAME
+    # Hash of the public representation, set on every write and served as the ETag
+    etag: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+    # Blob store key of the public representation when this is a pointer record for an offloaded Thing
+    blob: Optional[str] = None
+
+    @classmethod
+    def from_data(cls, keys: ThingItemKeys, data: ThingData) -> 'ThingItem':
+        '''Create from keys and Thing data'''
+        return cls(keys.pk, keys.sk, data.id or '', COLLECTION_NAME, content_hash(data.to_public()), data.extra)
+
+    @classmethod
+    def from_item(cls, item: Mapping[str, Any]) -> 'ThingItem':
+        '''Create from a DDB item, unpacking a compressed payload'''
+        extra = {k: v for (k, v) in item.items() if k not in _THING_ITEM_FIELDS}
+        if PAYLOAD_ATTRIBUTE in extra:
+            payload = extra.pop(PAYLOAD_ATTRIBUTE)
+            codec = extra.pop(PAYLOAD_CODEC_ATTRIBUTE, PAYLOAD_CODEC_ZLIB_JSON)
+            # Attributes written in place after packing, eg. by a patch, are newer than the payload
+            extra = {**unpack_payload(payload, codec), **extra}
+        return cls(
+            item['pk'],
+            item['sk'],
+            item['id'],
+            item.get('collection', COLLECTION_NAME),
+            item.get('etag'),
+            extra,
+            item.get(BLOB_ATTRIBUTE)
+        )
+
+    def to_item(self, compression_threshold: Optional[int] = None) -> Dict[str, Any]:
+        '''Return the DDB item
+
+        Extra attributes are packed into a single compressed attribute when
+        their encoded size exceeds compression_threshold, which defaults to
+        COMPRESSION_THRESHOLD_BYTES.
+        '''
+        threshold = COMPRESSION_THRESHOLD_BYTES if compression_threshold is None else compression_threshold
+        extra: Dict[str, Any] = self.extra
+        if threshold > 0 and self.extra:
+            packed = pack_payload(self.extra, threshold)
+            if packed is not None:
+                extra = {PAYLOAD_ATTRIBUTE: packed, PAYLOAD_CODEC_ATTRIBUTE: PAYLOAD_CODEC_ZLIB_JSON}
+
+        item = {**extra, 'pk': self.pk, 'sk': self.sk, 'id': self.id, 'collection': self.collection}
+        if self.etag is not None:
+            item['etag'] = self.etag
+        if self.blob is not None:
+            item[BLOB_ATTRIBUTE] = self.blob
+        return item
+
+    def to_pointer(self, blob: str) -> Dict[str, Any]:
+        '''Return the DDB pointer record for this Thing offloaded to blob'''
+        return ThingItem(self.pk, self.sk, self.id, self.collection, self.etag, {}, blob).to_item()
+
+    def to_public(self) -> Dict[str, Any]:
+        '''Return the public representation'''
+        return {'id': self.id, **self.extra}
+
+    def to_data(self) -> ThingData:
+        '''Return the Thing data'''
+        return ThingData(self.id, self.extra)
+
+    def get_etag(self) -> str:
+        '''Return the stored ETag, hashing the data for items written without one'''
+        return self.etag or content_hash(self.to_public())
 
     def get_data(self):
-        return { k:v for (k, v) in self.__dict__.items() if k not in ['sk', 'pk'] }
+        return self.to_public()
+
+# Declared attributes, computed once rather than on every conversion
+_THING_DATA_FIELDS = frozenset(f.name for f in fields(ThingData) if f.name != 'extra')
+_THING_ITEM_FIELDS = frozenset(f.name for f in fields(ThingItem) if f.name != 'extra')
+
+def content_hash(data: Mapping[str, Any]) -> str:
+    '''Return a stable hash of a Thing's public representation'''
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+def pack_payload(extra: Mapping[str, Any], threshold: int) -> Optional[bytes]:
+    '''Return extra attributes compressed, or None when they are under threshold or do not shrink'''
+    encoded = json.dumps(extra, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if len(encoded) <= threshold:
+        return None
+    packed = zlib.compress(encoded, COMPRESSION_LEVEL)
+    return packed if len(packed) < len(encoded) else None
+
+def unpack_payload(payload: bytes, codec: int) -> Dict[str, Any]:
+    '''Return the extra attributes held in a compressed payload'''
+    if codec != PAYLOAD_CODEC_ZLIB_JSON:
+        raise ValueError('Unsupported payload codec {}'.format(codec))
+    return json.loads(zlib.decompress(payload))
+
+def create_etag() -> str:
+    '''Return a new ETag for writes made without the Thing's full content, eg. patches'''
+    return uuid().hex
 
 def create_keys() -> ThingItemKeys:
     '''Create keys for DDB'''
@@ -44,4 +186,4 @@ def get_keys_from_id(_id: str) -> ThingItemKeys:
 
 def get_id_from_keys(keys: ThingItemKeys) -> str:
     '''Get id from keys'''
-    return keys.pk.split('#')[1]
\ No newline at end of file
+    return keys.pk.split('#')[1]
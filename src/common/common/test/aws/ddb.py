@@ -0,0 +1,59 @@
+'''
+In-memory stand-in for the low-level DynamoDB client.
+'''
+import json
+import threading
+import time
+from typing import Any, Dict, List, Sequence
+
+
+class LatencyDynamoDBClient:
+    '''Serve batch requests from memory after sleeping for latency seconds
+
+    Only the operations used by common.util.aioddb are implemented. Calls are
+    thread-safe and record the highest number of requests in flight at once.
+    '''
+
+    def __init__(self, latency: float = 0.0, key_attributes: Sequence[str] = ('pk', 'sk')) -> None:
+        self.latency = latency
+        self.key_attributes = tuple(key_attributes)
+        self.calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, item: Dict[str, Any]) -> str:
+        return json.dumps([item[attr] for attr in self.key_attributes])
+
+    def _wait(self) -> None:
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self._in_flight -= 1
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        '''BatchGetItem'''
+        self._wait()
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        for (table_name, request) in RequestItems.items():
+            responses[table_name] = [
+                self._items[self._key(key)] for key in request['Keys'] if self._key(key) in self._items
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        '''BatchWriteItem'''
+        self._wait()
+        with self._lock:
+            for requests in RequestItems.values():
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        self._items[self._key(item)] = item
+                    else:
+                        self._items.pop(self._key(request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': {}}
@@ -0,0 +1,177 @@
+'''Concurrent DynamoDB batch operations on asyncio
+
+AsyncDdbTable runs BatchGetItem and BatchWriteItem sized chunks of a DdbTable
+concurrently. get_many, put_many and delete_many split their input into
+chunks, retry unprocessed keys and items with backoff, and keep at most
+max_concurrency chunks in flight.
+
+botocore has no asyncio transport, so each call runs on a process wide
+thread pool. Every call goes through the one client of the wrapped table,
+whose connection pool is shared by all workers. The clients from
+common.util.aws size their pool to THING_DDB_MAX_CONCURRENCY unless
+THING_AWS_MAX_POOL_CONNECTIONS is set; a client built elsewhere needs a
+max_pool_connections of at least max_concurrency.
+
+Unprocessed keys and items are not retried once their backoff would run past
+the request deadline, see common.util.deadline; they are returned as
+unprocessed instead.
+
+Synchronous handlers call run(), which drives a coroutine on an event loop
+kept for the life of the process so warm invocations reuse it.
+'''
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from common.util.batch import BATCH_GET_MAX_KEYS, BATCH_WRITE_MAX_ITEMS, backoff_delay, chunked
+from common.util.ddb import DdbTable
+from common.util.deadline import DEADLINE, DeadlineExceeded
+
+T = TypeVar('T')
+
+MAX_CONCURRENCY = int(os.environ.get('THING_DDB_MAX_CONCURRENCY', '10'))
+MAX_BATCH_ATTEMPTS = int(os.environ.get('THING_DDB_MAX_BATCH_ATTEMPTS', '8'))
+
+# Kept at module scope so warm invocations reuse the loop and its worker threads.
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='ddb')
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def run(coro: Awaitable[T]) -> T:
+    '''Run a coroutine to completion on the process wide event loop'''
+    global _LOOP
+    if _LOOP is None or _LOOP.is_closed():
+        _LOOP = asyncio.new_event_loop()
+    return _LOOP.run_until_complete(coro)
+
+
+class AsyncDdbTable:
+    '''Concurrent batch operations against a DdbTable'''
+
+    def __init__(
+        self,
+        table: DdbTable,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_attempts: int = MAX_BATCH_ATTEMPTS,
+        executor: ThreadPoolExecutor = EXECUTOR
+    ) -> None:
+        self.table = table
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self._executor = executor
+
+    async def _call(self, operation: Callable[..., Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        '''Run a blocking DdbTable operation on the executor'''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(operation, **kwargs))
+
+    async def _gather(self, chunks: List[List[Any]], fn: Callable[[List[Any]], Awaitable[T]]) -> List[T]:
+        '''Apply fn to every chunk with at most max_concurrency running at once
+
+        When one chunk fails the others are cancelled before the error is
+        raised, so none are left on the shared loop to run during a later call.
+        '''
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(chunk: List[Any]) -> T:
+            async with semaphore:
+                return await fn(chunk)
+
+        tasks = [asyncio.ensure_future(bounded(chunk)) for chunk in chunks]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            pending = [task for task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _get_chunk(self, keys: List[Dict[str, Any]], **kwargs: Any) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        '''BatchGetItem one chunk, returning the items found and the keys left unprocessed after retrying'''
+        name = self.table.name
+        request_items = {name: {**kwargs, 'Keys': keys}}
+        found: List[Dict[str, Any]] = []
+        attempt = 0
+        while True:
+            response = await self._call(self.table.batch_get_item, RequestItems=request_items)
+            found.extend(response.get('Responses', {}).get(name, []))
+
+            unprocessed = response.get('UnprocessedKeys', {})
+            if not unprocessed:
+                return found, []
+
+            attempt += 1
+            delay = backoff_delay(attempt)
+            if attempt >= self.max_attempts or not DEADLINE.allows(delay):
+                return found, unprocessed[name]['Keys']
+
+            await asyncio.sleep(delay)
+            request_items = unprocessed
+
+    async def _write_chunk(self, requests: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        '''BatchWriteItem one chunk, returning the requests that failed and why'''
+        name = self.table.name
+        attempt = 0
+        while True:
+            try:
+                response = await self._call(self.table.batch_write_item, RequestItems={name: requests})
+            except ClientError as e:
+                error = e.response.get('Error', {}).get('Code', 'ClientError')
+                return [(request, error) for request in requests]
+            except (BotoCoreError, DeadlineExceeded) as e:
+                # Connection errors and timeouts, or no time left to try
+                return [(request, type(e).__name__) for request in requests]
+
+            requests = response.get('UnprocessedItems', {}).get(name, [])
+            if not requests:
+                return []
+
+            attempt += 1
+            delay = backoff_delay(attempt)
+            if attempt >= self.max_attempts or not DEADLINE.allows(delay):
+                return [(request, 'UnprocessedItem') for request in requests]
+
+            await asyncio.sleep(delay)
+
+    async def get_many(
+        self,
+        keys: List[Dict[str, Any]],
+        **kwargs: Any
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        '''Get items by key
+
+        Extra arguments such as ConsistentRead apply to every chunk. Returns
+        the items found and the keys still unprocessed after retrying. Keys
+        must be unique.
+        '''
+        results = await self._gather(
+            list(chunked(keys, BATCH_GET_MAX_KEYS)),
+            lambda chunk: self._get_chunk(chunk, **kwargs)
+        )
+
+        found: List[Dict[str, Any]] = []
+        unprocessed: List[Dict[str, Any]] = []
+        for (chunk_found, chunk_unprocessed) in results:
+            found.extend(chunk_found)
+            unprocessed.extend(chunk_unprocessed)
+        return found, unprocessed
+
+    async def _write_many(self, requests: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        '''Write requests, returning the ones that failed and why'''
+        results = await self._gather(list(chunked(requests, BATCH_WRITE_MAX_ITEMS)), self._write_chunk)
+        return [failure for chunk_failures in results for failure in chunk_failures]
+
+    async def put_many(self, items: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        '''Put items, returning each item that was not written with its error code'''
+        failures = await self._write_many([{'PutRequest': {'Item': item}} for item in items])
+        return [(request['PutRequest']['Item'], error) for (request, error) in failures]
+
+    async def delete_many(self, keys: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], str]]:
+        '''Delete items by key, returning each key that was not deleted with its error code'''
+        failures = await self._write_many([{'DeleteRequest': {'Key': key}} for key in keys])
+        return [(request['DeleteRequest']['Key'], error) for (request, error) in failures]
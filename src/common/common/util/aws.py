@@ -0,0 +1,150 @@
+'''AWS SDK helpers
+
+Clients are built with botocore directly, which skips importing boto3 and
+s3transfer, and only on first use rather than at import time, so importing a
+handler stays cheap and paths that never touch AWS never pay for the SDK.
+The shared client is cached for the life of the process and used by every
+handler loaded into it.
+
+Every client is created in the function's own region, AWS_REGION in Lambda,
+with the settings from client_config():
+
+    THING_AWS_CONNECT_TIMEOUT_SECONDS  connect timeout, 1 by default
+    THING_AWS_READ_TIMEOUT_SECONDS     read timeout, 3 by default
+    THING_AWS_MAX_ATTEMPTS             attempts including the first, 3 by default
+    THING_AWS_RETRY_MODE               botocore retry mode, adaptive by default
+    THING_AWS_MAX_POOL_CONNECTIONS     connection pool size, by default
+                                       THING_DDB_MAX_CONCURRENCY or 10
+
+botocore's defaults, a 60 second connect and read timeout, would let one
+stalled connection use up the whole function timeout. TCP keepalive is on so
+pooled connections survive between invocations of a warm container.
+
+With THING_AWS_PREWARM set, handlers call prewarm_dynamodb_client() at import
+so the client is created, and its TLS connection opened, during the Lambda
+init phase instead of on the first request, and how long that took is logged.
+
+DynamoDB clients also hold their requests to the handler's deadline, see
+common.util.deadline.
+'''
+
+from __future__ import annotations
+
+import os
+import time
+from functools import cache
+from typing import TYPE_CHECKING, Literal, Optional, cast
+
+from aws_lambda_powertools.logging import Logger
+
+from common.util import deadline
+
+if TYPE_CHECKING:
+    from botocore.config import Config, _RetryDict
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+    from mypy_boto3_s3.client import S3Client
+
+DEFAULT_REGION = 'us-east-1'
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('THING_AWS_CONNECT_TIMEOUT_SECONDS', '1'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('THING_AWS_READ_TIMEOUT_SECONDS', '3'))
+MAX_ATTEMPTS = int(os.environ.get('THING_AWS_MAX_ATTEMPTS', '3'))
+RETRY_MODE = os.environ.get('THING_AWS_RETRY_MODE', 'adaptive')
+MAX_POOL_CONNECTIONS = int(
+    os.environ.get('THING_AWS_MAX_POOL_CONNECTIONS', os.environ.get('THING_DDB_MAX_CONCURRENCY', '10'))
+)
+PREWARM = os.environ.get('THING_AWS_PREWARM', 'false').lower() in ('1', 'true', 'yes')
+
+LOGGER = Logger(utc=True)
+
+
+def default_region() -> str:
+    '''Return the region of the running function, or DEFAULT_REGION outside Lambda'''
+    return os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', DEFAULT_REGION))
+
+
+def client_config() -> Config:
+    '''Return the timeout, retry and connection pool settings for new clients'''
+    from botocore.config import Config
+    retries: _RetryDict = {
+        'mode': cast(Literal['legacy', 'standard', 'adaptive'], RETRY_MODE),
+        'total_max_attempts': MAX_ATTEMPTS
+    }
+    return Config(
+        connect_timeout=CONNECT_TIMEOUT_SECONDS,
+        read_timeout=READ_TIMEOUT_SECONDS,
+        retries=retries,
+        tcp_keepalive=True,
+        max_pool_connections=MAX_POOL_CONNECTIONS
+    )
+
+
+def create_dynamodb_client(region_name: Optional[str] = None, endpoint_url: Optional[str] = None) -> DynamoDBClient:
+    '''Return a new low-level DDB client'''
+    import botocore.session
+    client = botocore.session.get_session().create_client(
+        'dynamodb',
+        region_name=region_name or default_region(),
+        endpoint_url=endpoint_url,
+        config=client_config()
+    )
+    deadline.register(client)
+    return cast('DynamoDBClient', client)
+
+
+@cache
+def get_dynamodb_client(region_name: Optional[str] = None) -> DynamoDBClient:
+    '''Return the process wide low-level DDB client'''
+    return create_dynamodb_client(region_name)
+
+
+@cache
+def prewarm_dynamodb_client() -> None:
+    '''Create the process wide DDB client and open its connection when THING_AWS_PREWARM is set
+
+    DescribeEndpoints is used as it is free and reads no table. Any response,
+    including an error such as AccessDenied, means the connection was opened
+    and is left in the pool; only failing to reach DynamoDB is logged.
+    Runs once per process however many handlers call it.
+    '''
+    if not PREWARM:
+        return
+
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    start = time.perf_counter()
+    client = get_dynamodb_client()
+    created = time.perf_counter()
+    try:
+        client.describe_endpoints()
+    except ClientError:
+        pass
+    except BotoCoreError as e:
+        LOGGER.warning('DynamoDB connection prewarm failed', extra={'error': str(e)})
+    end = time.perf_counter()
+
+    LOGGER.info(
+        'DynamoDB client ready',
+        extra={
+            'client_init_ms': round((created - start) * 1000, 3),
+            'prewarm_ms': round((end - created) * 1000, 3),
+            'init_ms': round((end - start) * 1000, 3),
+        }
+    )
+
+
+def create_s3_client(region_name: Optional[str] = None, endpoint_url: Optional[str] = None) -> S3Client:
+    '''Return a new S3 client'''
+    import botocore.session
+    return botocore.session.get_session().create_client(
+        's3',
+        region_name=region_name or default_region(),
+        endpoint_url=endpoint_url,
+        config=client_config()
+    )
+
+
+@cache
+def get_s3_client(region_name: Optional[str] = None) -> S3Client:
+    '''Return the process wide S3 client'''
+    return create_s3_client(region_name)
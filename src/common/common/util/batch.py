@@ -0,0 +1,82 @@
+'''DynamoDB batch request helpers'''
+
+import random
+import threading
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
+
+# Service limits for a single BatchWriteItem / BatchGetItem request
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_GET_MAX_KEYS = 100
+
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_CAP_SECONDS = 2.0
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    '''Yield successive lists of at most size items'''
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = BACKOFF_BASE_SECONDS,
+    cap: float = BACKOFF_CAP_SECONDS
+) -> float:
+    '''Return a "full jitter" exponential backoff delay in seconds for attempt'''
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    '''Token bucket whose rate adapts to how well the table keeps up
+
+    The rate grows by increase items/s after every successful write and is cut
+    by decrease after a throttled one, additive increase and multiplicative
+    decrease, staying between min_rate and max_rate.
+    '''
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 25.0,
+        max_rate: float = 40000.0,
+        increase: float = 5.0,
+        decrease: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ) -> None:
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # Time the bucket has been drawn down to, at most one second of burst behind now
+        self._next = clock()
+
+    def acquire(self, items: int) -> None:
+        '''Block until items may be written'''
+        with self._lock:
+            now = self._clock()
+            start = max(self._next, now - 1.0)
+            self._next = start + items / self.rate
+            wait = start - now
+        if wait > 0:
+            self._sleep(wait)
+
+    def succeeded(self) -> None:
+        '''Record a write the table accepted in full'''
+        with self._lock:
+            self.rate = min(self.rate + self.increase, self.max_rate)
+
+    def throttled(self) -> None:
+        '''Record a write that was throttled or left items unprocessed'''
+        with self._lock:
+            self.rate = max(self.rate * self.decrease, self.min_rate)
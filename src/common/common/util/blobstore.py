@@ -0,0 +1,141 @@
+'''Object storage for Thing bodies too large for DynamoDB
+
+BlobStore is the small interface handlers use. S3BlobStore is used in
+production and LocalBlobStore, a directory on the local filesystem, stands in
+for it in tests and local runs. Blobs are read back as a stream of chunks so
+large objects are never held in memory more than once.
+'''
+
+from __future__ import annotations
+
+import os
+import tempfile
+from functools import cache
+from typing import TYPE_CHECKING, Iterator, Optional, Protocol
+
+from common.util.aws import get_s3_client
+
+if TYPE_CHECKING:
+    from mypy_boto3_s3.client import S3Client
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class BlobNotFoundError(KeyError):
+    '''Raised when a blob does not exist'''
+
+
+class BlobStore(Protocol):
+    '''Key addressed blob storage'''
+
+    def put(self, key: str, data: bytes) -> None:
+        '''Store data under key, replacing any existing blob'''
+        ...
+
+    def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        '''Yield the blob stored under key in chunks'''
+        ...
+
+    def delete(self, key: str) -> None:
+        '''Delete the blob stored under key if there is one'''
+        ...
+
+
+class S3BlobStore:
+    '''Blobs stored as objects in an S3 bucket'''
+
+    def __init__(self, bucket: str, prefix: str = '', client: Optional[S3Client] = None) -> None:
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self) -> S3Client:
+        '''S3 client, the process wide client unless one was given'''
+        if self._client is None:
+            self._client = get_s3_client()
+        return self._client
+
+    def put(self, key: str, data: bytes) -> None:
+        '''Store data under key, replacing any existing blob'''
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.prefix + key,
+            Body=data,
+            ContentType='application/json'
+        )
+
+    def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        '''Yield the blob stored under key in chunks'''
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.NoSuchKey as e:
+            raise BlobNotFoundError(key) from e
+
+        body = response['Body']
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, key: str) -> None:
+        '''Delete the blob stored under key if there is one'''
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+class LocalBlobStore:
+    '''Blobs stored as files under a local directory'''
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError('Blob key escapes the store root: {}'.format(key))
+        return path
+
+    def put(self, key: str, data: bytes) -> None:
+        '''Store data under key, replacing any existing blob'''
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stream(self, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        '''Yield the blob stored under key in chunks'''
+        try:
+            f = open(self._path(key), 'rb')
+        except FileNotFoundError as e:
+            raise BlobNotFoundError(key) from e
+
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        '''Delete the blob stored under key if there is one'''
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+@cache
+def get_blob_store() -> Optional[BlobStore]:
+    '''Return the configured blob store, or None when offloading is disabled
+
+    THING_BLOB_BUCKET_NAME selects S3 and THING_BLOB_PATH a local directory.
+    '''
+    bucket = os.environ.get('THING_BLOB_BUCKET_NAME')
+    if bucket:
+        return S3BlobStore(bucket, os.environ.get('THING_BLOB_PREFIX', ''))
+
+    path = os.environ.get('THING_BLOB_PATH')
+    if path:
+        return LocalBlobStore(path)
+
+    return None
@@ -0,0 +1,96 @@
+'''In-process caching'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar('V')
+
+@dataclass(frozen=True, slots=True)
+class EncodedThing:
+    '''A Thing's encoded response body and its ETag'''
+    etag: str
+    body: str
+
+@dataclass
+class CacheStats:
+    '''Cache counters'''
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class LruTtlCache(Generic[V]):
+    '''Size bounded LRU cache whose entries expire after a TTL
+
+    Instances are meant to live at module scope so entries survive across warm
+    invocations of the same container. A capacity of 0 disables the cache.
+    '''
+
+    def __init__(self, capacity: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, prefix: str, capacity: int = 1024, ttl: float = 30.0) -> 'LruTtlCache[V]':
+        '''Create a cache configured by <prefix>_CAPACITY and <prefix>_TTL_SECONDS'''
+        return cls(
+            capacity=int(os.environ.get('{}_CAPACITY'.format(prefix), capacity)),
+            ttl=float(os.environ.get('{}_TTL_SECONDS'.format(prefix), ttl))
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        '''Return the cached value for key or None if absent or expired'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        '''Cache value under key, evicting the least recently used entry when full'''
+        if self.capacity <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        '''Drop key from the cache'''
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        '''Drop every entry'''
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every handler in the process so writes can invalidate what reads cached.
+THING_CACHE: LruTtlCache[EncodedThing] = LruTtlCache.from_environment('THING_CACHE')
@@ -0,0 +1,119 @@
+'''DynamoDB attribute value codec
+
+A leaner replacement for boto3's TypeSerializer/TypeDeserializer used with the
+low-level client. Encoding dispatches on the exact type of common values
+before falling back to isinstance checks, and decoding returns JSON safe
+numbers (int or float) rather than Decimal.
+'''
+
+from decimal import Decimal
+from typing import Any, Callable, Dict, Mapping
+
+AttributeValue = Dict[str, Any]
+AttributeMap = Dict[str, AttributeValue]
+
+
+def _serialize_number(value: Any) -> AttributeValue:
+    if isinstance(value, float) and (value != value or value in (float('inf'), float('-inf'))):
+        raise TypeError('NaN and Infinity are not supported by DynamoDB')
+    return {'N': str(value)}
+
+
+def _serialize_set(value: Any) -> AttributeValue:
+    if not value:
+        raise TypeError('Empty sets are not supported by DynamoDB')
+    sample = next(iter(value))
+    if isinstance(sample, str):
+        return {'SS': list(value)}
+    if isinstance(sample, (bytes, bytearray)):
+        return {'BS': [bytes(v) for v in value]}
+    return {'NS': [_serialize_number(v)['N'] for v in value]}
+
+
+_SERIALIZERS: Dict[type, Callable[[Any], AttributeValue]] = {
+    str: lambda v: {'S': v},
+    bool: lambda v: {'BOOL': v},
+    int: lambda v: {'N': str(v)},
+    float: _serialize_number,
+    Decimal: _serialize_number,
+    type(None): lambda v: {'NULL': True},
+    dict: lambda v: {'M': {k: serialize(i) for (k, i) in v.items()}},
+    list: lambda v: {'L': [serialize(i) for i in v]},
+    tuple: lambda v: {'L': [serialize(i) for i in v]},
+    bytes: lambda v: {'B': v},
+    bytearray: lambda v: {'B': bytes(v)},
+    set: _serialize_set,
+    frozenset: _serialize_set,
+}
+
+
+def serialize(value: Any) -> AttributeValue:
+    '''Encode a Python value as a DDB AttributeValue'''
+    serializer = _SERIALIZERS.get(type(value))
+    if serializer is not None:
+        return serializer(value)
+
+    # Subclasses of the supported types, eg. str enums
+    for base, serializer in _SERIALIZERS.items():
+        if isinstance(value, base):
+            return serializer(value)
+    raise TypeError('Unsupported type "{}" for value "{}"'.format(type(value).__name__, value))
+
+
+def _deserialize_number(value: str) -> int | float:
+    if '.' in value or 'e' in value or 'E' in value:
+        return float(value)
+    return int(value)
+
+
+_DESERIALIZERS: Dict[str, Callable[[Any], Any]] = {
+    'S': lambda v: v,
+    'N': _deserialize_number,
+    'BOOL': lambda v: v,
+    'NULL': lambda v: None,
+    'M': lambda v: {k: deserialize(i) for (k, i) in v.items()},
+    'L': lambda v: [deserialize(i) for i in v],
+    'B': lambda v: v,
+    'SS': set,
+    'NS': lambda v: {_deserialize_number(n) for n in v},
+    'BS': set,
+}
+
+
+def deserialize(value: Mapping[str, Any]) -> Any:
+    '''Decode a DDB AttributeValue into a JSON safe Python value'''
+    for (type_code, raw) in value.items():
+        return _DESERIALIZERS[type_code](raw)
+    raise TypeError('Empty AttributeValue')
+
+
+def encode_item(item: Mapping[str, Any]) -> AttributeMap:
+    '''Encode a Python mapping as a DDB attribute map'''
+    return {k: serialize(v) for (k, v) in item.items()}
+
+
+def decode_item(item: Mapping[str, Mapping[str, Any]]) -> Dict[str, Any]:
+    '''Decode a DDB attribute map into a Python dict'''
+    return {k: deserialize(v) for (k, v) in item.items()}
+
+
+def _value_size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        # Numbers are stored as up to 38 significant digits, two per byte
+        return len(str(value).lstrip('-').replace('.', '')) // 2 + 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode('utf-8')) + 1 + _value_size(v) for (k, v) in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 3 + sum(1 + _value_size(v) for v in value)
+    return len(str(value).encode('utf-8'))
+
+
+def item_size(item: Mapping[str, Any]) -> int:
+    '''Return an estimate of the size DDB bills and limits a Python mapping at'''
+    return sum(len(k.encode('utf-8')) + _value_size(v) for (k, v) in item.items())
@@ -0,0 +1,51 @@
+'''Opaque, signed pagination cursors'''
+
+import base64
+import hashlib
+import hmac
+import json
+from typing import Any, Dict
+
+
+class InvalidCursorError(ValueError):
+    '''Cursor is malformed or its signature does not match'''
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(payload: bytes, key: bytes) -> bytes:
+    if not key:
+        # Anyone could sign a cursor with an empty key
+        raise ValueError('Cursor signing key is empty')
+    return hmac.new(key, payload, hashlib.sha256).digest()
+
+
+def encode_cursor(last_evaluated_key: Dict[str, Any], key: bytes) -> str:
+    '''Encode a DDB LastEvaluatedKey as an opaque, signed cursor'''
+    payload = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True).encode()
+    return '{}.{}'.format(_b64encode(payload), _b64encode(_sign(payload, key)))
+
+
+def decode_cursor(cursor: str, key: bytes) -> Dict[str, Any]:
+    '''Decode a cursor back into a DDB ExclusiveStartKey
+
+    Raises InvalidCursorError if the cursor was not produced by encode_cursor() with key.
+    Both functions raise ValueError when key is empty.
+    '''
+    try:
+        encoded_payload, encoded_signature = cursor.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError as e:
+        raise InvalidCursorError('Malformed cursor') from e
+
+    if not hmac.compare_digest(signature, _sign(payload, key)):
+        raise InvalidCursorError('Invalid cursor signature')
+
+    return json.loads(payload)
@@ -1,9 +1,38 @@
 from aws_lambda_powertools.middleware_factory import lambda_handler_decorator
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from dataclasses import asdict
 from typing import Any, Callable, Dict
 
+from common.util.encoding import compress_response
+from common.util.metrics import PHASE_ENCODE, PHASE_METRICS
+from common.util.serialization import to_response
+
 @lambda_handler_decorator
-def lambda_dataclass_response(handler: Callable[..., Any], event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
-    response = handler(event, context)
-    return asdict(response)
\ No newline at end of file
+def lambda_dataclass_response(
+    handler: Callable[..., Any],
+    event: APIGatewayProxyEvent,
+    context: LambdaContext
+) -> Dict[str, Any]:
+    '''Return the handler's response dataclass as a Lambda proxy response
+
+    The response body may be an object, which is encoded to JSON here in one
+    pass, or an already encoded str or bytes body, which is passed through.
+    Large bodies are compressed with a coding from the Accept-Encoding header.
+
+    API Gateway base64 encodes request bodies of the binary media types that
+    compressed responses need, so such bodies are decoded before the handler
+    sees them.
+
+    Phase metrics recorded during the call are published when it ends, with
+    the route as a dimension.
+    '''
+    if event.is_base64_encoded:
+        event = APIGatewayProxyEvent({**event.raw_event, 'body': event.decoded_body, 'isBase64Encoded': False})
+
+    try:
+        response = handler(event, context)
+        with PHASE_METRICS.phase(PHASE_ENCODE):
+            return compress_response(to_response(response), event.headers.get('Accept-Encoding'))
+    finally:
+        if PHASE_METRICS.enabled:
+            PHASE_METRICS.flush('{} {}'.format(event.http_method, event.resource))
@@ -0,0 +1,145 @@
+'''DynamoDB table access on the low-level client
+
+DdbTable mirrors the subset of the boto3 Table resource API the handlers use,
+taking and returning plain Python values, but encodes and decodes attribute
+maps with common.util.codec instead of the resource layer.
+'''
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from common.util.aws import get_dynamodb_client
+from common.util.codec import decode_item, encode_item
+from common.util.metrics import PHASE_DDB, PHASE_METRICS
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+
+# Request parameters holding attribute maps that must be encoded
+_ENCODED_PARAMS = ('Item', 'Key', 'ExpressionAttributeValues', 'ExclusiveStartKey')
+
+
+class DdbTable:
+    '''A DDB table accessed through the low-level client'''
+
+    def __init__(self, name: str, client: Optional[DynamoDBClient] = None) -> None:
+        self.name = name
+        self._client = client
+
+    @property
+    def client(self) -> DynamoDBClient:
+        '''Low-level client, the process wide client unless one was given'''
+        if self._client is None:
+            self._client = get_dynamodb_client()
+        return self._client
+
+    def _request(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        request = {'TableName': self.name, **kwargs}
+        for param in _ENCODED_PARAMS:
+            if param in request:
+                request[param] = encode_item(request[param])
+        return request
+
+    def _send(self, operation: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        '''Call a client operation, timed and with consumed capacity recorded when phase metrics are on'''
+        if not PHASE_METRICS.enabled:
+            response: Dict[str, Any] = getattr(self.client, operation)(**request)
+            return response
+
+        request.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        with PHASE_METRICS.phase(PHASE_DDB):
+            response = getattr(self.client, operation)(**request)
+        PHASE_METRICS.add_consumed_capacity(operation, response.get('ConsumedCapacity'))
+        return response
+
+    def get_item(self, **kwargs: Any) -> Dict[str, Any]:
+        '''GetItem'''
+        response = self._send('get_item', self._request(kwargs))
+        if 'Item' in response:
+            response['Item'] = decode_item(response['Item'])
+        return response
+
+    def put_item(self, **kwargs: Any) -> Dict[str, Any]:
+        '''PutItem'''
+        response = self._send('put_item', self._request(kwargs))
+        if 'Attributes' in response:
+            response['Attributes'] = decode_item(response['Attributes'])
+        return response
+
+    def update_item(self, **kwargs: Any) -> Dict[str, Any]:
+        '''UpdateItem'''
+        response = self._send('update_item', self._request(kwargs))
+        if 'Attributes' in response:
+            response['Attributes'] = decode_item(response['Attributes'])
+        return response
+
+    def delete_item(self, **kwargs: Any) -> Dict[str, Any]:
+        '''DeleteItem'''
+        response = self._send('delete_item', self._request(kwargs))
+        if 'Attributes' in response:
+            response['Attributes'] = decode_item(response['Attributes'])
+        return response
+
+    def query(self, **kwargs: Any) -> Dict[str, Any]:
+        '''Query'''
+        response = self._send('query', self._request(kwargs))
+        return self._decode_page(response)
+
+    def scan(self, **kwargs: Any) -> Dict[str, Any]:
+        '''Scan'''
+        response = self._send('scan', self._request(kwargs))
+        return self._decode_page(response)
+
+    def batch_write_item(self, RequestItems: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        '''BatchWriteItem with put and delete requests against this table'''
+        requests = [
+            {
+                action: {
+                    attr: encode_item(value) for (attr, value) in request[action].items()
+                } for action in request
+            } for request in RequestItems[self.name]
+        ]
+        response = self._send('batch_write_item', {'RequestItems': {self.name: requests}, **kwargs})
+
+        unprocessed = response.get('UnprocessedItems', {}).get(self.name)
+        response['UnprocessedItems'] = {
+            self.name: [
+                {
+                    action: {
+                        attr: decode_item(value) for (attr, value) in request[action].items()
+                    } for action in request
+                } for request in unprocessed
+            ]
+        } if unprocessed else {}
+        return response
+
+    def batch_get_item(self, RequestItems: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        '''BatchGetItem against this table'''
+        request = {**RequestItems[self.name], 'Keys': [encode_item(k) for k in RequestItems[self.name]['Keys']]}
+        response = self._send('batch_get_item', {'RequestItems': {self.name: request}, **kwargs})
+
+        response['Responses'] = {
+            self.name: [decode_item(item) for item in response.get('Responses', {}).get(self.name, [])]
+        }
+        unprocessed = response.get('UnprocessedKeys', {}).get(self.name)
+        response['UnprocessedKeys'] = {
+            self.name: {**unprocessed, 'Keys': [decode_item(k) for k in unprocessed['Keys']]}
+        } if unprocessed else {}
+        return response
+
+    def transact_write_items(self, TransactItems: List[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        '''TransactWriteItems with every action against this table'''
+        transact_items = [
+            {action: self._request(params) for (action, params) in transact_item.items()}
+            for transact_item in TransactItems
+        ]
+        return self._send('transact_write_items', {'TransactItems': transact_items, **kwargs})
+
+    @staticmethod
+    def _decode_page(response: Dict[str, Any]) -> Dict[str, Any]:
+        if 'Items' in response:
+            response['Items'] = [decode_item(item) for item in response['Items']]
+        if 'LastEvaluatedKey' in response:
+            response['LastEvaluatedKey'] = decode_item(response['LastEvaluatedKey'])
+        return response
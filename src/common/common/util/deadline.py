@@ -0,0 +1,172 @@
+'''Request deadlines from the Lambda remaining time
+
+A function that runs past its timeout is killed without a response, after
+being billed for the whole timeout. with_deadline instead sets DEADLINE from
+context.get_remaining_time_in_millis(), less THING_DEADLINE_RESERVE_MS (500
+by default) kept back to send a response, and DynamoDB requests made through
+the clients from common.util.aws are held to it:
+
+- each attempt's read timeout is cut to the time left, so a stalled request
+  gives up while there is still time to answer
+- an attempt is not started with less than THING_DEADLINE_MIN_ATTEMPT_MS (100
+  by default) left, and a failed one is not retried unless its longest
+  backoff fits as well
+
+Either raises DeadlineExceeded, which with_deadline returns as a 503 with a
+Retry-After of THING_DEADLINE_RETRY_AFTER_SECONDS. Outside with_deadline
+there is no deadline and requests only have the client's own timeouts.
+'''
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.middleware_factory import lambda_handler_decorator
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+if TYPE_CHECKING:
+    from botocore.awsrequest import AWSPreparedRequest, AWSResponse
+    from botocore.client import BaseClient
+
+RESERVE_MS = int(os.environ.get('THING_DEADLINE_RESERVE_MS', '500'))
+MIN_ATTEMPT_MS = int(os.environ.get('THING_DEADLINE_MIN_ATTEMPT_MS', '100'))
+RETRY_AFTER_SECONDS = int(os.environ.get('THING_DEADLINE_RETRY_AFTER_SECONDS', '1'))
+
+# Error codes botocore retries as throttling, besides 5xx responses and
+# connection errors
+_THROTTLING_ERRORS = frozenset(('ThrottlingException', 'ProvisionedThroughputExceededException', 'RequestLimitExceeded'))
+
+# botocore's standard and adaptive retry modes wait up to 2 ** (attempts - 1)
+# seconds, capped at this, before the next attempt
+_MAX_BACKOFF_SECONDS = 20
+
+LOGGER = Logger(utc=True)
+
+
+class DeadlineExceeded(Exception):
+    '''Raised instead of a request there is not enough time left for'''
+
+
+class Deadline:
+    '''When the current request must be answered by'''
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self.expires_at: Optional[float] = None
+
+    def start(self, remaining_ms: int, reserve_ms: int = RESERVE_MS) -> None:
+        '''Set the deadline to reserve_ms before the function times out'''
+        self.expires_at = self._clock() + (remaining_ms - reserve_ms) / 1000
+
+    def clear(self) -> None:
+        '''Remove the deadline'''
+        self.expires_at = None
+
+    def remaining(self) -> Optional[float]:
+        '''Return the seconds left, or None without a deadline'''
+        if self.expires_at is None:
+            return None
+        return self.expires_at - self._clock()
+
+    def allows(self, seconds: float = 0.0) -> bool:
+        '''Return whether there is time to wait seconds and then make an attempt'''
+        remaining = self.remaining()
+        return remaining is None or remaining >= seconds + MIN_ATTEMPT_MS / 1000
+
+    def check(self, seconds: float = 0.0) -> Optional[float]:
+        '''Return the seconds left, raising DeadlineExceeded unless allows(seconds)'''
+        remaining = self.remaining()
+        if not self.allows(seconds):
+            raise DeadlineExceeded('{:.0f}ms left of the request deadline'.format(max(remaining or 0, 0) * 1000))
+        return remaining
+
+
+DEADLINE = Deadline()
+
+
+def _before_send(request: AWSPreparedRequest, **kwargs: Any) -> None:
+    '''Cut the attempt's read timeout to the time left, or fail it when too little is left'''
+    remaining = DEADLINE.check()
+    if remaining is not None:
+        context: Dict[str, Any] = request.context  # type: ignore[attr-defined]
+        context['read_timeout'] = min(remaining, context['client_config'].read_timeout)
+
+
+def _is_retryable(response: Optional[Tuple[AWSResponse, Dict[str, Any]]], caught_exception: Optional[Exception]) -> bool:
+    '''Return whether botocore may retry an attempt with this outcome'''
+    if caught_exception is not None:
+        return True
+    if response is None:
+        return False
+    (http_response, parsed) = response
+    return http_response.status_code >= 500 or parsed.get('Error', {}).get('Code') in _THROTTLING_ERRORS
+
+
+def _needs_retry(
+    attempts: int,
+    request_dict: Dict[str, Any],
+    response: Optional[Tuple[AWSResponse, Dict[str, Any]]] = None,
+    caught_exception: Optional[Exception] = None,
+    **kwargs: Any
+) -> None:
+    '''Fail an attempt botocore would retry when its backoff and the next attempt do not fit
+
+    A failed last attempt with no time left, typically one whose read timeout
+    was cut to the deadline, also fails as DeadlineExceeded rather than with
+    the timeout error botocore would raise.
+    '''
+    if DEADLINE.expires_at is None or not _is_retryable(response, caught_exception):
+        return
+    max_attempts = (request_dict['context']['client_config'].retries or {}).get('total_max_attempts')
+    last_attempt = max_attempts is not None and attempts >= max_attempts
+
+    try:
+        DEADLINE.check(0 if last_attempt else min(2 ** (attempts - 1), _MAX_BACKOFF_SECONDS))
+    except DeadlineExceeded as e:
+        raise e from caught_exception
+
+
+def register(client: BaseClient) -> None:
+    '''Hold a client's requests to DEADLINE
+
+    Registered after the client's own handlers, so the adaptive retry mode's
+    rate limiting has already waited when an attempt is checked.
+    '''
+    client.meta.events.register('before-send', _before_send)
+    client.meta.events.register('needs-retry', _needs_retry)
+
+
+@dataclass
+class Output:
+    '''Response for a request that ran out of time'''
+    statusCode: int
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@lambda_handler_decorator
+def with_deadline(handler: Callable[..., Any], event: Any, context: LambdaContext) -> Any:
+    '''Hold the call's requests to the function's remaining time, answering 503 when it runs out
+
+    Apply innermost, below lambda_dataclass_response, which encodes the 503.
+    '''
+    get_remaining_time = getattr(context, 'get_remaining_time_in_millis', None)
+    if get_remaining_time is None:
+        return handler(event, context)
+
+    DEADLINE.start(get_remaining_time())
+    try:
+        return handler(event, context)
+    except DeadlineExceeded as e:
+        LOGGER.warning('Deadline exceeded', extra={'error': str(e)})
+        return Output(
+            statusCode=503,
+            body={'error': 'DeadlineExceeded', 'message': 'The request could not be completed in time'},
+            headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
+        )
+    finally:
+        DEADLINE.clear()
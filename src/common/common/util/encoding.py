@@ -0,0 +1,122 @@
+'''HTTP content coding of handler responses
+
+Response bodies at least RESPONSE_COMPRESSION_THRESHOLD_BYTES long are
+compressed with the best coding the client accepts: br when the brotli module
+is installed, then gzip. Compressed bodies are returned base64 encoded for API
+Gateway to decode, which it does for the binary media types set in openapi.yaml.
+Smaller bodies are sent as is since compressing them costs more CPU time than
+it saves in transfer, see benchmarks/response_compression.py.
+'''
+
+import base64
+import gzip
+import os
+from typing import Any, Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # type: ignore[assignment]
+
+RESPONSE_COMPRESSION_THRESHOLD_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_THRESHOLD_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '5'))
+BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '4'))
+
+# Codings in order of preference when the client accepts several equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def _parse_accept_encoding(accept_encoding: str) -> Dict[str, float]:
+    '''Return the codings of an Accept-Encoding header mapped to their q-values'''
+    codings: Dict[str, float] = {}
+    for member in accept_encoding.split(','):
+        (coding, *params) = member.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        for param in params:
+            (name, _, value) = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    '''Return the supported coding the client prefers, or None for identity'''
+    if not accept_encoding:
+        return None
+
+    codings = _parse_accept_encoding(accept_encoding)
+    wildcard = codings.get('*', 0.0)
+    best: Optional[str] = None
+    best_q = 0.0
+    for coding in SUPPORTED_ENCODINGS:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best = coding
+            best_q = q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    '''Compress data with a content coding returned by negotiate_encoding'''
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime is fixed so equal bodies compress to equal bytes
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError('Unsupported content coding: {}'.format(encoding))
+
+
+def compress_response(
+    response: Dict[str, Any],
+    accept_encoding: Optional[str],
+    threshold: Optional[int] = None
+) -> Dict[str, Any]:
+    '''Compress a Lambda proxy response's body when it is large enough
+
+    Returns the response unchanged when the body is small, already coded or
+    the client accepts no supported coding. A strong ETag is made weak since
+    the compressed bytes differ from the representation it was computed for.
+    '''
+    threshold = RESPONSE_COMPRESSION_THRESHOLD_BYTES if threshold is None else threshold
+    body = response.get('body')
+    headers: Dict[str, str] = dict(response.get('headers') or {})
+    if (
+        not isinstance(body, str)
+        or response.get('isBase64Encoded')
+        or any(name.lower() == 'content-encoding' for name in headers)
+    ):
+        return response
+
+    data = body.encode('utf-8')
+    if len(data) < threshold:
+        return response
+
+    # Whether the body is compressed depends on the request from here on
+    headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return {**response, 'headers': headers}
+
+    compressed = compress(data, encoding)
+    if len(compressed) >= len(data):
+        return {**response, 'headers': headers}
+
+    headers['Content-Encoding'] = encoding
+    etag = headers.get('ETag')
+    if etag is not None and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True
+    }
@@ -0,0 +1,79 @@
+'''DynamoDB expression builders'''
+
+from typing import Any, Dict, List, Mapping
+
+
+def apply_merge_patch(target: Mapping[str, Any], patch: Mapping[str, Any]) -> Dict[str, Any]:
+    '''Apply a JSON Merge Patch (RFC 7386) in memory
+
+    Object members are merged into the target's member of the same name when
+    that is an object, and replace it otherwise.
+    '''
+    result = dict(target)
+    for (name, value) in patch.items():
+        if value is None:
+            result.pop(name, None)
+        elif isinstance(value, dict):
+            current = result.get(name)
+            result[name] = apply_merge_patch(current if isinstance(current, dict) else {}, value)
+        else:
+            result[name] = value
+    return result
+
+
+def merge_patch_update(patch: Mapping[str, Any]) -> Dict[str, Any]:
+    '''Compile a JSON Merge Patch (RFC 7386) into UpdateItem arguments
+
+    Members set to null are REMOVEd and every other member is SET. Object
+    members are merged into the existing map member by member, through
+    nested document paths, so keys the patch does not mention are kept.
+    Attribute names and values are always passed through generated
+    placeholders so any attribute name can be patched.
+
+    A document path can only be updated inside an existing map, so a patch
+    with object members also gets a ConditionExpression requiring each map it
+    merges into to exist as a map. When that condition fails the patch must
+    be applied another way, eg. with apply_merge_patch on the stored item.
+
+    Returns the UpdateExpression, ExpressionAttributeNames and, when needed,
+    ExpressionAttributeValues and ConditionExpression.
+    '''
+    placeholders: Dict[str, str] = {}
+    values: Dict[str, Any] = {}
+    set_actions: List[str] = []
+    remove_actions: List[str] = []
+    maps: List[str] = []
+
+    def add(parent: List[str], members: Mapping[str, Any]) -> None:
+        for (name, value) in members.items():
+            if name not in placeholders:
+                placeholders[name] = '#n{}'.format(len(placeholders))
+            path = parent + [placeholders[name]]
+            if isinstance(value, dict):
+                maps.append('.'.join(path))
+                add(path, value)
+            elif value is None:
+                remove_actions.append('.'.join(path))
+            else:
+                value_placeholder = ':v{}'.format(len(values))
+                values[value_placeholder] = value
+                set_actions.append('{} = {}'.format('.'.join(path), value_placeholder))
+
+    add([], patch)
+
+    clauses = []
+    if set_actions:
+        clauses.append('SET ' + ', '.join(set_actions))
+    if remove_actions:
+        clauses.append('REMOVE ' + ', '.join(remove_actions))
+
+    update: Dict[str, Any] = {
+        'UpdateExpression': ' '.join(clauses),
+        'ExpressionAttributeNames': {placeholder: name for (name, placeholder) in placeholders.items()}
+    }
+    if maps:
+        values[':map'] = 'M'
+        update['ConditionExpression'] = ' AND '.join('attribute_type({}, :map)'.format(path) for path in maps)
+    if values:
+        update['ExpressionAttributeValues'] = values
+    return update
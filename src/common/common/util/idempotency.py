@@ -0,0 +1,158 @@
+'''Idempotent request handling keyed by the Idempotency-Key header
+
+A request carrying an Idempotency-Key saves its response in an idempotency
+record next to the item it writes, in the same transaction. A repeat of the
+request finds the record and replays the saved response instead of writing
+again. Records live in the Thing table under an Idempotency# key, outside the
+Thing collection, and expire after THING_IDEMPOTENCY_TTL_SECONDS through the
+table's TTL attribute.
+
+Keys are scoped to the caller's Cognito sub or client_id, so two callers
+cannot see each other's responses. A key reused with a different request body
+is reported rather than replayed.
+
+IDEMPOTENCY_CACHE keeps recent responses in memory so hot retries served by
+the same container skip the DynamoDB read.
+'''
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+
+from botocore.exceptions import ClientError
+
+from common.model.thing import TTL_ATTRIBUTE
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('THING_IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+RECORD_KEY_PREFIX = 'Idempotency#'
+
+# Hot retries arrive within seconds, so entries need not live as long as the records.
+IDEMPOTENCY_CACHE: LruTtlCache['IdempotentResponse'] = LruTtlCache.from_environment(
+    'THING_IDEMPOTENCY_CACHE',
+    ttl=300.0
+)
+
+
+@dataclass(frozen=True, slots=True)
+class IdempotentResponse:
+    '''Saved response of an idempotent request'''
+    fingerprint: str
+    statusCode: int
+    body: str
+
+
+class IdempotencyKeyReused(Exception):
+    '''An idempotency key was sent again with a different request'''
+
+
+def is_valid_key(key: str) -> bool:
+    '''Return whether key may be used as an idempotency key'''
+    return 0 < len(key) <= IDEMPOTENCY_KEY_MAX_LENGTH and key.isprintable()
+
+
+def caller(raw_event: Mapping[str, Any]) -> str:
+    '''Return the identity idempotency keys of a raw API Gateway event are scoped to'''
+    claims = ((raw_event.get('requestContext') or {}).get('authorizer') or {}).get('claims') or {}
+    return str(claims.get('sub') or claims.get('client_id') or '')
+
+
+def fingerprint(body: Optional[str]) -> str:
+    '''Return a hash identifying a request body'''
+    return hashlib.sha256((body or '').encode('utf-8')).hexdigest()
+
+
+def record_key(key: str, scope: str) -> Dict[str, str]:
+    '''Return the DDB key of the record for an idempotency key sent by scope'''
+    digest = hashlib.sha256('{}\n{}'.format(scope, key).encode('utf-8')).hexdigest()
+    key_value = '{}{}'.format(RECORD_KEY_PREFIX, digest)
+    return {'pk': key_value, 'sk': key_value}
+
+
+def _cache_key(keys: Mapping[str, str]) -> str:
+    return keys['pk']
+
+
+def _check(response: IdempotentResponse, request_fingerprint: str) -> IdempotentResponse:
+    if response.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReused()
+    return response
+
+
+def get_response(
+    table: DdbTable,
+    keys: Mapping[str, str],
+    request_fingerprint: str,
+    now: Optional[float] = None
+) -> Optional[IdempotentResponse]:
+    '''Return the response saved under keys, or None when the request has not been seen
+
+    Raises IdempotencyKeyReused when the saved response is for a different request.
+    '''
+    cached = IDEMPOTENCY_CACHE.get(_cache_key(keys))
+    if cached is not None:
+        return _check(cached, request_fingerprint)
+
+    item = table.get_item(Key=dict(keys), ConsistentRead=True).get('Item')
+    # DynamoDB deletes expired items some time after they expire
+    if item is None or item[TTL_ATTRIBUTE] <= (time.time() if now is None else now):
+        return None
+
+    response = IdempotentResponse(item['fingerprint'], int(item['statusCode']), item['body'])
+    IDEMPOTENCY_CACHE.set(_cache_key(keys), response)
+    return _check(response, request_fingerprint)
+
+
+def transact_put(
+    table: DdbTable,
+    put: Dict[str, Any],
+    keys: Mapping[str, str],
+    response: IdempotentResponse,
+    now: Optional[float] = None
+) -> Optional[IdempotentResponse]:
+    '''Write a put_item request and the record saving its response in one transaction
+
+    Returns None once written. When a concurrent request with the same key
+    saved its record first nothing is written and that request's response is
+    returned instead.
+    '''
+    now = time.time() if now is None else now
+    record = {
+        **keys,
+        'fingerprint': response.fingerprint,
+        'statusCode': response.statusCode,
+        'body': response.body,
+        TTL_ATTRIBUTE: int(now) + IDEMPOTENCY_TTL_SECONDS,
+    }
+    transact_items: List[Dict[str, Any]] = [
+        {'Put': put},
+        {
+            'Put': {
+                'Item': record,
+                'ConditionExpression': 'attribute_not_exists(pk) OR #ttl <= :now',
+                'ExpressionAttributeNames': {'#ttl': TTL_ATTRIBUTE},
+                'ExpressionAttributeValues': {':now': int(now)},
+            }
+        },
+    ]
+
+    try:
+        table.transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        reasons = e.response.get('CancellationReasons') or []
+        if len(reasons) < 2 or reasons[1].get('Code') != 'ConditionalCheckFailed':
+            raise
+        saved = get_response(table, keys, response.fingerprint, now)
+        if saved is None:
+            raise
+        return saved
+
+    IDEMPOTENCY_CACHE.set(_cache_key(keys), response)
+    return None
@@ -0,0 +1,86 @@
+'''Logging policy for handler events and outputs
+
+Handlers log the event they received and the output they return at DEBUG.
+With LOG_LEVEL at INFO, Powertools enables DEBUG for a
+POWERTOOLS_LOGGER_SAMPLE_RATE fraction of invocations, so these records are
+sampled. log_event and log_output check the level before doing any work: the
+record is only copied, trimmed and serialized when it will be emitted.
+
+Emitted records are capped. Bodies over THING_LOG_BODY_MAX_BYTES are
+truncated, credential headers are redacted and only identifying claims of
+the authorizer context are kept.
+'''
+
+import logging
+import os
+from dataclasses import fields
+from typing import Any, Dict, Mapping, Optional
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+
+from common.util.serialization import encode_body
+
+LOG_BODY_MAX_BYTES = int(os.environ.get('THING_LOG_BODY_MAX_BYTES', '2048'))
+
+REDACTED = '[REDACTED]'
+REDACTED_HEADERS = frozenset(('authorization', 'cookie', 'set-cookie', 'x-api-key', 'x-amz-security-token'))
+# Authorizer claims that identify the caller without granting anything
+LOGGED_CLAIMS = ('sub', 'client_id', 'scope')
+
+
+def truncate_body(body: Optional[str], limit: Optional[int] = None) -> Optional[str]:
+    '''Return body cut to limit bytes with a marker giving its full size'''
+    limit = LOG_BODY_MAX_BYTES if limit is None else limit
+    if body is None or len(body) <= limit // 4:
+        # No character encodes to more than 4 bytes
+        return body
+
+    data = body.encode('utf-8')
+    if len(data) <= limit:
+        return body
+    return '{}...[truncated {} bytes]'.format(data[:limit].decode('utf-8', 'ignore'), len(data))
+
+
+def _redact_headers(headers: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+    '''Return headers with credentials replaced'''
+    if headers is None:
+        return None
+    return {k: (REDACTED if k.lower() in REDACTED_HEADERS else v) for (k, v) in headers.items()}
+
+
+def event_record(raw_event: Mapping[str, Any]) -> Dict[str, Any]:
+    '''Return the loggable form of an API Gateway proxy event'''
+    record = dict(raw_event)
+    record['body'] = truncate_body(record.get('body'))
+    record['headers'] = _redact_headers(record.get('headers'))
+    record['multiValueHeaders'] = _redact_headers(record.get('multiValueHeaders'))
+
+    request_context = record.get('requestContext')
+    if request_context and request_context.get('authorizer'):
+        claims = request_context['authorizer'].get('claims') or {}
+        record['requestContext'] = {
+            **request_context,
+            'authorizer': {'claims': {k: claims[k] for k in LOGGED_CLAIMS if k in claims}}
+        }
+    return record
+
+
+def output_record(output: Any) -> Dict[str, Any]:
+    '''Return the loggable form of a handler Output dataclass'''
+    record = {f.name: getattr(output, f.name) for f in fields(output)}
+    if 'body' in record:
+        record['body'] = truncate_body(encode_body(record['body']))
+    return record
+
+
+def log_event(logger: Logger, event: APIGatewayProxyEvent) -> None:
+    '''Log a handler's event at DEBUG'''
+    if logger.log_level <= logging.DEBUG:
+        logger.debug('Event', extra={"message_object": event_record(event.raw_event)})
+
+
+def log_output(logger: Logger, output: Any) -> None:
+    '''Log a handler's Output at DEBUG'''
+    if logger.log_level <= logging.DEBUG:
+        logger.debug('Output', extra={"message_object": output_record(output)})
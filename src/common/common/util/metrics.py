@@ -0,0 +1,128 @@
+'''Per phase timing of handler calls published as CloudWatch embedded metrics
+
+PHASE_METRICS times the hot path phases of a handler call: request body parse,
+ThingData construction, DynamoDB calls and response encoding, and adds up the
+capacity DynamoDB reports as consumed. lambda_dataclass_response publishes one
+EMF record per call with a metric per phase and a Route dimension through
+Powertools Metrics.
+
+Metrics are off unless THING_PHASE_METRICS is set. When off, phase() returns a
+shared no-op context manager and Powertools Metrics is never imported. When on
+the cost per call is bounded: times are summed per phase, so a call emits at
+most one metric per phase whatever the number of DynamoDB calls it makes.
+'''
+
+import os
+import threading
+import time
+from contextlib import nullcontext
+from types import TracebackType
+from typing import Any, ContextManager, Dict, List, Optional, Type, Union
+
+PHASE_METRICS_ENABLED = os.environ.get('THING_PHASE_METRICS', '').lower() in ('1', 'true', 'yes')
+METRICS_NAMESPACE = os.environ.get('POWERTOOLS_METRICS_NAMESPACE', 'ThingApi')
+
+PHASE_PARSE = 'Parse'
+PHASE_MODEL = 'Model'
+PHASE_DDB = 'DynamoDB'
+PHASE_ENCODE = 'Encode'
+
+# DynamoDB operations that consume read capacity, all others consume write capacity
+_READ_OPERATIONS = frozenset(('get_item', 'query', 'scan', 'batch_get_item'))
+
+_DISABLED = nullcontext()
+
+
+class _Phase:
+    '''Adds the time spent inside the block to a phase'''
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics: 'PhaseMetrics', name: str) -> None:
+        self._metrics = metrics
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType]
+    ) -> None:
+        self._metrics.add_time(self._name, time.perf_counter() - self._start)
+
+
+class PhaseMetrics:
+    '''Per call phase times and consumed capacity'''
+
+    def __init__(self, enabled: bool = PHASE_METRICS_ENABLED, namespace: str = METRICS_NAMESPACE) -> None:
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._times: Dict[str, float] = {}
+        self._capacity: Dict[str, float] = {}
+
+    def phase(self, name: str) -> ContextManager[None]:
+        '''Return a context manager timing its block as part of phase name'''
+        if not self.enabled:
+            return _DISABLED
+        return _Phase(self, name)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        '''Add time to a phase'''
+        # DynamoDB calls may be made from worker threads
+        with self._lock:
+            self._times[name] = self._times.get(name, 0.0) + seconds
+
+    def add_consumed_capacity(
+        self,
+        operation: str,
+        consumed: Union[Dict[str, Any], List[Dict[str, Any]], None]
+    ) -> None:
+        '''Add the ConsumedCapacity of a DynamoDB response'''
+        if not self.enabled or not consumed:
+            return
+
+        units = sum(
+            c.get('CapacityUnits', 0.0) for c in (consumed if isinstance(consumed, list) else [consumed])
+        )
+        kind = 'ConsumedReadCapacity' if operation in _READ_OPERATIONS else 'ConsumedWriteCapacity'
+        with self._lock:
+            self._capacity[kind] = self._capacity.get(kind, 0.0) + units
+
+    def snapshot(self) -> Dict[str, float]:
+        '''Return the phase times in ms and capacity units recorded since the last flush'''
+        with self._lock:
+            values = {'{}Time'.format(name): seconds * 1000 for (name, seconds) in self._times.items()}
+            values.update(self._capacity)
+        return values
+
+    def reset(self) -> None:
+        '''Drop everything recorded'''
+        with self._lock:
+            self._times = {}
+            self._capacity = {}
+
+    def flush(self, route: str) -> None:
+        '''Publish what was recorded as one EMF record with a Route dimension and reset'''
+        if not self.enabled:
+            return
+
+        values = self.snapshot()
+        self.reset()
+        if not values:
+            return
+
+        from aws_lambda_powertools.metrics import Metrics, MetricUnit
+
+        metrics = Metrics(namespace=self.namespace)
+        metrics.add_dimension(name='Route', value=route)
+        for (name, value) in values.items():
+            unit = MetricUnit.Milliseconds if name.endswith('Time') else MetricUnit.Count
+            metrics.add_metric(name=name, unit=unit, value=value)
+        metrics.flush_metrics()
+
+
+PHASE_METRICS = PhaseMetrics()
@@ -0,0 +1,94 @@
+'''Offloading of Things too large for a DynamoDB item
+
+When a Thing's DDB item would exceed THING_OFFLOAD_THRESHOLD_BYTES its public
+representation is written to the blob store and DDB keeps only a pointer
+record: the keys, id, collection, etag and the blob key. Blob keys include the
+etag so a blob is never rewritten in place while a reader may be streaming it.
+'''
+
+import codecs
+import os
+from typing import Any, Dict, Mapping, Optional
+
+from common.model.thing import BLOB_ATTRIBUTE, ThingItem, create_etag
+from common.util.blobstore import BlobStore, get_blob_store
+from common.util.codec import item_size
+from common.util.serialization import dumps, loads
+
+# Headroom under DynamoDB's 400KB item limit
+OFFLOAD_THRESHOLD_BYTES = int(os.environ.get('THING_OFFLOAD_THRESHOLD_BYTES', '358400'))
+
+
+def _require_store(store: Optional[BlobStore]) -> BlobStore:
+    store = store if store is not None else get_blob_store()
+    if store is None:
+        raise RuntimeError('Thing is offloaded but no blob store is configured')
+    return store
+
+
+def blob_key(item: ThingItem) -> str:
+    '''Return the blob store key for a Thing's current version'''
+    return '{}/{}.json'.format(item.id, item.etag or create_etag())
+
+
+def needs_offload(ddb_item: Mapping[str, Any], store: Optional[BlobStore] = None) -> bool:
+    '''Return whether a Thing's DDB item is too large to store and there is a blob store to offload it to'''
+    store = store if store is not None else get_blob_store()
+    return store is not None and item_size(ddb_item) > OFFLOAD_THRESHOLD_BYTES
+
+
+def offload(item: ThingItem, store: Optional[BlobStore] = None) -> Dict[str, Any]:
+    '''Write a Thing to the blob store and return its DDB pointer record'''
+    key = blob_key(item)
+    _require_store(store).put(key, dumps(item.to_public()).encode('utf-8'))
+    return item.to_pointer(key)
+
+
+def to_storage_item(item: ThingItem, store: Optional[BlobStore] = None) -> Dict[str, Any]:
+    '''Return the DDB item to write for a Thing, offloading it when too large
+
+    Offloading is disabled when no blob store is configured.
+    '''
+    ddb_item = item.to_item()
+    store = store if store is not None else get_blob_store()
+    if not needs_offload(ddb_item, store):
+        return ddb_item
+    return offload(item, store)
+
+
+def read_body(key: str, store: Optional[BlobStore] = None) -> str:
+    '''Return an offloaded Thing's encoded public representation
+
+    Chunks are decoded as they stream in and appended to the text, which
+    CPython extends in place while nothing else references it, so peak
+    memory is one copy of the text and a chunk. Joining the decoded chunks
+    would hold two copies, and decoding the whole raw body at once more.
+    '''
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    text = ''
+    for chunk in _require_store(store).stream(key):
+        text += decoder.decode(chunk)
+    text += decoder.decode(b'', final=True)
+    return text
+
+
+def resolve(item: ThingItem, store: Optional[BlobStore] = None) -> ThingItem:
+    '''Return the Thing with its data loaded from the blob store when it is offloaded'''
+    if item.blob is None:
+        return item
+
+    data = loads(read_body(item.blob, store))
+    extra = {k: v for (k, v) in data.items() if k != 'id'}
+    return ThingItem(item.pk, item.sk, item.id, item.collection, item.etag, extra)
+
+
+def discard_replaced(
+    old_item: Optional[Mapping[str, Any]],
+    new_item: Optional[Mapping[str, Any]] = None,
+    store: Optional[BlobStore] = None
+) -> None:
+    '''Delete the blob of an overwritten or deleted item unless the new item still points at it'''
+    old_blob = (old_item or {}).get(BLOB_ATTRIBUTE)
+    if old_blob is None or old_blob == (new_item or {}).get(BLOB_ATTRIBUTE):
+        return
+    _require_store(store).delete(old_blob)
@@ -0,0 +1,121 @@
+'''Sampled profiling of handler calls
+
+profile_sampled runs a fraction of calls, THING_PROFILE_SAMPLE_RATE, under
+cProfile and logs the top THING_PROFILE_TOP_N functions by cumulative time as
+one structured "Profile" record carrying the call's aws_request_id.
+
+Callers whose Cognito client_id or sub is listed in
+THING_PROFILE_ALLOWED_CALLERS can also force profiling of a request by sending
+the THING_PROFILE_HEADER header, X-Thing-Profile by default, set to 1.
+
+Calls that are not profiled only pay for a random number draw, and a header
+lookup when forced profiling is configured.
+'''
+
+import cProfile
+import os
+import pstats
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.middleware_factory import lambda_handler_decorator
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('THING_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOP_N = int(os.environ.get('THING_PROFILE_TOP_N', '20'))
+PROFILE_HEADER = os.environ.get('THING_PROFILE_HEADER', 'X-Thing-Profile')
+PROFILE_ALLOWED_CALLERS = frozenset(
+    caller.strip() for caller in os.environ.get('THING_PROFILE_ALLOWED_CALLERS', '').split(',') if caller.strip()
+)
+
+LOGGER = Logger(utc=True)
+
+
+def _header(event: Dict[str, Any], name: str) -> Optional[str]:
+    '''Return a header of a raw API Gateway event, matching the name case-insensitively'''
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is not None:
+        return str(value)
+
+    name = name.lower()
+    for (key, value) in headers.items():
+        if key.lower() == name:
+            return str(value)
+    return None
+
+
+def _is_allowed_caller(event: Dict[str, Any]) -> bool:
+    '''Return whether the authorized caller may force profiling'''
+    claims = ((event.get('requestContext') or {}).get('authorizer') or {}).get('claims') or {}
+    return any(claims.get(claim) in PROFILE_ALLOWED_CALLERS for claim in ('client_id', 'sub'))
+
+
+def _profile_reason(event: Dict[str, Any]) -> Optional[str]:
+    '''Return why this call should be profiled, or None when it should not be'''
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    if PROFILE_ALLOWED_CALLERS and _header(event, PROFILE_HEADER) == '1' and _is_allowed_caller(event):
+        return 'requested'
+    return None
+
+
+def _function_name(key: Tuple[str, int, str]) -> str:
+    '''Return a compact name for a pstats function key'''
+    (filename, line, name) = key
+    if filename == '~':
+        return name
+    parts = filename.replace(os.sep, '/').rsplit('/', 2)
+    return '{}:{}({})'.format('/'.join(parts[-2:]), line, name)
+
+
+def top_functions(profile: cProfile.Profile, limit: int) -> List[Dict[str, Any]]:
+    '''Return the limit functions with the most cumulative time in profile'''
+    stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+    ranked = sorted(stats.items(), key=lambda entry: entry[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': _function_name(key),
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        }
+        for (key, (_, calls, tottime, cumtime, _callers)) in ranked
+    ]
+
+
+@lambda_handler_decorator
+def profile_sampled(handler: Callable[..., Any], event: Dict[str, Any], context: LambdaContext) -> Any:
+    '''Profile sampled or requested handler calls and log where their time went
+
+    Apply outermost so the profile covers the other decorators too.
+    '''
+    reason = _profile_reason(event)
+    if reason is None:
+        return handler(event, context)
+
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is already active in this process
+        return handler(event, context)
+
+    try:
+        return handler(event, context)
+    finally:
+        profile.disable()
+        LOGGER.info(
+            'Profile',
+            extra={
+                "aws_request_id": context.aws_request_id,
+                "profile": {
+                    "reason": reason,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "top": top_functions(profile, PROFILE_TOP_N),
+                }
+            }
+        )
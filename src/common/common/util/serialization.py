@@ -0,0 +1,67 @@
+'''JSON serialization of handler results
+
+Objects are encoded straight to JSON in a single pass: dataclasses are handed
+to the encoder field by field, or through their to_public() method when they
+have one, instead of being deep copied with asdict() first. orjson is used
+when it is installed and the stdlib json module otherwise.
+'''
+
+import json
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj: Any) -> Any:
+    '''Return a JSON encodable form of obj, one level deep'''
+    to_public = getattr(obj, 'to_public', None)
+    if to_public is not None:
+        return to_public()
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> str:
+        '''Encode obj as a JSON string'''
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode('utf-8')
+
+    def loads(data: str | bytes) -> Any:
+        '''Decode a JSON document'''
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> str:
+        '''Encode obj as a JSON string'''
+        return json.dumps(obj, default=_default, separators=(',', ':'))
+
+    def loads(data: str | bytes) -> Any:
+        '''Decode a JSON document'''
+        return json.loads(data)
+
+
+def encode_body(body: Any) -> str:
+    '''Return a response body, encoding it unless it is already encoded'''
+    if isinstance(body, str):
+        return body
+    if isinstance(body, (bytes, bytearray)):
+        return body.decode('utf-8')
+    return dumps(body)
+
+
+def to_response(response: Any) -> Dict[str, Any]:
+    '''Return a Lambda proxy response dict from a response dataclass'''
+    result = {f.name: getattr(response, f.name) for f in fields(response)}
+    if 'body' in result:
+        result['body'] = encode_body(result['body'])
+    return result
@@ -12,10 +12,24 @@ setup(
     keywords="test-thing-py service",
     python_requires='>=3.13',
     include_package_data=True,
+    package_data={
+        'common': ['data/*.json']
+    },
     install_requires=[
         'aws_lambda_powertools',
         'boto3'
     ],
+    extras_require={
+        'fast-json': ['orjson'],
+        'brotli': ['brotli'],
+        'load': ['jsonschema']
+    },
+    entry_points={
+        'console_scripts': [
+            'thing-export=common.cli.export:main',
+            'thing-load=common.cli.load:main',
+        ]
+    },
     classifiers=[
         'Environment :: Console',
         'Environment :: Other Environment',
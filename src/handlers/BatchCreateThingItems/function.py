@@ -0,0 +1,147 @@
+'''Batch create Things'''
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import ThingData, ThingItem, create_keys, get_id_from_keys
+from common.util.aioddb import AsyncDdbTable, run
+from common.util.aws import prewarm_dynamodb_client
+from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.metrics import PHASE_METRICS, PHASE_MODEL, PHASE_PARSE
+from common.util.overflow import discard_replaced, to_storage_item
+from common.util.profiling import profile_sampled
+
+LOGGER = Logger(utc=True)
+
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
+
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', '500'))
+MAX_BATCH_WRITE_ATTEMPTS = int(os.environ.get('MAX_BATCH_WRITE_ATTEMPTS', '8'))
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+@dataclass
+class BatchItemResult:
+    '''Created item'''
+    index: int
+    id: str
+
+@dataclass
+class BatchItemFailure:
+    '''Item that could not be created'''
+    index: int
+    error: str
+    message: str
+
+@dataclass
+class ResponseBody:
+    '''Batch creation API Response body'''
+    items: List[BatchItemResult]
+    failures: List[BatchItemFailure]
+
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+def _batch_write_items(items: List[ThingItem]) -> Dict[str, str]:
+    '''Write Things to DDB, writing BatchWriteItem sized chunks concurrently
+
+    Returns a map of item id to error for every item that could not be written.
+    The blobs of offloaded items that were not written are deleted.
+    '''
+    table = AsyncDdbTable(DDB_TABLE, max_attempts=MAX_BATCH_WRITE_ATTEMPTS)
+    failures = run(table.put_many([to_storage_item(item) for item in items]))
+    for (item, _) in failures:
+        # Nothing points at a blob offloaded for an item that was not written
+        discard_replaced(item)
+    errors = sorted({error for (_, error) in failures if error != 'UnprocessedItem'})
+    if errors:
+        LOGGER.error('Batch write failed', extra={"errors": errors})
+    return {item['id']: error for (item, error) in failures}
+
+
+@profile_sampled
+@LOGGER.inject_lambda_context
+@event_source(data_class=APIGatewayProxyEvent)
+@lambda_dataclass_response
+@with_deadline
+def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
+    '''Batch create function entry'''
+    log_event(LOGGER, event)
+
+    with PHASE_METRICS.phase(PHASE_PARSE):
+        body = json.loads(event.body or '{}')
+    entries: Any = body.get('items') if isinstance(body, dict) else None
+
+    if not isinstance(entries, list):
+        error = ErrorResponseBody(
+            **{
+                "error": "BadRequest",
+                "message": "Request body must contain an items list"
+            }
+        )
+        output = Output(statusCode=400, body=error)
+    elif len(entries) > MAX_BATCH_ITEMS:
+        error = ErrorResponseBody(
+            **{
+                "error": "BatchTooLarge",
+                "message": "A batch may contain at most {} items".format(MAX_BATCH_ITEMS)
+            }
+        )
+        output = Output(statusCode=400, body=error)
+    else:
+        items: List[ThingItem] = []
+        indexes: Dict[str, int] = {}
+        failures: List[BatchItemFailure] = []
+
+        with PHASE_METRICS.phase(PHASE_MODEL):
+            for index, entry in enumerate(entries):
+                if not isinstance(entry, dict):
+                    failures.append(BatchItemFailure(index, 'InvalidItem', 'Item is not a valid Thing'))
+                    continue
+
+                item_keys = create_keys()
+                item_data = ThingData.from_dict(entry)
+                item_data.id = get_id_from_keys(item_keys)
+                items.append(ThingItem.from_data(item_keys, item_data))
+                indexes[item_data.id] = index
+
+        failed = _batch_write_items(items)
+
+        results: List[BatchItemResult] = []
+        for item in items:
+            if item.id in failed:
+                failures.append(
+                    BatchItemFailure(indexes[item.id], failed[item.id], 'Item was not created')
+                )
+            else:
+                results.append(BatchItemResult(indexes[item.id], item.id))
+
+        failures.sort(key=lambda failure: failure.index)
+        response_body = ResponseBody(items=results, failures=failures)
+        output = Output(
+            statusCode=207 if failures else 201,
+            body=response_body
+        )
+
+    log_output(LOGGER, output)
+    return output
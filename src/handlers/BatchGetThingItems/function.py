@@ -0,0 +1,109 @@
+'''Batch get Things'''
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import ThingItem, ThingItemKeys, get_id_from_keys, get_keys_from_id
+from common.util.aioddb import AsyncDdbTable, run
+from common.util.aws import prewarm_dynamodb_client
+from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.metrics import PHASE_METRICS, PHASE_PARSE
+from common.util.overflow import resolve
+from common.util.profiling import profile_sampled
+
+LOGGER = Logger(utc=True)
+
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
+
+MAX_BATCH_IDS = int(os.environ.get('MAX_BATCH_IDS', '500'))
+MAX_BATCH_GET_ATTEMPTS = int(os.environ.get('MAX_BATCH_GET_ATTEMPTS', '8'))
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+@dataclass
+class ResponseBody:
+    '''Batch get API Response body'''
+    items: Dict[str, Dict[str, Any]]
+    missing: List[str]
+    unprocessed: List[str]
+
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+def _get_items(keys: List[ThingItemKeys]) -> Tuple[List[Dict[str, Any]], List[ThingItemKeys]]:
+    '''Get Things in DDB, fetching BatchGetItem sized chunks concurrently
+
+    Returns the public representation of the found Things and the keys left unprocessed after retrying.
+    '''
+    table = AsyncDdbTable(DDB_TABLE, max_attempts=MAX_BATCH_GET_ATTEMPTS)
+    raw_items, unprocessed = run(table.get_many([item_keys.to_item() for item_keys in keys]))
+    found = [resolve(ThingItem.from_item(raw_item)).to_public() for raw_item in raw_items]
+    return found, [ThingItemKeys(**k) for k in unprocessed]
+
+
+@profile_sampled
+@LOGGER.inject_lambda_context
+@event_source(data_class=APIGatewayProxyEvent)
+@lambda_dataclass_response
+@with_deadline
+def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
+    '''Batch get function entry'''
+    log_event(LOGGER, event)
+
+    with PHASE_METRICS.phase(PHASE_PARSE):
+        body = json.loads(event.body or '{}')
+    ids: Any = body.get('ids') if isinstance(body, dict) else None
+
+    if not isinstance(ids, list) or not all(isinstance(_id, str) for _id in ids):
+        error = ErrorResponseBody(
+            **{
+                "error": "BadRequest",
+                "message": "Request body must contain an ids list of strings"
+            }
+        )
+        output = Output(statusCode=400, body=error)
+    elif len(ids) > MAX_BATCH_IDS:
+        error = ErrorResponseBody(
+            **{
+                "error": "BatchTooLarge",
+                "message": "A batch may contain at most {} ids".format(MAX_BATCH_IDS)
+            }
+        )
+        output = Output(statusCode=400, body=error)
+    else:
+        # BatchGetItem rejects duplicate keys within a request.
+        unique_ids = list(dict.fromkeys(ids))
+        found, unprocessed_keys = _get_items([get_keys_from_id(_id) for _id in unique_ids])
+
+        items = {data['id']: data for data in found}
+        unprocessed = {get_id_from_keys(item_keys) for item_keys in unprocessed_keys}
+
+        response_body = ResponseBody(
+            items={_id: items[_id] for _id in unique_ids if _id in items},
+            missing=[_id for _id in unique_ids if _id not in items and _id not in unprocessed],
+            unprocessed=[_id for _id in unique_ids if _id in unprocessed]
+        )
+        output = Output(statusCode=200, body=response_body)
+
+    log_output(LOGGER, output)
+    return output
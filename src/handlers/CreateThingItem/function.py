@@ -1,77 +1,149 @@
 '''Create Thing'''
 
+from __future__ import annotations
+
 import json
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-import boto3
 from aws_lambda_powertools.logging import Logger
 from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-from mypy_boto3_dynamodb.type_defs import PutItemInputTablePutItemTypeDef
 
-from common.model.thing import ThingData, ThingItemKeys, ThingItem, create_keys, get_id_from_keys
+from common.model.thing import ThingData, ThingItem, create_keys, get_id_from_keys
+from common.util import idempotency
+from common.util.aws import prewarm_dynamodb_client
 from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyKeyReused, IdempotentResponse
+from common.util.log import log_event, log_output
+from common.util.metrics import PHASE_METRICS, PHASE_MODEL, PHASE_PARSE
+from common.util.overflow import discard_replaced, to_storage_item
+from common.util.profiling import profile_sampled
+from common.util.serialization import dumps
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import PutItemInputTablePutItemTypeDef
 
 LOGGER = Logger(utc=True)
 
-DDB: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
-DDB_TABLE: Table = DDB.Table(os.environ.get('DDB_TABLE_NAME', ''))
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
 
 @dataclass
 class Output:
     '''Function response'''
     statusCode: int
-    body: str
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
 
 @dataclass
 class ResponseBody:
     '''Creation API Response body'''
     id: str
 
-
-def _create_item(item_data: ThingData) -> str:
-    '''Create a Thing in DDB'''
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+def _create_item(
+    item_data: ThingData,
+    idempotency_keys: Optional[Dict[str, str]] = None,
+    request_fingerprint: str = ''
+) -> Output:
+    '''Create a Thing in DDB
+
+    With idempotency_keys the response is saved alongside the Thing, and the
+    response of a concurrent request with the same key is returned when it
+    was saved first.
+    '''
     item_keys = create_keys()
     item_data.id = get_id_from_keys(item_keys)
 
-    item = ThingItem(
-        **{
-            **asdict(item_keys),
-            **asdict(item_data)
-        }
-    )
+    item = ThingItem.from_data(item_keys, item_data)
 
     ddb_put_item_args: PutItemInputTablePutItemTypeDef = {
-        'Item': asdict(item),
+        'Item': to_storage_item(item),
         'ConditionExpression': 'attribute_not_exists(pk) AND attribute_not_exists(sk)'
     }
+    output = Output(statusCode=201, body=ResponseBody(**{"id": item_data.id}))
+
+    try:
+        if idempotency_keys is None:
+            DDB_TABLE.put_item(**ddb_put_item_args)
+            return output
+
+        response = IdempotentResponse(request_fingerprint, output.statusCode, dumps(output.body))
+        saved = idempotency.transact_put(DDB_TABLE, dict(ddb_put_item_args), idempotency_keys, response)
+    except Exception:
+        # Nothing points at a blob offloaded for a Thing that was not written
+        discard_replaced(ddb_put_item_args['Item'])
+        raise
+    if saved is not None:
+        discard_replaced(ddb_put_item_args['Item'])
+        return _replay(saved)
+    return output
+
+
+def _replay(saved: IdempotentResponse) -> Output:
+    '''Return the response saved by an earlier request with the same idempotency key'''
+    return Output(statusCode=saved.statusCode, body=saved.body, headers={REPLAYED_HEADER: 'true'})
 
-    DDB_TABLE.put_item(**ddb_put_item_args)
 
-    return item_data.id
+def _handle_create(event: APIGatewayProxyEvent, idempotency_key: Optional[str]) -> Output:
+    '''Create the Thing in the request, or replay the response to an earlier identical request'''
+    idempotency_keys = None
+    request_fingerprint = ''
+    if idempotency_key is not None:
+        idempotency_keys = idempotency.record_key(idempotency_key, idempotency.caller(event.raw_event))
+        request_fingerprint = idempotency.fingerprint(event.body)
+        saved = idempotency.get_response(DDB_TABLE, idempotency_keys, request_fingerprint)
+        if saved is not None:
+            return _replay(saved)
 
+    with PHASE_METRICS.phase(PHASE_PARSE):
+        body = json.loads(event.body or '{}')
+    with PHASE_METRICS.phase(PHASE_MODEL):
+        item_data = ThingData.from_dict(body)
+    return _create_item(item_data, idempotency_keys, request_fingerprint)
 
+
+@profile_sampled
 @LOGGER.inject_lambda_context
 @event_source(data_class=APIGatewayProxyEvent)
 @lambda_dataclass_response
+@with_deadline
 def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
     '''Create function entry'''
-    LOGGER.debug('Event', extra={"message_object": event.raw_event})
-
-    body = event.body or '{}'
-    item_data = ThingData(**json.loads(body))
-    _id = _create_item(item_data)
-
-    response_body = ResponseBody(
-        **{
-            "id": _id
-        }
-    )
-
-    output = Output(statusCode=201, body=json.dumps(asdict(response_body)))
-
-    LOGGER.debug('Output', extra={"message_object": asdict(output)})
+    log_event(LOGGER, event)
+
+    idempotency_key = event.headers.get(IDEMPOTENCY_HEADER)
+    if idempotency_key is not None and not idempotency.is_valid_key(idempotency_key):
+        error = ErrorResponseBody(
+            **{
+                "error": "InvalidIdempotencyKey",
+                "message": "{} must be 1 to {} printable characters".format(
+                    IDEMPOTENCY_HEADER, idempotency.IDEMPOTENCY_KEY_MAX_LENGTH
+                )
+            }
+        )
+        output = Output(statusCode=400, body=error)
+    else:
+        try:
+            output = _handle_create(event, idempotency_key)
+        except IdempotencyKeyReused:
+            error = ErrorResponseBody(
+                **{
+                    "error": "IdempotencyKeyReused",
+                    "message": "{} was already used with a different request".format(IDEMPOTENCY_HEADER)
+                }
+            )
+            output = Output(statusCode=422, body=error)
+
+    log_output(LOGGER, output)
     return output
@@ -1,30 +1,38 @@
 '''Delete ThingItem'''
 
-import json
+from __future__ import annotations
+
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
 
-import boto3
 from aws_lambda_powertools.logging import Logger
 from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-from mypy_boto3_dynamodb.type_defs import DeleteItemInputTableDeleteItemTypeDef
 
 from common.model.thing import ThingItemKeys, get_keys_from_id
+from common.util.aws import prewarm_dynamodb_client
+from common.util.cache import THING_CACHE
 from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.overflow import discard_replaced
+from common.util.profiling import profile_sampled
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import DeleteItemInputTableDeleteItemTypeDef
 
 LOGGER = Logger(utc=True)
 
-DDB: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
-DDB_TABLE: Table = DDB.Table(os.environ.get('DDB_TABLE_NAME', ''))
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
 
 @dataclass
 class Output:
     '''Function response'''
     statusCode: int
-    body: str
+    body: Any
 
 
 @dataclass
@@ -36,22 +44,25 @@ class ResponseBody:
 def _delete_item(item_keys: ThingItemKeys) -> None:
     '''delete a Thing in DDB'''
     ddb_args: DeleteItemInputTableDeleteItemTypeDef = {
-        'Key': {
-            **asdict(item_keys)
-        },
-        'ConditionExpression': 'attribute_exists(pk) AND attribute_exists(sk)'
+        'Key': item_keys.to_item(),
+        'ConditionExpression': 'attribute_exists(pk) AND attribute_exists(sk)',
+        'ReturnValues': 'ALL_OLD'
     }
 
-    DDB_TABLE.delete_item(**ddb_args)
+    response = DDB_TABLE.delete_item(**ddb_args)
+    discard_replaced(response.get('Attributes'))
+    THING_CACHE.invalidate(item_keys.pk)
     return
 
 
+@profile_sampled
 @LOGGER.inject_lambda_context
 @event_source(data_class=APIGatewayProxyEvent)
 @lambda_dataclass_response
+@with_deadline
 def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
     '''Function entry'''
-    LOGGER.info('Event', extra={"message_object": event.raw_event})
+    log_event(LOGGER, event)
 
     item_keys = get_keys_from_id(event.path_parameters.get('id', ''))
     _delete_item(item_keys)
@@ -62,7 +73,7 @@ def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
         }
     )
 
-    output = Output(statusCode=200, body=json.dumps(asdict(response_body)))
+    output = Output(statusCode=200, body=response_body)
 
-    LOGGER.debug('Output', extra={"message_object": asdict(output)})
+    log_output(LOGGER, output)
     return output
\ No newline at end of file
@@ -1,30 +1,40 @@
 '''Get Thing'''
 
-import json
+from __future__ import annotations
+
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict
 
-import boto3
 from aws_lambda_powertools.logging import Logger
 from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-from mypy_boto3_dynamodb.type_defs import GetItemInputTableGetItemTypeDef
 
 from common.model.thing import ThingData, ThingItem, ThingItemKeys, get_keys_from_id
+from common.util.aws import prewarm_dynamodb_client
+from common.util.cache import THING_CACHE, EncodedThing
 from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.overflow import read_body
+from common.util.profiling import profile_sampled
+from common.util.serialization import dumps
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import GetItemInputTableGetItemTypeDef
 
 LOGGER = Logger(utc=True)
 
-DDB: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
-DDB_TABLE: Table = DDB.Table(os.environ.get('DDB_TABLE_NAME', ''))
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
 
 @dataclass
 class Output:
     '''Function response'''
     statusCode: int
-    body: str
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
 
 @dataclass
 class ResponseBody(ThingData):
@@ -37,43 +47,92 @@ class ErrorResponseBody():
     message: str
 
 
-def _get_item(item_keys: ThingItemKeys) -> ThingData | None:
-    '''Get a Thing in DDB'''
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    '''Return whether an If-None-Match header matches etag, using weak comparison'''
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == '"{}"'.format(etag):
+            return True
+    return False
+
+
+def _get_etag(item_keys: ThingItemKeys) -> str | None:
+    '''Get a Thing's ETag from THING_CACHE or a keys and ETag only read of DDB
+
+    Returns None when the Thing does not exist or was written without an ETag.
+    '''
+    cached = THING_CACHE.get(item_keys.pk)
+    if cached is not None:
+        return cached.etag
+
     ddb_get_item_args: GetItemInputTableGetItemTypeDef = {
-        'Key': {
-            **asdict(item_keys)
-        }
+        'Key': item_keys.to_item(),
+        'ProjectionExpression': 'pk, sk, etag'
+    }
+
+    item = DDB_TABLE.get_item(**ddb_get_item_args).get('Item', {})
+    return item.get('etag')
+
+
+def _get_item(item_keys: ThingItemKeys) -> EncodedThing | None:
+    '''Get a Thing's encoded response body, reading through THING_CACHE to DDB
+
+    The cache holds encoded bodies so warm hits skip encoding entirely. The
+    bodies of offloaded Things are streamed from the blob store, already
+    encoded, and are not cached since they would crowd out everything else.
+    '''
+    cached = THING_CACHE.get(item_keys.pk)
+    if cached is not None:
+        return cached
+
+    ddb_get_item_args: GetItemInputTableGetItemTypeDef = {
+        'Key': item_keys.to_item()
     }
 
     get_item_response = DDB_TABLE.get_item(**ddb_get_item_args)
     if 'Item' in get_item_response:
-        item = ThingItem(**get_item_response.get('Item', {}))
-        data = ThingData(**item.get_data())
+        item = ThingItem.from_item(get_item_response['Item'])
+        if item.blob is not None:
+            data = EncodedThing(etag=item.get_etag(), body=read_body(item.blob))
+        else:
+            data = EncodedThing(etag=item.get_etag(), body=dumps(item.to_public()))
+            THING_CACHE.set(item_keys.pk, data)
     else:
         data = None
     return data
 
 
+@profile_sampled
 @LOGGER.inject_lambda_context
 @event_source(data_class=APIGatewayProxyEvent)
 @lambda_dataclass_response
+@with_deadline
 def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
     '''Function entry'''
-    LOGGER.info('Event', extra={"message_object": event.raw_event})
+    log_event(LOGGER, event)
 
     item_keys = get_keys_from_id(event.path_parameters.get('id', ''))
-    data = _get_item(item_keys)
-
-    if data is None:
-        error = ErrorResponseBody(
-            **{
-                "error": "ThingNotfound",
-                "message": "Thing not found"
-            }
-        )
-        output = Output(statusCode=404, body=json.dumps(asdict(error)))
-    else:
-        output = Output(statusCode=200, body=json.dumps(asdict(data)))
+    if_none_match = event.headers.get('If-None-Match')
 
-    LOGGER.debug('Output', extra={"message_object": asdict(output)})
-    return output
\ No newline at end of file
+    # Pollers revalidating an unchanged Thing only need its ETag
+    etag = _get_etag(item_keys) if if_none_match else None
+    if if_none_match and etag is not None and _etag_matches(if_none_match, etag):
+        output = Output(statusCode=304, body='', headers={'ETag': '"{}"'.format(etag)})
+    else:
+        data = _get_item(item_keys)
+
+        if data is None:
+            error = ErrorResponseBody(
+                **{
+                    "error": "ThingNotfound",
+                    "message": "Thing not found"
+                }
+            )
+            output = Output(statusCode=404, body=error)
+        elif if_none_match and _etag_matches(if_none_match, data.etag):
+            output = Output(statusCode=304, body='', headers={'ETag': '"{}"'.format(data.etag)})
+        else:
+            output = Output(statusCode=200, body=data.body, headers={'ETag': '"{}"'.format(data.etag)})
+
+    log_output(LOGGER, output)
+    return output
@@ -0,0 +1,130 @@
+'''List Things'''
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import COLLECTION_INDEX_NAME, COLLECTION_NAME, ThingItem
+from common.util.aws import prewarm_dynamodb_client
+from common.util.cursor import InvalidCursorError, decode_cursor, encode_cursor
+from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.overflow import resolve
+from common.util.profiling import profile_sampled
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import QueryInputTableQueryTypeDef
+
+LOGGER = Logger(utc=True)
+
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
+
+CURSOR_SIGNING_KEY = os.environ.get('CURSOR_SIGNING_KEY', '').encode()
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', '25'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '100'))
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+@dataclass
+class ResponseBody:
+    '''List API Response body'''
+    items: List[Dict[str, Any]]
+    cursor: Optional[str]
+
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+def _list_items(limit: int, start_key: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    '''List a page of Things from the collection index in DDB'''
+    ddb_query_args: QueryInputTableQueryTypeDef = {
+        'IndexName': COLLECTION_INDEX_NAME,
+        'KeyConditionExpression': '#collection = :collection',
+        'ExpressionAttributeNames': {'#collection': 'collection'},
+        'ExpressionAttributeValues': {':collection': COLLECTION_NAME},
+        'Limit': limit
+    }
+    if start_key is not None:
+        ddb_query_args['ExclusiveStartKey'] = start_key
+
+    query_response = DDB_TABLE.query(**ddb_query_args)
+    items = [
+        resolve(ThingItem.from_item(raw_item)).to_public()
+        for raw_item in query_response.get('Items', [])
+    ]
+    return items, query_response.get('LastEvaluatedKey')
+
+
+@profile_sampled
+@LOGGER.inject_lambda_context
+@event_source(data_class=APIGatewayProxyEvent)
+@lambda_dataclass_response
+@with_deadline
+def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
+    '''Function entry'''
+    log_event(LOGGER, event)
+
+    limit_param = event.get_query_string_value('limit', str(DEFAULT_PAGE_SIZE)) or ''
+    cursor_param = event.get_query_string_value('cursor')
+
+    error: Optional[ErrorResponseBody] = None
+    status_code = 400
+    start_key: Optional[Dict[str, Any]] = None
+
+    if not CURSOR_SIGNING_KEY:
+        # Fail closed rather than sign and accept cursors anyone could forge
+        LOGGER.error('CURSOR_SIGNING_KEY is not set')
+        error = ErrorResponseBody(
+            **{
+                "error": "InternalServerError",
+                "message": "Listing is not configured"
+            }
+        )
+        status_code = 500
+    elif not limit_param.isdigit() or not 0 < int(limit_param) <= MAX_PAGE_SIZE:
+        error = ErrorResponseBody(
+            **{
+                "error": "BadRequest",
+                "message": "limit must be an integer between 1 and {}".format(MAX_PAGE_SIZE)
+            }
+        )
+    elif cursor_param:
+        try:
+            start_key = decode_cursor(cursor_param, CURSOR_SIGNING_KEY)
+        except InvalidCursorError:
+            error = ErrorResponseBody(
+                **{
+                    "error": "BadRequest",
+                    "message": "Invalid cursor"
+                }
+            )
+
+    if error is not None:
+        output = Output(statusCode=status_code, body=error)
+    else:
+        items, last_evaluated_key = _list_items(int(limit_param), start_key)
+
+        response_body = ResponseBody(
+            items=items,
+            cursor=encode_cursor(last_evaluated_key, CURSOR_SIGNING_KEY) if last_evaluated_key else None
+        )
+        output = Output(statusCode=200, body=response_body)
+
+    log_output(LOGGER, output)
+    return output
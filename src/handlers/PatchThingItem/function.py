@@ -0,0 +1,233 @@
+'''Patch Thing'''
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Optional, cast
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import (
+    BLOB_ATTRIBUTE,
+    PAYLOAD_ATTRIBUTE,
+    RESERVED_ATTRIBUTES,
+    ThingItem,
+    ThingItemKeys,
+    create_etag,
+    get_keys_from_id
+)
+from common.util.aws import prewarm_dynamodb_client
+from common.util.cache import THING_CACHE
+from common.util.codec import decode_item
+from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.expressions import apply_merge_patch, merge_patch_update
+from common.util.log import log_event, log_output
+from common.util.metrics import PHASE_METRICS, PHASE_PARSE
+from common.util.overflow import discard_replaced, resolve, to_storage_item
+from common.util.profiling import profile_sampled
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import PutItemInputTablePutItemTypeDef, UpdateItemInputTableUpdateItemTypeDef
+
+LOGGER = Logger(utc=True)
+
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
+
+# Times a Thing that must be rewritten whole is read again after it changed mid-patch
+MAX_REWRITE_ATTEMPTS = int(os.environ.get('THING_PATCH_MAX_REWRITE_ATTEMPTS', '3'))
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+class PatchConflict(Exception):
+    '''Raised when a Thing kept changing while a patch was rewriting it'''
+
+
+def _validate_patch(_id: str, patch: Any) -> Optional[ErrorResponseBody]:
+    '''Return an error when patch is not a merge patch this API accepts'''
+    if not isinstance(patch, dict):
+        return ErrorResponseBody(**{"error": "BadRequest", "message": "Patch must be a JSON object"})
+
+    if 'id' in patch and patch['id'] != _id:
+        return ErrorResponseBody(**{"error": "BadRequest", "message": "Request id does not match payload id"})
+
+    reserved = sorted(RESERVED_ATTRIBUTES.intersection(patch))
+    if reserved:
+        return ErrorResponseBody(
+            **{
+                "error": "BadRequest",
+                "message": "Attributes may not be patched: {}".format(', '.join(reserved))
+            }
+        )
+
+    if not any(k != 'id' for k in patch):
+        return ErrorResponseBody(**{"error": "BadRequest", "message": "Patch does not change any attribute"})
+
+    return None
+
+
+def _rewrite_item(item: ThingItem, changes: Dict[str, Any]) -> Dict[str, Any]:
+    '''Apply a merge patch to a Thing by rewriting it whole
+
+    Used for Things stored with a compressed payload or offloaded, whose
+    attributes cannot be addressed by an UpdateExpression, and for patches
+    merging an object into an attribute that is not a map. The Thing is
+    repacked or offloaded again if it is still large.
+
+    The put only succeeds while the Thing still has the etag it was read
+    with. A Thing changed in between is patched again as it now is, up to
+    MAX_REWRITE_ATTEMPTS times before PatchConflict is raised, so no
+    concurrent change is overwritten.
+    '''
+    for _ in range(MAX_REWRITE_ATTEMPTS):
+        item = resolve(item)
+        patched = ThingItem(
+            item.pk,
+            item.sk,
+            item.id,
+            item.collection,
+            create_etag(),
+            apply_merge_patch(item.extra, changes)
+        )
+
+        ddb_item = to_storage_item(patched)
+        ddb_put_item_args = cast('PutItemInputTablePutItemTypeDef', {
+            'Item': ddb_item,
+            'ConditionExpression': (
+                'attribute_exists(pk) AND attribute_exists(sk) AND '
+                + ('#etag = :etag' if item.etag is not None else 'attribute_not_exists(#etag)')
+            ),
+            'ExpressionAttributeNames': {'#etag': 'etag'},
+            **({'ExpressionAttributeValues': {':etag': item.etag}} if item.etag is not None else {}),
+            'ReturnValues': 'ALL_OLD',
+            # Tells a changed Thing apart from a missing one when the condition fails
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        })
+        try:
+            response = DDB_TABLE.put_item(**ddb_put_item_args)
+        except DDB_TABLE.client.exceptions.ConditionalCheckFailedException as e:
+            # Nothing points at a blob offloaded for a put that failed
+            discard_replaced(ddb_item)
+            current = cast(Dict[str, Any], e.response).get('Item')
+            if current is None:
+                raise
+            item = ThingItem.from_item(decode_item(current))
+            continue
+        except Exception:
+            discard_replaced(ddb_item)
+            raise
+
+        discard_replaced(response.get('Attributes'), ddb_item)
+        updated = {k: patched.extra[k] for k in changes if k in patched.extra}
+        return {**updated, 'etag': patched.etag}
+
+    raise PatchConflict('Thing changed during {} attempts to patch it'.format(MAX_REWRITE_ATTEMPTS))
+
+
+def _patch_item(item_keys: ThingItemKeys, patch: Dict[str, Any]) -> Dict[str, Any]:
+    '''Apply a merge patch to a Thing in DDB with a single UpdateItem
+
+    Returns the changed attributes, with removed attributes set to None, and
+    the Thing's new ETag under "etag".
+    '''
+    changes = {k: v for (k, v) in patch.items() if k != 'id'}
+    update = merge_patch_update({**changes, 'etag': create_etag()})
+    update['ExpressionAttributeNames']['#payload'] = PAYLOAD_ATTRIBUTE
+    update['ExpressionAttributeNames']['#blob'] = BLOB_ATTRIBUTE
+    condition = (
+        'attribute_exists(pk) AND attribute_exists(sk) '
+        'AND attribute_not_exists(#payload) AND attribute_not_exists(#blob)'
+    )
+    # Merging objects updates nested paths, so return whole items to report the merged attributes
+    merges_maps = 'ConditionExpression' in update
+    if merges_maps:
+        condition = '{} AND {}'.format(condition, update.pop('ConditionExpression'))
+
+    ddb_update_item_args = cast('UpdateItemInputTableUpdateItemTypeDef', {
+        'Key': item_keys.to_item(),
+        'ConditionExpression': condition,
+        'ReturnValues': 'ALL_NEW' if merges_maps else 'UPDATED_NEW',
+        # Tells a Thing that must be rewritten apart from a missing one when the condition fails
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD',
+        **update
+    })
+
+    try:
+        response = DDB_TABLE.update_item(**ddb_update_item_args)
+        updated = response.get('Attributes', {})
+        if merges_maps:
+            updated = {k: updated[k] for k in (*changes, 'etag') if k in updated}
+    except DDB_TABLE.client.exceptions.ConditionalCheckFailedException as e:
+        old_item = cast(Dict[str, Any], e.response).get('Item')
+        if old_item is None:
+            raise
+        updated = _rewrite_item(ThingItem.from_item(decode_item(old_item)), changes)
+    THING_CACHE.invalidate(item_keys.pk)
+
+    return {**{k: None for (k, v) in changes.items() if v is None}, **updated}
+
+
+@profile_sampled
+@LOGGER.inject_lambda_context
+@event_source(data_class=APIGatewayProxyEvent)
+@lambda_dataclass_response
+@with_deadline
+def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
+    '''Patch function entry'''
+    log_event(LOGGER, event)
+
+    _id = event.path_parameters.get('id', '')
+    item_keys = get_keys_from_id(_id)
+    with PHASE_METRICS.phase(PHASE_PARSE):
+        patch = json.loads(event.body or '{}')
+
+    error = _validate_patch(_id, patch)
+    if error is not None:
+        output = Output(statusCode=400, body=error)
+    else:
+        try:
+            changed = _patch_item(item_keys, patch)
+        except DDB_TABLE.client.exceptions.ConditionalCheckFailedException:
+            error = ErrorResponseBody(
+                **{
+                    "error": "ThingNotfound",
+                    "message": "Thing not found"
+                }
+            )
+            output = Output(statusCode=404, body=error)
+        except PatchConflict:
+            error = ErrorResponseBody(
+                **{
+                    "error": "Conflict",
+                    "message": "Thing was changed by another request, retry the patch"
+                }
+            )
+            output = Output(statusCode=409, body=error)
+        else:
+            etag = changed.pop('etag')
+            output = Output(
+                statusCode=200,
+                body={'id': _id, **changed},
+                headers={'ETag': '"{}"'.format(etag)}
+            )
+
+    log_output(LOGGER, output)
+    return output
@@ -0,0 +1,88 @@
+'''Thing API
+
+Serves every Thing API route from one function so all routes share warm
+containers, the process wide DDB client and THING_CACHE. Requests are
+dispatched on method and resource path to the route's handler module, which
+is imported the first time the route is called so a cold start only pays for
+the handlers it serves.
+
+Deployed with the handlers directory as its code so the route handlers can be
+imported as packages; see the ApiDeploymentMode parameter in template.yaml.
+'''
+
+import importlib
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Dict, Tuple
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.util.aws import prewarm_dynamodb_client
+from common.util.serialization import to_response
+
+LOGGER = Logger(utc=True)
+
+# Route handlers are imported on their first request, so the shared client is
+# warmed here to keep its setup in the init phase
+prewarm_dynamodb_client()
+
+# (method, resource) to the handler package serving it
+ROUTES: Dict[Tuple[str, str], str] = {
+    ('GET', '/v1/thing'): 'ListThingItems',
+    ('POST', '/v1/thing'): 'CreateThingItem',
+    ('POST', '/v1/thing:batch'): 'BatchCreateThingItems',
+    ('POST', '/v1/thing:batchGet'): 'BatchGetThingItems',
+    ('GET', '/v1/thing/{id}'): 'GetThingItem',
+    ('PUT', '/v1/thing/{id}'): 'UpsertThingItem',
+    ('PATCH', '/v1/thing/{id}'): 'PatchThingItem',
+    ('DELETE', '/v1/thing/{id}'): 'DeleteThingItem',
+}
+
+# Handler packages live next to this one: top level when deployed, under
+# src.handlers when imported from the repository
+_HANDLERS_PACKAGE = __name__.rsplit('.', 2)[0] if __name__.count('.') > 1 else ''
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+@dataclass
+class ErrorResponseBody():
+    '''API error response body'''
+    error: str
+    message: str
+
+
+def _load_handler(name: str) -> ModuleType:
+    '''Import a route's handler module'''
+    module = '{}.function'.format(name)
+    if _HANDLERS_PACKAGE:
+        module = '{}.{}'.format(_HANDLERS_PACKAGE, module)
+    return importlib.import_module(module)
+
+
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    '''Function entry'''
+    method = event.get('httpMethod', '')
+    resource = event.get('resource', '')
+    name = ROUTES.get((method, resource))
+
+    if name is None:
+        LOGGER.warning('No route', extra={"method": method, "resource": resource})
+        if any(route_resource == resource for (_, route_resource) in ROUTES):
+            output = Output(
+                statusCode=405,
+                body=ErrorResponseBody(**{"error": "MethodNotAllowed", "message": "Method not allowed"})
+            )
+        else:
+            output = Output(
+                statusCode=404,
+                body=ErrorResponseBody(**{"error": "RouteNotFound", "message": "Route not found"})
+            )
+        return to_response(output)
+
+    response: Dict[str, Any] = _load_handler(name).handler(event, context)
+    return response
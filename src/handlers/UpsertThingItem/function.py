@@ -1,35 +1,47 @@
 '''Create Thing'''
 
+from __future__ import annotations
+
 import json
 import os
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union, cast
 
-import boto3
 from aws_lambda_powertools.logging import Logger
 from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from mypy_boto3_dynamodb import DynamoDBServiceResource
-from mypy_boto3_dynamodb.service_resource import Table
-from mypy_boto3_dynamodb.type_defs import PutItemInputTablePutItemTypeDef
 
 from common.model.thing import ThingData, ThingItemKeys, ThingItem, get_keys_from_id
+from common.util.aws import prewarm_dynamodb_client
+from common.util.cache import THING_CACHE
+from common.util.codec import decode_item
 from common.util.dataclasses import lambda_dataclass_response
+from common.util.ddb import DdbTable
+from common.util.deadline import with_deadline
+from common.util.log import log_event, log_output
+from common.util.metrics import PHASE_METRICS, PHASE_MODEL, PHASE_PARSE
+from common.util.overflow import discard_replaced, needs_offload, offload
+from common.util.profiling import profile_sampled
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.type_defs import PutItemInputTablePutItemTypeDef
 
 LOGGER = Logger(utc=True)
 
-DDB: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
-DDB_TABLE: Table = DDB.Table(os.environ.get('DDB_TABLE_NAME', ''))
+DDB_TABLE = DdbTable(os.environ.get('DDB_TABLE_NAME', ''))
+prewarm_dynamodb_client()
 
 @dataclass
 class Output:
     '''Function response'''
     statusCode: int
-    body: str
+    body: Any
 
 @dataclass
 class ResponseBody:
     '''Successful API Response body'''
     request_id: str
+    changed: bool
 
 @dataclass
 class ErrorResponseBody():
@@ -38,46 +50,86 @@ class ErrorResponseBody():
     message: str
 
 
-def _upsert_item(item_keys: ThingItemKeys, item_data: ThingData) -> None:
-    '''Upsert a Thing in DDB'''
-    item = ThingItem(
-        **{
-            **asdict(item_keys),
-            **asdict(item_data)
-        }
+def _stored_etag(item_keys: ThingItemKeys) -> Optional[str]:
+    '''Return the etag of the stored Thing, if any'''
+    response = DDB_TABLE.get_item(
+        Key=item_keys.to_item(),
+        ProjectionExpression='etag',
+        ConsistentRead=True
     )
+    return response.get('Item', {}).get('etag')
+
+
+def _upsert_item(item_keys: ThingItemKeys, item_data: ThingData) -> bool:
+    '''Upsert a Thing in DDB
+
+    The put is skipped by DDB when the stored content hash (etag) already
+    matches the new data. A Thing large enough to be offloaded has its stored
+    etag compared first, so an unchanged one is not uploaded to the blob
+    store again. Returns whether the Thing changed.
+    '''
+    item = ThingItem.from_data(item_keys, item_data)
+    ddb_item = item.to_item()
+    if needs_offload(ddb_item):
+        if _stored_etag(item_keys) == item.etag:
+            return False
+        ddb_item = offload(item)
 
     ddb_put_item_args: PutItemInputTablePutItemTypeDef = {
-        'Item': asdict(item),
-        'ConditionExpression': 'attribute_exists(pk) AND attribute_exists(sk)'
+        'Item': ddb_item,
+        'ConditionExpression': (
+            'attribute_exists(pk) AND attribute_exists(sk) '
+            'AND (attribute_not_exists(etag) OR etag <> :etag)'
+        ),
+        'ExpressionAttributeValues': {':etag': item.etag},
+        # The replaced Thing's blob, if it was offloaded, is deleted after the put
+        'ReturnValues': 'ALL_OLD',
+        # Tells an unchanged Thing apart from a missing one when the condition fails
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
     }
 
-    DDB_TABLE.put_item(**ddb_put_item_args)
+    try:
+        response = DDB_TABLE.put_item(**ddb_put_item_args)
+    except DDB_TABLE.client.exceptions.ConditionalCheckFailedException as e:
+        if 'Item' not in e.response:
+            # Nothing points at a blob offloaded for a missing Thing
+            discard_replaced(ddb_item)
+            raise
+        # The Thing already holds this data, eg. written since its etag was
+        # compared; a blob offloaded for it is kept only if the Thing points at it
+        discard_replaced(ddb_item, decode_item(cast(Dict[str, Any], e.response)['Item']))
+        return False
 
-    return
+    discard_replaced(response.get('Attributes'), ddb_item)
+    THING_CACHE.invalidate(item_keys.pk)
+    return True
 
 
+@profile_sampled
 @LOGGER.inject_lambda_context
 @event_source(data_class=APIGatewayProxyEvent)
 @lambda_dataclass_response
+@with_deadline
 def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
     '''Upsert function entry'''
-    LOGGER.debug('Event', extra={"message_object": event.raw_event})
+    log_event(LOGGER, event)
 
-    body = event.body or '{}'
     _id = event.path_parameters.get('id', '')
     item_keys = get_keys_from_id(_id)
-    item_data = ThingData(
-        **json.loads(body),
-    )
+    with PHASE_METRICS.phase(PHASE_PARSE):
+        body = json.loads(event.body or '{}')
+    with PHASE_METRICS.phase(PHASE_MODEL):
+        item_data = ThingData.from_dict(body)
 
+    status_code = 201
     if item_data.id == _id:
-        _upsert_item(item_keys, item_data)
+        changed = _upsert_item(item_keys, item_data)
+        if not changed:
+            status_code = 200
 
-        response_body = ResponseBody(
-            **{
-                "request_id": context.aws_request_id
-            }
+        response_body: Union[ResponseBody, ErrorResponseBody] = ResponseBody(
+            request_id=context.aws_request_id,
+            changed=changed
         )
     else:
         response_body = ErrorResponseBody(
@@ -87,7 +139,7 @@ def handler(event: APIGatewayProxyEvent, context: LambdaContext) -> Output:
             }
         )
 
-    output = Output(statusCode=201, body=json.dumps(asdict(response_body)))
+    output = Output(statusCode=status_code, body=response_body)
 
-    LOGGER.debug('Output', extra={"message_object": asdict(output)})
+    log_output(LOGGER, output)
     return output
\ No newline at end of file
@@ -0,0 +1,108 @@
+'''Test common.cli.export'''
+
+from dataclasses import asdict
+import gzip
+import json
+import os
+from typing import Generator
+
+import pytest
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+
+from common.cli import export
+from common.model.thing import ThingItem, get_keys_from_id
+from common.util.ddb import DdbTable
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'pk',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'sk',
+                'KeyType': 'RANGE'
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'pk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'sk',
+                'AttributeType': 'S'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+    yield ddb_table
+
+
+### Tests
+def test_export_table(mock_ddb_table_client: DdbTable, tmp_path):
+    '''Test every Thing is exported exactly once across the part files'''
+    ids = [str(i) for i in range(50)]
+    for _id in ids:
+        keys = get_keys_from_id(_id)
+        mock_ddb_table_client.put_item(Item=asdict(ThingItem(**{**asdict(keys), 'id': _id})))
+    # Items outside the collection are not exported
+    mock_ddb_table_client.put_item(Item={'pk': 'other#1', 'sk': 'other#1'})
+
+    manifest = export.export_table(mock_ddb_table_client.name, str(tmp_path), total_segments=3, page_size=7)
+
+    assert manifest.records == len(ids)
+    assert [part.segment for part in manifest.parts] == [0, 1, 2]
+
+    exported = []
+    for part in manifest.parts:
+        with gzip.open(os.path.join(tmp_path, part.file), 'rt') as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == part.records
+        exported.extend(records)
+    assert sorted(record['id'] for record in exported) == sorted(ids)
+
+    with open(os.path.join(tmp_path, export.MANIFEST_NAME)) as f:
+        assert json.load(f) == asdict(manifest)
+
+
+def test_main(mock_ddb_table_client: DdbTable, tmp_path):
+    '''Test the CLI entry'''
+    rc = export.main([
+        '--table-name', mock_ddb_table_client.name,
+        '--output-dir', str(tmp_path),
+        '--segments', '2'
+    ])
+
+    assert rc == 0
+    assert sorted(os.listdir(tmp_path)) == [export.MANIFEST_NAME, 'part-00000.ndjson.gz', 'part-00001.ndjson.gz']
@@ -0,0 +1,232 @@
+'''Test common.cli.load'''
+
+import gzip
+import io
+import json
+import os
+from typing import Generator
+
+import pytest
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+from pytest_mock import MockerFixture
+
+from common.cli import load
+from common.model.thing import get_keys_from_id
+from common.util.batch import AdaptiveRateLimiter
+from common.util.ddb import DdbTable
+
+SCHEMA = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'data', 'common', 'thing-data.schema.json')
+
+
+def _ndjson(tmp_path, records, name='things.ndjson') -> str:
+    '''Write records as NDJSON and return the path'''
+    path = os.path.join(tmp_path, name)
+    opener = gzip.open if name.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        for record in records:
+            f.write((record if isinstance(record, str) else json.dumps(record)) + '\n')
+    return path
+
+
+def _ids(table: DdbTable):
+    '''Return the ids of every item in the table'''
+    return sorted(item['id'] for item in table.scan()['Items'])
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'pk',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'sk',
+                'KeyType': 'RANGE'
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'pk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'sk',
+                'AttributeType': 'S'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+    yield ddb_table
+
+@pytest.fixture()
+def writer(mock_ddb_table_client: DdbTable, mocker: MockerFixture) -> load.Writer:
+    '''Return a writer that is not rate limited and does not back off'''
+    mocker.patch.object(load, 'backoff_delay', return_value=0)
+    limiter = AdaptiveRateLimiter(1e6, max_rate=1e6)
+    return load.Writer(mock_ddb_table_client.name, limiter, load.Rejects(None))
+
+
+### Tests
+def test_read_records_csv():
+    '''Test CSV rows become records without their empty cells'''
+    source = io.StringIO('id,name,color\n1,one,\n2,two,blue\n3,three,red,extra\n')
+
+    records = list(load.read_records(source, 'csv', skip=1))
+
+    assert records[0] == (1, {'id': '2', 'name': 'two', 'color': 'blue'})
+    assert records[1][0] == 2
+    assert isinstance(records[1][1], ValueError)
+
+
+def test_batches_cover_input_without_gaps():
+    '''Test batches are contiguous, split at the item limit and on repeated keys'''
+    records = [(0, {'id': 'a'}), (2, {'id': 'b'}), (3, {'id': 'a'})] + [(i, {'id': str(i)}) for i in range(4, 30)]
+    rejects = load.Rejects(None)
+
+    result = list(load.batches(iter(records), 0, lambda record: None, rejects))
+
+    assert [(batch.start, batch.end) for batch in result] == [(0, 3), (3, 28), (28, 30)]
+    assert [len(batch.entries) for batch in result] == [2, 25, 2]
+
+
+def test_main_loads_ndjson(mock_ddb_table_client: DdbTable, tmp_path):
+    '''Test valid records are loaded, keeping their ids, and invalid ones rejected'''
+    records = [{'id': str(i), 'name': 'thing {}'.format(i)} for i in range(60)]
+    records += [{'name': 'no id'}, {'id': 1}, 'not json', '']
+    path = _ndjson(tmp_path, records, 'things.ndjson.gz')
+    rejects = os.path.join(tmp_path, 'rejects.ndjson')
+
+    rc = load.main([
+        path,
+        '--table-name', mock_ddb_table_client.name,
+        '--schema', SCHEMA,
+        '--rejects', rejects,
+        '--workers', '3'
+    ])
+
+    assert rc == 0
+    ids = _ids(mock_ddb_table_client)
+    assert len(ids) == 61
+    assert set(str(i) for i in range(60)) <= set(ids)
+    item = mock_ddb_table_client.get_item(Key={'pk': get_keys_from_id('7').pk, 'sk': get_keys_from_id('7').sk})['Item']
+    assert item['name'] == 'thing 7'
+
+    with open(rejects) as f:
+        rejected = [json.loads(line) for line in f]
+    assert [r['index'] for r in rejected] == [61, 62]
+
+
+def test_default_schema_is_packaged(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    '''Test records are validated against the packaged Thing data schema from any working directory'''
+    with open(SCHEMA) as f:
+        schema = json.load(f)
+    assert json.loads(load.files('common').joinpath(load.DEFAULT_SCHEMA).read_text()) == schema
+
+    monkeypatch.chdir(tmp_path)
+    validate = load.load_validator()
+
+    assert validate({'id': '1'}) is None
+    assert validate({'id': 1}) is not None
+
+
+def test_load_resumes_from_checkpoint(writer: load.Writer, mock_ddb_table_client: DdbTable, tmp_path):
+    '''Test a load that fails part way resumes after the last record written'''
+    path = _ndjson(tmp_path, [{'id': str(i)} for i in range(100)])
+    checkpoint_path = os.path.join(tmp_path, 'checkpoint.json')
+    write = writer.write
+    calls = []
+
+    def flaky_write(batch):
+        calls.append(batch.start)
+        if len(calls) == 3:
+            raise RuntimeError('crash')
+        return write(batch)
+
+    writer.write = flaky_write
+    with pytest.raises(RuntimeError):
+        with open(path) as source:
+            load.load(source, 'ndjson', writer, lambda record: None, load.Checkpoint(path), workers=1,
+                      checkpoint_path=checkpoint_path)
+
+    checkpoint = load.read_checkpoint(checkpoint_path, path)
+    assert checkpoint.position == 50
+    assert checkpoint.written == 50
+    assert not checkpoint.finished
+
+    writer.write = write
+    with open(path) as source:
+        final = load.load(source, 'ndjson', writer, lambda record: None, checkpoint, workers=2,
+                          checkpoint_path=checkpoint_path)
+
+    assert final.position == 100
+    assert final.written == 100
+    assert final.finished
+    assert _ids(mock_ddb_table_client) == sorted(str(i) for i in range(100))
+
+
+def test_checkpoint_is_for_one_source(tmp_path):
+    '''Test a checkpoint is not used for another input'''
+    checkpoint_path = os.path.join(tmp_path, 'checkpoint.json')
+    load.save_checkpoint(checkpoint_path, load.Checkpoint('a.ndjson', position=10))
+
+    assert load.read_checkpoint(checkpoint_path, 'a.ndjson').position == 10
+    with pytest.raises(SystemExit):
+        load.read_checkpoint(checkpoint_path, 'b.ndjson')
+
+
+def test_writer_backs_off_when_throttled(writer: load.Writer, mock_ddb_table_client: DdbTable, mocker: MockerFixture):
+    '''Test unprocessed items are retried and slow the write rate down'''
+    batch = load.Batch(0, 2, [
+        load.Entry(0, {'id': 'a'}, {'pk': 'thing#a', 'sk': 'thing#a', 'id': 'a'}),
+        load.Entry(1, {'id': 'b'}, {'pk': 'thing#b', 'sk': 'thing#b', 'id': 'b'}),
+    ])
+    table = writer._table()
+    batch_write_item = table.batch_write_item
+    calls = []
+
+    def throttle_first(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) == 1:
+            # Only the first item is processed
+            batch_write_item(RequestItems={mock_ddb_table_client.name: RequestItems[mock_ddb_table_client.name][:1]})
+            return {'UnprocessedItems': {mock_ddb_table_client.name: RequestItems[mock_ddb_table_client.name][1:]}}
+        return batch_write_item(RequestItems=RequestItems)
+
+    mocker.patch.object(table, 'batch_write_item', side_effect=throttle_first)
+    rate = writer.limiter.rate
+
+    assert writer.write(batch) == 0
+
+    assert len(calls) == 2
+    assert calls[1][mock_ddb_table_client.name] == [{'PutRequest': {'Item': batch.entries[1].item}}]
+    assert writer.limiter.rate == min(rate * writer.limiter.decrease + writer.limiter.increase, writer.limiter.max_rate)
+    assert _ids(mock_ddb_table_client) == ['a', 'b']
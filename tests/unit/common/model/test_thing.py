@@ -0,0 +1,106 @@
+'''Test common.model.thing'''
+
+import pytest
+
+from common.model.thing import (
+    COLLECTION_NAME,
+    PAYLOAD_ATTRIBUTE,
+    PAYLOAD_CODEC_ATTRIBUTE,
+    TTL_ATTRIBUTE,
+    ThingData,
+    ThingItem,
+    content_hash,
+    get_keys_from_id
+)
+
+
+### Tests
+def test_thing_data_keeps_additional_attributes():
+    '''Test attributes beyond the declared fields are kept'''
+    data = ThingData.from_dict({'id': '1234', 'name': 'thing', 'tags': ['a']})
+
+    assert data.id == '1234'
+    assert data.extra == {'name': 'thing', 'tags': ['a']}
+    assert data.to_public() == {'id': '1234', 'name': 'thing', 'tags': ['a']}
+
+
+def test_thing_data_drops_reserved_attributes():
+    '''Test a Thing's data cannot set the item's keys or the table TTL'''
+    data = ThingData.from_dict(
+        {'id': '1234', 'pk': 'other#1', 'sk': 'other#1', 'collection': 'other', 'etag': 'x', TTL_ATTRIBUTE: 1600000000}
+    )
+
+    item = ThingItem.from_data(get_keys_from_id('1234'), data).to_item()
+    assert item == {
+        'pk': 'thing#1234',
+        'sk': 'thing#1234',
+        'id': '1234',
+        'collection': COLLECTION_NAME,
+        'etag': content_hash({'id': '1234'})
+    }
+
+
+def test_thing_item_round_trip():
+    '''Test a DDB item survives conversion'''
+    raw_item = {
+        'pk': 'thing#1234',
+        'sk': 'thing#1234',
+        'id': '1234',
+        'collection': COLLECTION_NAME,
+        'name': 'thing'
+    }
+    item = ThingItem.from_item(raw_item)
+
+    assert item.to_item() == raw_item
+    assert item.to_public() == {'id': '1234', 'name': 'thing'}
+    assert item.to_data() == ThingData('1234', {'name': 'thing'})
+
+
+def test_content_hash_is_stable():
+    '''Test the hash ignores key order and tracks content'''
+    assert content_hash({'id': '1', 'a': 1, 'b': 2}) == content_hash({'b': 2, 'id': '1', 'a': 1})
+    assert content_hash({'id': '1', 'a': 1}) != content_hash({'id': '1', 'a': 2})
+    assert ThingItem('thing#1', 'thing#1', '1', extra={'a': 1}).get_etag() == content_hash({'id': '1', 'a': 1})
+
+
+def test_models_are_slotted():
+    '''Test instances do not carry a __dict__'''
+    item = ThingItem('thing#1234', 'thing#1234', '1234')
+    with pytest.raises(AttributeError):
+        item.unknown = True  # type: ignore[attr-defined]
+
+
+def test_thing_item_compresses_large_extra_attributes():
+    '''Test extra attributes over the threshold are packed and unpacked'''
+    extra = {'description': 'lorem ipsum ' * 200, 'count': 3}
+    item = ThingItem('thing#1234', 'thing#1234', '1234', extra=extra)
+
+    packed = item.to_item(compression_threshold=1024)
+    assert set(packed) == {'pk', 'sk', 'id', 'collection', PAYLOAD_ATTRIBUTE, PAYLOAD_CODEC_ATTRIBUTE}
+    assert len(packed[PAYLOAD_ATTRIBUTE]) < 1024
+    assert ThingItem.from_item(packed).to_public() == {'id': '1234', **extra}
+
+
+def test_thing_item_keeps_small_extra_attributes_plain():
+    '''Test items under the threshold or with compression disabled are not packed'''
+    item = ThingItem('thing#1234', 'thing#1234', '1234', extra={'name': 'thing'})
+
+    assert item.to_item(compression_threshold=1024)['name'] == 'thing'
+    assert item.to_item(compression_threshold=0)['name'] == 'thing'
+
+
+def test_thing_item_prefers_attributes_written_after_packing():
+    '''Test plain attributes override the payload they were written alongside'''
+    item = ThingItem('thing#1234', 'thing#1234', '1234', extra={'name': 'old ' * 500}).to_item(compression_threshold=16)
+    item['name'] = 'new'
+
+    assert ThingItem.from_item(item).extra == {'name': 'new'}
+
+
+def test_thing_item_rejects_unknown_payload_codec():
+    '''Test payloads from a newer codec are not misread'''
+    item = ThingItem('thing#1234', 'thing#1234', '1234', extra={'name': 'x' * 500}).to_item(compression_threshold=16)
+    item[PAYLOAD_CODEC_ATTRIBUTE] = 99
+
+    with pytest.raises(ValueError):
+        ThingItem.from_item(item)
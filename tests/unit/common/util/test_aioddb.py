@@ -0,0 +1,178 @@
+'''Test common.util.aioddb'''
+
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from common.test.aws.ddb import LatencyDynamoDBClient
+from common.util import aioddb
+from common.util.aioddb import AsyncDdbTable, run
+from common.util.ddb import DdbTable
+from common.util.deadline import DEADLINE, DeadlineExceeded
+
+LATENCY = 0.05
+
+
+def _items(count: int) -> List[Dict[str, Any]]:
+    '''Return count items'''
+    return [{'pk': str(i), 'sk': str(i), 'value': i} for i in range(count)]
+
+
+def _keys(count: int) -> List[Dict[str, Any]]:
+    '''Return the keys of count items'''
+    return [{'pk': str(i), 'sk': str(i)} for i in range(count)]
+
+
+def _elapsed(coro) -> float:
+    '''Return the seconds taken to run coro'''
+    start = time.perf_counter()
+    run(coro)
+    return time.perf_counter() - start
+
+
+### Fixtures
+@pytest.fixture()
+def client() -> LatencyDynamoDBClient:
+    '''A client whose every call takes LATENCY seconds'''
+    return LatencyDynamoDBClient(latency=LATENCY)
+
+
+@pytest.fixture()
+def table(client) -> DdbTable:
+    '''A table on the latency client'''
+    return DdbTable('MockDdbTable', client)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(mocker):
+    '''Retry without sleeping'''
+    mocker.patch.object(aioddb, 'backoff_delay', return_value=0)
+
+
+### Tests
+def test_put_get_delete_many(table):
+    '''Test items round trip through chunked requests'''
+    async_table = AsyncDdbTable(table)
+
+    assert run(async_table.put_many(_items(120))) == []
+    (found, unprocessed) = run(async_table.get_many(_keys(150)))
+    assert sorted(item['value'] for item in found) == list(range(120))
+    assert unprocessed == []
+
+    assert run(async_table.delete_many(_keys(60))) == []
+    (found, _) = run(async_table.get_many(_keys(150)))
+    assert len(found) == 60
+
+
+def test_run_reuses_event_loop():
+    '''Test every run uses the same event loop'''
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run(current_loop()) is run(current_loop())
+
+
+def test_concurrency_is_bounded(client, table):
+    '''Test no more than max_concurrency requests are in flight'''
+    run(AsyncDdbTable(table, max_concurrency=3).put_many(_items(250)))
+
+    assert client.calls == 10
+    assert client.max_in_flight == 3
+
+
+def test_concurrent_chunks_scale_near_linearly(table):
+    '''Test chunks run in parallel rather than one after another'''
+    chunks = 8
+    sequential = _elapsed(AsyncDdbTable(table, max_concurrency=1).put_many(_items(25 * chunks)))
+    concurrent = _elapsed(AsyncDdbTable(table, max_concurrency=chunks).put_many(_items(25 * chunks)))
+
+    assert sequential >= LATENCY * chunks
+    # Ideal is LATENCY, leave headroom for scheduling on a busy machine
+    assert concurrent < LATENCY * chunks / 3
+
+
+def test_get_many_returns_unprocessed_keys(mocker, table):
+    '''Test keys never processed are returned after max_attempts'''
+    keys = _keys(1)
+    mocker.patch.object(
+        table,
+        'batch_get_item',
+        return_value={'Responses': {}, 'UnprocessedKeys': {table.name: {'Keys': keys}}}
+    )
+
+    (found, unprocessed) = run(AsyncDdbTable(table, max_attempts=3).get_many(keys))
+
+    assert found == []
+    assert unprocessed == keys
+    assert table.batch_get_item.call_count == 3
+
+
+
+def test_get_many_stops_retrying_at_deadline(mocker, table):
+    '''Test unprocessed keys are returned rather than retried past the request deadline'''
+    keys = _keys(1)
+    mocker.patch.object(
+        table,
+        'batch_get_item',
+        return_value={'Responses': {}, 'UnprocessedKeys': {table.name: {'Keys': keys}}}
+    )
+    mocker.patch.object(aioddb, 'backoff_delay', return_value=1.0)
+    DEADLINE.start(1500, reserve_ms=500)
+    try:
+        (found, unprocessed) = run(AsyncDdbTable(table, max_attempts=3).get_many(keys))
+    finally:
+        DEADLINE.clear()
+
+    assert unprocessed == keys
+    assert table.batch_get_item.call_count == 1
+
+def test_put_many_reports_failures(mocker, table):
+    '''Test unprocessed and rejected items are returned with their error'''
+    items = _items(30)
+    error = ClientError({'Error': {'Code': 'ValidationException', 'Message': 'bad'}}, 'BatchWriteItem')
+    unprocessed = {'UnprocessedItems': {table.name: [{'PutRequest': {'Item': items[0]}}]}}
+    mocker.patch.object(table, 'batch_write_item', side_effect=[unprocessed, unprocessed, error])
+
+    failures = run(AsyncDdbTable(table, max_concurrency=1, max_attempts=2).put_many(items))
+
+    assert failures == [(items[0], 'UnprocessedItem')] + [(item, 'ValidationException') for item in items[25:]]
+
+
+def test_put_many_reports_connection_failures(mocker, table):
+    '''Test chunks that fail to reach DynamoDB, or run out of time, report every item'''
+    items = _items(30)
+    connection_error = EndpointConnectionError(endpoint_url='https://dynamodb.us-east-1.amazonaws.com')
+    mocker.patch.object(table, 'batch_write_item', side_effect=[connection_error, DeadlineExceeded('0ms left')])
+
+    failures = run(AsyncDdbTable(table, max_concurrency=1).put_many(items))
+
+    assert failures == [(item, 'EndpointConnectionError') for item in items[:25]] + [(item, 'DeadlineExceeded') for item in items[25:]]
+
+
+def test_failed_run_leaves_no_tasks(client, table, mocker):
+    '''Test chunks still waiting when one fails are cancelled rather than run by a later call'''
+    batch_get_item = table.batch_get_item
+    calls: List[int] = []
+
+    def fail_first(**kwargs):
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return batch_get_item(**kwargs)
+
+    mocker.patch.object(table, 'batch_get_item', side_effect=fail_first)
+
+    with pytest.raises(RuntimeError):
+        run(AsyncDdbTable(table, max_concurrency=1).get_many(_keys(300)))
+
+    assert not [task for task in asyncio.all_tasks(aioddb._LOOP) if not task.done()]
+    # A request already sent by a worker thread cannot be cancelled, let it finish
+    time.sleep(LATENCY * 2)
+    sent = len(calls)
+    assert sent <= 2
+
+    run(asyncio.sleep(LATENCY * 2))
+    assert len(calls) == sent
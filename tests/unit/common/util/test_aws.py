@@ -0,0 +1,98 @@
+'''Test common.util.aws'''
+
+import os
+
+import pytest
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+from moto import mock_aws
+from pytest_mock import MockerFixture
+
+from common.util import aws
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def prewarm(mocked_aws, mocker: MockerFixture):
+    '''Enable prewarming with fresh process wide caches'''
+    mocker.patch.object(aws, 'PREWARM', True)
+    aws.get_dynamodb_client.cache_clear()
+    aws.prewarm_dynamodb_client.cache_clear()
+    yield
+    aws.get_dynamodb_client.cache_clear()
+    aws.prewarm_dynamodb_client.cache_clear()
+
+
+### Tests
+def test_client_uses_function_region(mocked_aws, mocker: MockerFixture):
+    '''Test clients are created in the Lambda region rather than a fixed one'''
+    mocker.patch.dict(os.environ, {'AWS_REGION': 'eu-west-1'})
+
+    assert aws.create_dynamodb_client().meta.region_name == 'eu-west-1'
+    assert aws.create_dynamodb_client('us-west-2').meta.region_name == 'us-west-2'
+
+
+def test_client_config(mocked_aws):
+    '''Test clients get the configured timeouts, retries and connection pool'''
+    config = aws.create_dynamodb_client().meta.config
+
+    assert config.connect_timeout == aws.CONNECT_TIMEOUT_SECONDS
+    assert config.read_timeout == aws.READ_TIMEOUT_SECONDS
+    assert config.retries == {'mode': 'adaptive', 'total_max_attempts': aws.MAX_ATTEMPTS}
+    assert config.tcp_keepalive is True
+    assert config.max_pool_connections == aws.MAX_POOL_CONNECTIONS
+
+
+def test_prewarm_runs_once(prewarm, mocker: MockerFixture):
+    '''Test prewarming opens the shared client's connection once and logs the init time'''
+    client = aws.get_dynamodb_client()
+    describe_endpoints = mocker.patch.object(client, 'describe_endpoints')
+    info = mocker.patch.object(aws.LOGGER, 'info')
+
+    aws.prewarm_dynamodb_client()
+    aws.prewarm_dynamodb_client()
+
+    describe_endpoints.assert_called_once_with()
+    info.assert_called_once()
+    assert set(info.call_args.kwargs['extra']) == {'client_init_ms', 'prewarm_ms', 'init_ms'}
+
+
+@pytest.mark.parametrize('error, warned', [
+    (ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'DescribeEndpoints'), False),
+    (EndpointConnectionError(endpoint_url='https://dynamodb.us-east-1.amazonaws.com'), True),
+])
+def test_prewarm_failure_is_not_fatal(prewarm, mocker: MockerFixture, error, warned):
+    '''Test a failed prewarm request does not raise, and only a connection failure is logged'''
+    client = aws.get_dynamodb_client()
+    mocker.patch.object(client, 'describe_endpoints', side_effect=error)
+    warning = mocker.patch.object(aws.LOGGER, 'warning')
+
+    aws.prewarm_dynamodb_client()
+
+    assert warning.called == warned
+
+
+def test_prewarm_disabled(mocked_aws, mocker: MockerFixture):
+    '''Test nothing is created when prewarming is off'''
+    aws.prewarm_dynamodb_client.cache_clear()
+    get_client = mocker.patch.object(aws, 'get_dynamodb_client')
+
+    aws.prewarm_dynamodb_client()
+
+    get_client.assert_not_called()
+    aws.prewarm_dynamodb_client.cache_clear()
@@ -0,0 +1,55 @@
+'''Test common.util.batch'''
+
+from typing import List
+
+from common.util.batch import AdaptiveRateLimiter
+
+
+class FakeClock:
+    '''A clock that only moves when slept on'''
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+### Tests
+def test_limiter_paces_writes():
+    '''Test items are spread out at the current rate with at most one second of burst'''
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(100, clock=clock, sleep=clock.sleep)
+
+    for _ in range(8):
+        limiter.acquire(25)
+    # Each request of 25 items at 100 items/s waits 0.25s for the one before it
+    assert clock.now == 1.75
+
+    # Idle time banks at most one second of writes
+    clock.now += 10
+    start = clock.now
+    for _ in range(6):
+        limiter.acquire(25)
+    assert clock.now - start == 0.25
+
+
+def test_limiter_adapts_rate():
+    '''Test the rate grows additively and shrinks multiplicatively within its bounds'''
+    limiter = AdaptiveRateLimiter(100, min_rate=30, max_rate=110, increase=5, decrease=0.5)
+
+    limiter.succeeded()
+    assert limiter.rate == 105
+    limiter.succeeded()
+    limiter.succeeded()
+    assert limiter.rate == 110
+
+    limiter.throttled()
+    assert limiter.rate == 55
+    limiter.throttled()
+    assert limiter.rate == 30
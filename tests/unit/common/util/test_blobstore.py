@@ -0,0 +1,62 @@
+'''Test common.util.blobstore'''
+
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from common.util.blobstore import BlobNotFoundError, LocalBlobStore, S3BlobStore
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials():
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+
+@pytest.fixture()
+def mock_s3_store(aws_credentials):
+    '''Return an S3BlobStore on a mocked bucket'''
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket='things')
+        yield S3BlobStore('things', 'blobs/', client)
+
+
+### Tests
+def test_local_round_trip(tmp_path):
+    '''Test blobs are streamed back in chunks and deleted'''
+    store = LocalBlobStore(str(tmp_path))
+    store.put('a/b.json', b'0123456789')
+
+    assert list(store.stream('a/b.json', chunk_size=4)) == [b'0123', b'4567', b'89']
+
+    store.delete('a/b.json')
+    store.delete('a/b.json')
+    with pytest.raises(BlobNotFoundError):
+        list(store.stream('a/b.json'))
+
+
+def test_local_rejects_keys_outside_root(tmp_path):
+    '''Test keys cannot address files outside the store root'''
+    store = LocalBlobStore(str(tmp_path / 'blobs'))
+    with pytest.raises(ValueError):
+        store.put('../escape.json', b'{}')
+
+
+def test_s3_round_trip(mock_s3_store):
+    '''Test blobs are stored under the prefix, streamed back and deleted'''
+    mock_s3_store.put('a/b.json', b'0123456789')
+
+    assert mock_s3_store.client.get_object(Bucket='things', Key='blobs/a/b.json')['Body'].read() == b'0123456789'
+    assert b''.join(mock_s3_store.stream('a/b.json', chunk_size=4)) == b'0123456789'
+
+    mock_s3_store.delete('a/b.json')
+    with pytest.raises(BlobNotFoundError):
+        list(mock_s3_store.stream('a/b.json'))
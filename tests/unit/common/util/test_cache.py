@@ -0,0 +1,81 @@
+'''Test common.util.cache'''
+
+from common.util.cache import LruTtlCache
+
+
+class FakeClock:
+    '''Manually advanced clock'''
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+### Tests
+def test_get_and_set():
+    '''Test cached values are returned and counted'''
+    cache: LruTtlCache[str] = LruTtlCache(capacity=2, ttl=10)
+    assert cache.get('a') is None
+    cache.set('a', 'A')
+
+    assert cache.get('a') == 'A'
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_evicts_least_recently_used():
+    '''Test the least recently used entry is evicted when full'''
+    cache: LruTtlCache[str] = LruTtlCache(capacity=2, ttl=10)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    cache.get('a')
+    cache.set('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.stats.evictions == 1
+
+
+def test_entries_expire():
+    '''Test entries are dropped once their TTL passes'''
+    clock = FakeClock()
+    cache: LruTtlCache[str] = LruTtlCache(capacity=2, ttl=10, clock=clock)
+    cache.set('a', 'A')
+
+    clock.now = 9.9
+    assert cache.get('a') == 'A'
+    clock.now = 10
+    assert cache.get('a') is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    '''Test invalidated entries are dropped'''
+    cache: LruTtlCache[str] = LruTtlCache(capacity=2, ttl=10)
+    cache.set('a', 'A')
+    cache.invalidate('a')
+    cache.invalidate('missing')
+
+    assert cache.get('a') is None
+
+
+def test_zero_capacity_disables_cache():
+    '''Test a zero capacity cache stores nothing'''
+    cache: LruTtlCache[str] = LruTtlCache(capacity=0, ttl=10)
+    cache.set('a', 'A')
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_from_environment(monkeypatch):
+    '''Test configuration is read from the environment'''
+    monkeypatch.setenv('TEST_CACHE_CAPACITY', '5')
+    monkeypatch.setenv('TEST_CACHE_TTL_SECONDS', '1.5')
+    cache: LruTtlCache[str] = LruTtlCache.from_environment('TEST_CACHE')
+
+    assert cache.capacity == 5
+    assert cache.ttl == 1.5
@@ -0,0 +1,54 @@
+'''Test common.util.codec'''
+
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from common.util.codec import decode_item, deserialize, encode_item, serialize
+
+
+### Tests
+def test_round_trip():
+    '''Test an item survives encoding and decoding'''
+    item = {
+        'pk': 'thing#1',
+        'count': 3,
+        'ratio': 0.5,
+        'enabled': True,
+        'nothing': None,
+        'tags': ['a', 1, {'nested': 'b'}],
+        'attrs': {'x': 1},
+        'blob': b'\x00\x01',
+    }
+    assert decode_item(encode_item(item)) == item
+
+
+def test_matches_boto3_serializer():
+    '''Test encoding matches boto3's TypeSerializer for common values'''
+    boto3_serializer = TypeSerializer()
+    for value in ['s', 1, Decimal('1.5'), True, None, ['a', 1], {'k': 'v'}, b'b', {'a', 'b'}]:
+        expected = boto3_serializer.serialize(value)
+        actual = serialize(value)
+        if 'SS' in expected:
+            assert sorted(actual['SS']) == sorted(expected['SS'])
+        else:
+            assert actual == expected
+
+
+def test_numbers_decode_as_int_or_float():
+    '''Test N values decode to JSON safe numbers'''
+    assert deserialize({'N': '10'}) == 10
+    assert isinstance(deserialize({'N': '10'}), int)
+    assert deserialize({'N': '1.25'}) == 1.25
+    assert deserialize({'N': '1E+2'}) == 100.0
+
+
+def test_serialize_rejects_unsupported_values():
+    '''Test values DDB cannot store are rejected'''
+    with pytest.raises(TypeError):
+        serialize(float('nan'))
+    with pytest.raises(TypeError):
+        serialize(set())
+    with pytest.raises(TypeError):
+        serialize(object())
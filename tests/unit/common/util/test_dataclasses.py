@@ -0,0 +1,37 @@
+'''Test common.util.dataclasses'''
+
+import base64
+from dataclasses import dataclass
+from typing import Any
+
+from aws_lambda_powertools.utilities.data_classes import event_source, APIGatewayProxyEvent
+
+from common.test.aws import create_lambda_function_context
+from common.util.dataclasses import lambda_dataclass_response
+
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+
+@event_source(data_class=APIGatewayProxyEvent)
+@lambda_dataclass_response
+def echo_handler(event: APIGatewayProxyEvent, context) -> Output:
+    '''Return the request body'''
+    return Output(statusCode=200, body={'body': event.body, 'isBase64Encoded': event.is_base64_encoded})
+
+
+### Tests
+def test_decodes_base64_request_bodies():
+    '''Test base64 encoded request bodies reach the handler decoded'''
+    event = {
+        'body': base64.b64encode(b'{"id":"1234"}').decode('ascii'),
+        'isBase64Encoded': True,
+        'headers': {}
+    }
+    response = echo_handler(event, create_lambda_function_context('echo'))
+
+    assert response == {'statusCode': 200, 'body': '{"body":"{\\"id\\":\\"1234\\"}","isBase64Encoded":false}'}
@@ -0,0 +1,198 @@
+'''Test common.util.deadline'''
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Generator, List
+
+import pytest
+
+from botocore.exceptions import ReadTimeoutError
+from moto import mock_aws
+from pytest_mock import MockerFixture
+
+from common.test.aws import create_lambda_function_context
+from common.util import aws, deadline
+from common.util.aws import client_config, create_dynamodb_client
+from common.util.deadline import DEADLINE, Deadline, DeadlineExceeded, with_deadline
+
+
+class FakeClock:
+    '''A clock that only moves when told to'''
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeHttpResponse:
+    '''The part of a botocore HTTP response the retry check reads'''
+
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+
+
+class StalledDynamoDB(BaseHTTPRequestHandler):
+    '''Answers every request after longer than any test waits'''
+
+    def do_POST(self) -> None:
+        time.sleep(2)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def _needs_retry(attempts: int, status_code: int, code: str) -> None:
+    '''Run the retry check on a failed attempt of a client with the default config'''
+    deadline._needs_retry(
+        attempts=attempts,
+        request_dict={'context': {'client_config': client_config()}},
+        response=(FakeHttpResponse(status_code), {'Error': {'Code': code}}),
+    )
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def clock(mocker: MockerFixture) -> Generator[FakeClock, None, None]:
+    '''Run DEADLINE on a fake clock'''
+    clock = FakeClock()
+    mocker.patch.object(DEADLINE, '_clock', clock)
+    yield clock
+    DEADLINE.clear()
+
+
+@pytest.fixture()
+def stalled_endpoint_url() -> Generator[str, None, None]:
+    '''URL of a local endpoint that never answers in time'''
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StalledDynamoDB)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+### Tests
+def test_deadline_keeps_reserve():
+    '''Test the deadline leaves the reserve free and only allows attempts that fit'''
+    clock = FakeClock()
+    request_deadline = Deadline(clock)
+    assert request_deadline.remaining() is None
+    assert request_deadline.allows(60)
+
+    request_deadline.start(2000, reserve_ms=500)
+    clock.now = 1.0
+
+    assert request_deadline.remaining() == 0.5
+    assert request_deadline.allows(0.4)
+    assert not request_deadline.allows(0.41)
+    with pytest.raises(DeadlineExceeded):
+        request_deadline.check(0.41)
+
+
+def test_read_timeout_is_cut_to_deadline(mocked_aws, clock: FakeClock):
+    '''Test each attempt's read timeout is the lesser of the client's and the time left'''
+    client = create_dynamodb_client()
+    read_timeouts: List[float] = []
+    client.meta.events.register('before-send', lambda request, **kwargs: read_timeouts.append(request.context.get('read_timeout')))
+
+    client.list_tables()
+    DEADLINE.start(1500, reserve_ms=500)
+    client.list_tables()
+    DEADLINE.start(10000, reserve_ms=500)
+    client.list_tables()
+
+    assert read_timeouts == [None, 1.0, client.meta.config.read_timeout]
+
+
+def test_no_attempt_without_time_left(mocked_aws, clock: FakeClock, mocker: MockerFixture):
+    '''Test a request is not sent once the deadline has passed'''
+    client = create_dynamodb_client()
+    sent = mocker.Mock(return_value=None)
+    client.meta.events.register('before-send', sent)
+    DEADLINE.start(1000, reserve_ms=500)
+    clock.now = 0.45
+
+    with pytest.raises(DeadlineExceeded):
+        client.list_tables()
+    sent.assert_not_called()
+
+
+def test_retry_needs_time_for_backoff(clock: FakeClock):
+    '''Test a throttled or failed attempt is only retried when the longest backoff fits'''
+    DEADLINE.start(1500, reserve_ms=500)
+
+    # Up to 1s of backoff and the minimum attempt do not fit in 1s
+    with pytest.raises(DeadlineExceeded):
+        _needs_retry(1, 400, 'ProvisionedThroughputExceededException')
+    with pytest.raises(DeadlineExceeded) as e:
+        deadline._needs_retry(
+            attempts=1,
+            request_dict={'context': {'client_config': client_config()}},
+            caught_exception=ReadTimeoutError(endpoint_url='https://dynamodb.us-east-1.amazonaws.com')
+        )
+    assert isinstance(e.value.__cause__, ReadTimeoutError)
+
+    # Errors that are not retried, and a last attempt with time left, are left to botocore
+    _needs_retry(1, 400, 'ConditionalCheckFailedException')
+    _needs_retry(client_config().retries['total_max_attempts'], 500, 'InternalServerError')
+
+    DEADLINE.start(5000, reserve_ms=500)
+    _needs_retry(1, 500, 'InternalServerError')
+
+
+def test_with_deadline_answers_503(clock: FakeClock):
+    '''Test a handler out of time is answered 503 with Retry-After, and the deadline cleared'''
+    seen = []
+
+    @with_deadline
+    def handler(event, context):
+        seen.append(DEADLINE.remaining())
+        raise DeadlineExceeded('0ms left of the request deadline')
+
+    output = handler({}, create_lambda_function_context('Fn', remaining_time_in_millis=3000))
+
+    assert seen == [3000 / 1000 - deadline.RESERVE_MS / 1000]
+    assert output.statusCode == 503
+    assert output.headers == {'Retry-After': str(deadline.RETRY_AFTER_SECONDS)}
+    assert output.body['error'] == 'DeadlineExceeded'
+    assert DEADLINE.expires_at is None
+
+
+def test_last_attempt_timing_out_at_deadline_answers_503(
+    aws_credentials,
+    stalled_endpoint_url: str,
+    mocker: MockerFixture
+):
+    '''Test a last attempt whose read timeout was cut to the deadline ends in a 503, not a timeout error'''
+    mocker.patch.object(aws, 'MAX_ATTEMPTS', 1)
+    client = create_dynamodb_client(endpoint_url=stalled_endpoint_url)
+
+    @with_deadline
+    def handler(event, context):
+        client.list_tables()
+
+    start = time.monotonic()
+    output = handler({}, create_lambda_function_context('Fn', remaining_time_in_millis=deadline.RESERVE_MS + 300))
+
+    assert output.statusCode == 503
+    assert isinstance(output, deadline.Output)
+    assert time.monotonic() - start < 1
@@ -0,0 +1,61 @@
+'''Test common.util.encoding'''
+
+import base64
+import gzip
+
+import pytest
+
+from common.util import encoding
+from common.util.encoding import compress_response, negotiate_encoding
+
+
+### Tests
+@pytest.mark.parametrize(
+    'accept_encoding,expected',
+    [
+        (None, None),
+        ('', None),
+        ('identity', None),
+        ('gzip, deflate, sdch', 'gzip'),
+        ('GZIP;q=0.5', 'gzip'),
+        ('gzip;q=0', None),
+        ('*', encoding.SUPPORTED_ENCODINGS[0]),
+        ('*, gzip;q=0', 'br' if 'br' in encoding.SUPPORTED_ENCODINGS else None),
+    ]
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    '''Test the preferred supported coding is chosen'''
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_negotiate_encoding_without_brotli(mocker):
+    '''Test br is not offered when brotli is not installed'''
+    mocker.patch.object(encoding, 'SUPPORTED_ENCODINGS', ('gzip',))
+    assert negotiate_encoding('br') is None
+    assert negotiate_encoding('br, gzip;q=0.1') == 'gzip'
+
+
+def test_compress_response(mocker):
+    '''Test large bodies are compressed and base64 encoded'''
+    mocker.patch.object(encoding, 'SUPPORTED_ENCODINGS', ('gzip',))
+    body = '{"description":"' + 'lorem ipsum ' * 100 + '"}'
+    response = {'statusCode': 200, 'body': body, 'headers': {'ETag': '"abc"'}}
+
+    compressed = compress_response(response, 'gzip', threshold=1024)
+
+    assert compressed['isBase64Encoded'] is True
+    assert compressed['headers'] == {'ETag': 'W/"abc"', 'Vary': 'Accept-Encoding', 'Content-Encoding': 'gzip'}
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == body
+    assert response['body'] == body
+
+
+def test_compress_response_skips_small_bodies():
+    '''Test bodies under the threshold are returned as is'''
+    response = {'statusCode': 200, 'body': '{"id":"1234"}'}
+    assert compress_response(response, 'gzip', threshold=1024) is response
+
+
+def test_compress_response_varies_on_accept_encoding():
+    '''Test large bodies sent uncompressed are still marked as varying'''
+    response = {'statusCode': 200, 'body': 'x' * 2048}
+    assert compress_response(response, 'identity', threshold=1024) == {**response, 'headers': {'Vary': 'Accept-Encoding'}}
@@ -0,0 +1,51 @@
+'''Test common.util.expressions'''
+
+from common.util.expressions import apply_merge_patch, merge_patch_update
+
+
+### Tests
+def test_merge_patch_update_sets_and_removes():
+    '''Test members are SET or REMOVEd through placeholders'''
+    update = merge_patch_update({'name': 'thing', 'size': None, 'tags': ['a', None]})
+
+    assert update == {
+        'UpdateExpression': 'SET #n0 = :v0, #n2 = :v1 REMOVE #n1',
+        'ExpressionAttributeNames': {'#n0': 'name', '#n1': 'size', '#n2': 'tags'},
+        'ExpressionAttributeValues': {':v0': 'thing', ':v1': ['a', None]},
+    }
+
+
+def test_merge_patch_update_merges_objects():
+    '''Test object members are merged through nested paths into maps that must exist'''
+    update = merge_patch_update({'attrs': {'a': 1, 'b': None, 'inner': {'a': 2}}, 'empty': {}})
+
+    assert update == {
+        'UpdateExpression': 'SET #n0.#n1 = :v0, #n0.#n3.#n1 = :v1 REMOVE #n0.#n2',
+        'ExpressionAttributeNames': {'#n0': 'attrs', '#n1': 'a', '#n2': 'b', '#n3': 'inner', '#n4': 'empty'},
+        'ExpressionAttributeValues': {':v0': 1, ':v1': 2, ':map': 'M'},
+        'ConditionExpression': 'attribute_type(#n0, :map) AND attribute_type(#n0.#n3, :map) AND attribute_type(#n4, :map)',
+    }
+
+
+def test_apply_merge_patch():
+    '''Test the in memory merge follows RFC 7386'''
+    target = {'title': 'Goodbye!', 'author': {'givenName': 'John', 'familyName': 'Doe'}, 'tags': ['example', 'sample']}
+    patch = {'title': 'Hello!', 'phoneNumber': '+01-123-456-7890', 'author': {'familyName': None}, 'tags': ['example']}
+
+    assert apply_merge_patch(target, patch) == {
+        'title': 'Hello!',
+        'author': {'givenName': 'John'},
+        'tags': ['example'],
+        'phoneNumber': '+01-123-456-7890',
+    }
+    assert apply_merge_patch({'a': 'b'}, {'a': {'b': 'c', 'd': None}}) == {'a': {'b': 'c'}}
+
+
+def test_merge_patch_update_without_values():
+    '''Test a remove only patch has no ExpressionAttributeValues'''
+    update = merge_patch_update({'reserved word': None})
+
+    assert update == {
+        'UpdateExpression': 'REMOVE #n0',
+        'ExpressionAttributeNames': {'#n0': 'reserved word'},
+    }
@@ -0,0 +1,107 @@
+'''Test common.util.idempotency'''
+
+import os
+from typing import Generator
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from common.model.thing import TTL_ATTRIBUTE
+from common.util import idempotency
+from common.util.ddb import DdbTable
+from common.util.idempotency import IDEMPOTENCY_CACHE, IdempotencyKeyReused, IdempotentResponse
+
+NOW = 1_700_000_000.0
+
+
+def _put(_id: str):
+    '''Return a put_item request for a Thing'''
+    key = 'thing#{}'.format(_id)
+    return {'Item': {'pk': key, 'sk': key, 'id': _id}, 'ConditionExpression': 'attribute_not_exists(pk)'}
+
+
+### Fixtures
+@pytest.fixture()
+def table() -> Generator[DdbTable, None, None]:
+    '''Return an empty table in moto'''
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    with mock_aws():
+        client = boto3.client('dynamodb', 'us-east-1')
+        client.create_table(
+            TableName='MockDdbTable',
+            KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield DdbTable('MockDdbTable', client)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Generator[None, None, None]:
+    '''Start every test with an empty cache'''
+    IDEMPOTENCY_CACHE.clear()
+    yield
+    IDEMPOTENCY_CACHE.clear()
+
+
+### Tests
+def test_record_key_is_scoped_to_caller():
+    '''Test the same key from two callers maps to two records'''
+    assert idempotency.record_key('key', 'alice') != idempotency.record_key('key', 'bob')
+    assert idempotency.record_key('key', 'alice')['pk'].startswith(idempotency.RECORD_KEY_PREFIX)
+
+
+def test_is_valid_key():
+    '''Test key length and characters are checked'''
+    assert idempotency.is_valid_key('a' * 255)
+    assert not idempotency.is_valid_key('')
+    assert not idempotency.is_valid_key('a' * 256)
+    assert not idempotency.is_valid_key('a\nb')
+
+
+def test_transact_put_saves_response(table):
+    '''Test the item and the record are written together and the response replayed'''
+    keys = idempotency.record_key('key', 'alice')
+    response = IdempotentResponse('fp', 201, '{"id":"1"}')
+
+    assert idempotency.transact_put(table, _put('1'), keys, response, now=NOW) is None
+
+    assert table.get_item(Key={'pk': 'thing#1', 'sk': 'thing#1'})['Item']['id'] == '1'
+    record = table.get_item(Key=keys)['Item']
+    assert record[TTL_ATTRIBUTE] == int(NOW) + idempotency.IDEMPOTENCY_TTL_SECONDS
+
+    IDEMPOTENCY_CACHE.clear()
+    assert idempotency.get_response(table, keys, 'fp', now=NOW) == response
+    with pytest.raises(IdempotencyKeyReused):
+        idempotency.get_response(table, keys, 'other', now=NOW)
+
+
+def test_transact_put_returns_response_saved_first(table):
+    '''Test a concurrent request with the same key writes nothing and gets the first response'''
+    keys = idempotency.record_key('key', 'alice')
+    first = IdempotentResponse('fp', 201, '{"id":"1"}')
+    idempotency.transact_put(table, _put('1'), keys, first, now=NOW)
+    IDEMPOTENCY_CACHE.clear()
+
+    saved = idempotency.transact_put(table, _put('2'), keys, IdempotentResponse('fp', 201, '{"id":"2"}'), now=NOW)
+
+    assert saved == first
+    assert 'Item' not in table.get_item(Key={'pk': 'thing#2', 'sk': 'thing#2'})
+
+
+def test_expired_records_are_ignored(table):
+    '''Test records past their expiration, but not yet deleted by DynamoDB, are not replayed'''
+    keys = idempotency.record_key('key', 'alice')
+    idempotency.transact_put(table, _put('1'), keys, IdempotentResponse('fp', 201, '{"id":"1"}'), now=NOW)
+    IDEMPOTENCY_CACHE.clear()
+    later = NOW + idempotency.IDEMPOTENCY_TTL_SECONDS + 1
+
+    assert idempotency.get_response(table, keys, 'fp', now=later) is None
+    assert idempotency.transact_put(
+        table, _put('2'), keys, IdempotentResponse('fp', 201, '{"id":"2"}'), now=later
+    ) is None
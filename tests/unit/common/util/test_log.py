@@ -0,0 +1,124 @@
+'''Test common.util.log'''
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+import pytest
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+
+from common.util import log
+from common.util.log import REDACTED, event_record, log_event, log_output, output_record, truncate_body
+
+
+@dataclass
+class Output:
+    '''Handler output'''
+    statusCode: int
+    body: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _raw_event(body: str = '{"name": "thing"}') -> Dict[str, Any]:
+    '''Return an API Gateway event with credentials and authorizer claims'''
+    return {
+        'httpMethod': 'POST',
+        'resource': '/v1/thing',
+        'body': body,
+        'headers': {'Authorization': 'Bearer secret', 'Accept': 'application/json'},
+        'multiValueHeaders': {'Authorization': ['Bearer secret'], 'Accept': ['application/json']},
+        'requestContext': {
+            'requestId': 'request',
+            'authorizer': {'claims': {'sub': 'user', 'client_id': 'client', 'email': 'user@example.com'}}
+        }
+    }
+
+
+### Fixtures
+@pytest.fixture()
+def mock_logger(mocker):
+    '''A logger whose DEBUG level is controlled by the test'''
+    logger = mocker.Mock()
+    logger.log_level = logging.DEBUG
+    return logger
+
+
+### Tests
+def test_truncate_body_keeps_small_bodies():
+    '''Test bodies within the limit are returned as they are'''
+    assert truncate_body(None) is None
+    assert truncate_body('x' * 16, limit=16) == 'x' * 16
+
+
+def test_truncate_body_cuts_large_bodies():
+    '''Test bodies over the limit are cut and report their size'''
+    assert truncate_body('x' * 100, limit=10) == 'xxxxxxxxxx...[truncated 100 bytes]'
+
+
+def test_truncate_body_does_not_split_characters():
+    '''Test a multibyte character cut by the limit is dropped'''
+    assert truncate_body('é' * 10, limit=5) == 'éé...[truncated 20 bytes]'
+
+
+def test_event_record_redacts_credentials():
+    '''Test credential headers and unlisted claims are removed'''
+    raw_event = _raw_event()
+    record = event_record(raw_event)
+
+    assert record['headers'] == {'Authorization': REDACTED, 'Accept': 'application/json'}
+    assert record['multiValueHeaders']['Authorization'] == REDACTED
+    assert record['requestContext']['authorizer'] == {'claims': {'sub': 'user', 'client_id': 'client'}}
+    assert record['requestContext']['requestId'] == 'request'
+    # The event itself is left untouched
+    assert raw_event['headers']['Authorization'] == 'Bearer secret'
+
+
+def test_event_record_truncates_body(mocker):
+    '''Test large event bodies are truncated'''
+    mocker.patch.object(log, 'LOG_BODY_MAX_BYTES', 10)
+    assert event_record(_raw_event('x' * 100))['body'] == 'xxxxxxxxxx...[truncated 100 bytes]'
+
+
+def test_output_record_encodes_body():
+    '''Test output bodies are logged encoded'''
+    record = output_record(Output(statusCode=200, body={'name': 'thing'}, headers={'ETag': '"1"'}))
+    assert record['statusCode'] == 200
+    assert record['body'] == '{"name":"thing"}'
+    assert record['headers'] == {'ETag': '"1"'}
+
+
+def test_log_event_emits_record(mock_logger):
+    '''Test the event is logged at DEBUG when enabled'''
+    log_event(mock_logger, APIGatewayProxyEvent(_raw_event()))
+
+    (message,), kwargs = mock_logger.debug.call_args
+    assert message == 'Event'
+    assert kwargs['extra']['message_object']['headers']['Authorization'] == REDACTED
+
+
+def test_log_skips_work_when_debug_disabled(mocker, mock_logger):
+    '''Test nothing is built or logged for requests outside the sample'''
+    mock_logger.log_level = logging.INFO
+    spy_event_record = mocker.spy(log, 'event_record')
+    spy_output_record = mocker.spy(log, 'output_record')
+
+    log_event(mock_logger, APIGatewayProxyEvent(_raw_event()))
+    log_output(mock_logger, Output(statusCode=200, body={'name': 'thing'}))
+
+    spy_event_record.assert_not_called()
+    spy_output_record.assert_not_called()
+    mock_logger.debug.assert_not_called()
+
+
+def test_log_follows_powertools_level(mocker):
+    '''Test the DEBUG check follows the level of a Powertools logger'''
+    logger = Logger(service='test', level='INFO', sampling_rate=0)
+    spy_event_record = mocker.spy(log, 'event_record')
+
+    log_event(logger, APIGatewayProxyEvent(_raw_event()))
+    spy_event_record.assert_not_called()
+
+    logger.setLevel(logging.DEBUG)
+    log_event(logger, APIGatewayProxyEvent(_raw_event()))
+    spy_event_record.assert_called_once()
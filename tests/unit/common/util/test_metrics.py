@@ -0,0 +1,101 @@
+'''Test common.util.metrics'''
+
+import json
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from common.util import ddb
+from common.util.ddb import DdbTable
+from common.util.metrics import PHASE_DDB, PHASE_PARSE, PhaseMetrics
+
+
+### Fixtures
+@pytest.fixture()
+def aws_credentials():
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+
+@pytest.fixture()
+def mock_ddb_table(aws_credentials):
+    '''Return a DdbTable on a mocked table'''
+    with mock_aws():
+        client = boto3.client('dynamodb', 'us-east-1')
+        client.create_table(
+            TableName='MockDdbTable',
+            KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}, {'AttributeName': 'sk', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield DdbTable('MockDdbTable', client)
+
+
+### Tests
+def test_disabled_metrics_record_nothing(capsys):
+    '''Test disabled metrics hand out a shared no-op context and emit nothing'''
+    metrics = PhaseMetrics(enabled=False)
+    assert metrics.phase(PHASE_PARSE) is metrics.phase(PHASE_DDB)
+
+    with metrics.phase(PHASE_PARSE):
+        pass
+    metrics.add_consumed_capacity('get_item', {'CapacityUnits': 1.0})
+    metrics.flush('GET /v1/thing/{id}')
+
+    assert metrics.snapshot() == {}
+    assert capsys.readouterr().out == ''
+
+
+def test_phases_and_capacity_are_summed():
+    '''Test repeated phases and capacity add up per call'''
+    metrics = PhaseMetrics(enabled=True)
+    metrics.add_time(PHASE_DDB, 0.002)
+    metrics.add_time(PHASE_DDB, 0.003)
+    metrics.add_consumed_capacity('get_item', {'CapacityUnits': 0.5})
+    metrics.add_consumed_capacity('batch_get_item', [{'CapacityUnits': 1.0}, {'CapacityUnits': 2.0}])
+    metrics.add_consumed_capacity('put_item', {'CapacityUnits': 1.0})
+
+    assert metrics.snapshot() == pytest.approx({
+        'DynamoDBTime': 5.0,
+        'ConsumedReadCapacity': 3.5,
+        'ConsumedWriteCapacity': 1.0,
+    })
+
+
+def test_flush_emits_one_emf_record(capsys):
+    '''Test a flush publishes every value under the route dimension and resets'''
+    metrics = PhaseMetrics(enabled=True, namespace='ThingApiTest')
+    with metrics.phase(PHASE_PARSE):
+        pass
+    metrics.add_consumed_capacity('put_item', {'CapacityUnits': 1.0})
+
+    metrics.flush('POST /v1/thing')
+
+    record = json.loads(capsys.readouterr().out)
+    assert record['Route'] == 'POST /v1/thing'
+    assert record['ConsumedWriteCapacity'] == [1.0]
+    assert record['ParseTime'][0] >= 0
+    directive = record['_aws']['CloudWatchMetrics'][0]
+    assert directive['Namespace'] == 'ThingApiTest'
+    assert ['Route'] in [dims[-1:] for dims in directive['Dimensions']]
+    assert metrics.snapshot() == {}
+
+
+def test_ddb_table_records_calls(mocker, mock_ddb_table):
+    '''Test DdbTable calls are timed and their consumed capacity added when enabled'''
+    metrics = PhaseMetrics(enabled=True)
+    mocker.patch.object(ddb, 'PHASE_METRICS', metrics)
+
+    mock_ddb_table.put_item(Item={'pk': '1', 'sk': '1'})
+    mock_ddb_table.get_item(Key={'pk': '1', 'sk': '1'})
+
+    values = metrics.snapshot()
+    assert values['DynamoDBTime'] > 0
+    assert values['ConsumedWriteCapacity'] > 0
+    assert values['ConsumedReadCapacity'] > 0
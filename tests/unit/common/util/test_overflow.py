@@ -0,0 +1,87 @@
+'''Test common.util.overflow'''
+
+import tracemalloc
+
+import pytest
+
+from common.model.thing import ThingData, ThingItem, create_keys, get_id_from_keys
+from common.util import overflow
+from common.util.blobstore import BlobNotFoundError, LocalBlobStore
+from common.util.serialization import loads
+
+
+### Fixtures
+@pytest.fixture()
+def store(tmp_path):
+    '''Return a local blob store'''
+    return LocalBlobStore(str(tmp_path))
+
+
+@pytest.fixture()
+def large_item():
+    '''Return a Thing larger than a small offload threshold'''
+    keys = create_keys()
+    data = ThingData.from_dict({'id': get_id_from_keys(keys), 'name': 'é' * 600, 'tags': ['a', 'b']})
+    return ThingItem.from_data(keys, data)
+
+
+### Tests
+def test_small_items_are_stored_whole(mocker, store, large_item):
+    '''Test items under the threshold are not offloaded'''
+    mocker.patch.object(overflow, 'OFFLOAD_THRESHOLD_BYTES', 4096)
+
+    assert overflow.to_storage_item(large_item, store) == large_item.to_item()
+
+
+def test_large_items_are_offloaded(mocker, store, large_item):
+    '''Test items over the threshold are replaced by a pointer record'''
+    mocker.patch.object(overflow, 'OFFLOAD_THRESHOLD_BYTES', 256)
+
+    ddb_item = overflow.to_storage_item(large_item, store)
+
+    assert ddb_item == large_item.to_pointer(overflow.blob_key(large_item))
+    assert 'name' not in ddb_item
+    assert loads(overflow.read_body(ddb_item['blob'], store)) == large_item.to_public()
+
+    resolved = overflow.resolve(ThingItem.from_item(ddb_item), store)
+    assert resolved.to_public() == large_item.to_public()
+    assert resolved.etag == large_item.etag
+
+
+def test_read_body_decodes_across_chunks(store):
+    '''Test multi-byte characters split between chunks are decoded'''
+    store.put('a.json', '"ééé"'.encode('utf-8'))
+    store.stream = lambda key: iter([b'"\xc3', b'\xa9\xc3\xa9', b'\xc3\xa9"'])
+
+    assert overflow.read_body('a.json', store) == '"ééé"'
+
+
+
+def test_read_body_holds_one_copy(store):
+    '''Test reading a body never holds more than about one copy of its text'''
+    body = '"{}"'.format('x' * (4 * 1024 * 1024))
+    store.put('a.json', body.encode('utf-8'))
+
+    tracemalloc.start()
+    try:
+        text = overflow.read_body('a.json', store)
+        (_, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert text == body
+    assert peak < 1.5 * len(body)
+
+def test_discard_replaced(store):
+    '''Test old blobs are deleted unless the new item still points at them'''
+    store.put('old.json', b'{}')
+
+    overflow.discard_replaced({'blob': 'old.json'}, {'blob': 'old.json'}, store)
+    assert list(store.stream('old.json')) == [b'{}']
+
+    overflow.discard_replaced({'blob': 'old.json'}, {'id': 'x'}, store)
+    with pytest.raises(BlobNotFoundError):
+        list(store.stream('old.json'))
+
+    # Items that were never offloaded need no store
+    overflow.discard_replaced({'id': 'x'})
@@ -0,0 +1,78 @@
+'''Test common.util.profiling'''
+
+from typing import Any, Dict
+
+import pytest
+
+from common.test.aws import create_lambda_function_context
+from common.util import profiling
+from common.util.profiling import profile_sampled
+
+
+@profile_sampled
+def slow_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    '''Return after some measurable work'''
+    return {'statusCode': 200, 'body': str(sum(i * i for i in range(10000)))}
+
+
+def _event(header: str = '', client_id: str = 'client') -> Dict[str, Any]:
+    '''Return an API Gateway event with a profiling header and caller'''
+    return {
+        'headers': {'x-thing-profile': header} if header else {},
+        'requestContext': {'authorizer': {'claims': {'client_id': client_id}}}
+    }
+
+
+### Fixtures
+@pytest.fixture()
+def mock_logger(mocker):
+    '''Capture profile records'''
+    return mocker.patch.object(profiling, 'LOGGER')
+
+
+### Tests
+def test_unsampled_calls_are_not_profiled(mocker, mock_logger):
+    '''Test calls outside the sample run without a profiler'''
+    mocker.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 0.0)
+    profile = mocker.patch.object(profiling.cProfile, 'Profile')
+
+    assert slow_handler(_event(), create_lambda_function_context('slow'))['statusCode'] == 200
+    profile.assert_not_called()
+    mock_logger.info.assert_not_called()
+
+
+def test_sampled_calls_log_top_functions(mocker, mock_logger):
+    '''Test sampled calls log their top functions with the request id'''
+    mocker.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    mocker.patch.object(profiling, 'PROFILE_TOP_N', 3)
+    context = create_lambda_function_context('slow')
+
+    slow_handler(_event(), context)
+
+    (message,), kwargs = mock_logger.info.call_args
+    assert message == 'Profile'
+    assert kwargs['extra']['aws_request_id'] == context.aws_request_id
+    profile = kwargs['extra']['profile']
+    assert profile['reason'] == 'sampled'
+    assert len(profile['top']) == 3
+    assert any('slow_handler' in entry['function'] for entry in profile['top'])
+    cumtimes = [entry['cumtime_ms'] for entry in profile['top']]
+    assert cumtimes == sorted(cumtimes, reverse=True)
+
+
+@pytest.mark.parametrize(
+    'header,client_id,profiled',
+    [
+        ('1', 'trusted', True),
+        ('1', 'other', False),
+        ('', 'trusted', False),
+    ]
+)
+def test_allowed_callers_can_request_profiles(mocker, mock_logger, header, client_id, profiled):
+    '''Test only allowed callers can force profiling with the header'''
+    mocker.patch.object(profiling, 'PROFILE_SAMPLE_RATE', 0.0)
+    mocker.patch.object(profiling, 'PROFILE_ALLOWED_CALLERS', frozenset(('trusted',)))
+
+    slow_handler(_event(header, client_id), create_lambda_function_context('slow'))
+
+    assert mock_logger.info.called is profiled
@@ -0,0 +1,72 @@
+'''Test common.util.serialization'''
+
+from dataclasses import dataclass
+import importlib
+import json
+import sys
+from typing import Any, Dict, List
+
+import pytest
+from pytest_mock import MockerFixture
+
+from common.model.thing import ThingData
+from common.util import serialization
+
+
+@dataclass
+class Body:
+    '''Response body'''
+    items: List[ThingData]
+    meta: Dict[str, Any]
+
+@dataclass
+class Output:
+    '''Function response'''
+    statusCode: int
+    body: Any
+
+
+### Fixtures
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, mocker: MockerFixture):
+    '''Reload the module with each JSON backend'''
+    if request.param == 'json':
+        mocker.patch.dict(sys.modules, {'orjson': None})
+    module = importlib.reload(serialization)
+    assert module.BACKEND == request.param
+    yield module
+    mocker.stopall()
+    importlib.reload(serialization)
+
+
+### Tests
+def test_dumps_encodes_nested_dataclasses(backend):
+    '''Test dataclasses are encoded through to_public() or their fields'''
+    body = Body(items=[ThingData('1234', {'name': 'thing'})], meta={'count': 1})
+
+    assert json.loads(backend.dumps(body)) == {
+        'items': [{'id': '1234', 'name': 'thing'}],
+        'meta': {'count': 1}
+    }
+
+
+def test_to_response_encodes_body(backend):
+    '''Test an object body is encoded'''
+    response = backend.to_response(Output(statusCode=200, body={'id': '1234'}))
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {'id': '1234'}
+
+
+def test_to_response_passes_encoded_body_through(backend):
+    '''Test pre-encoded bodies are not encoded again'''
+    body = '{"id": "1234"}'
+
+    assert backend.to_response(Output(statusCode=200, body=body))['body'] is body
+    assert backend.to_response(Output(statusCode=200, body=body.encode()))['body'] == body
+
+
+def test_dumps_rejects_unknown_types(backend):
+    '''Test objects without a JSON form are rejected'''
+    with pytest.raises(TypeError):
+        backend.dumps(object())
@@ -0,0 +1,333 @@
+'''Test BatchCreateThingItems'''
+
+from dataclasses import asdict
+import json
+import jsonschema
+import os
+from types import ModuleType
+from typing import cast, Generator, Tuple
+
+import pytest
+from pytest_mock import MockerFixture
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import COLLECTION_NAME, ThingItemKeys, content_hash
+from common.test.aws import create_lambda_function_context
+from common.util.blobstore import LocalBlobStore
+from common.util.ddb import DdbTable
+
+from src.handlers.BatchCreateThingItems.function import Output, ResponseBody, BatchItemResult, BatchItemFailure
+
+FN_NAME = 'BatchCreateThingItems'
+DATA_DIR = './data'
+FUNC_DATA_DIR = os.path.join(DATA_DIR, 'handlers', FN_NAME)
+EVENT = os.path.join(FUNC_DATA_DIR, 'event.json')
+EVENT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'event.schema.json')
+DATA = os.path.join(FUNC_DATA_DIR, 'data.json')
+DATA_SCHEMA = os.path.join(FUNC_DATA_DIR, 'data.schema.json')
+OUTPUT = os.path.join(FUNC_DATA_DIR, 'output.json')
+OUTPUT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'output.schema.json')
+RESPONSE = os.path.join(FUNC_DATA_DIR, 'response.json')
+RESPONSE_SCHEMA = os.path.join(FUNC_DATA_DIR, 'response.schema.json')
+
+
+def _response_body(body: dict) -> ResponseBody:
+    '''Build a ResponseBody from a decoded response'''
+    return ResponseBody(
+        items=[BatchItemResult(**i) for i in body['items']],
+        failures=[BatchItemFailure(**f) for f in body['failures']]
+    )
+
+
+### Fixtures
+@pytest.fixture()
+def mock_context(function_name=FN_NAME):
+    '''context object'''
+    return create_lambda_function_context(function_name)
+
+# Data
+@pytest.fixture()
+def mock_data(data=DATA) -> dict:
+    '''Return function event data'''
+    with open(data) as f:
+        return json.load(f)
+
+@pytest.fixture()
+def data_schema(data_schema=DATA_SCHEMA):
+    '''Return a data schema'''
+    with open(data_schema) as f:
+        return json.load(f)
+# Event
+@pytest.fixture()
+def mock_event(e=EVENT) -> APIGatewayProxyEvent:
+    '''Return a function event'''
+    with open(e) as f:
+        return APIGatewayProxyEvent(json.load(f))
+
+@pytest.fixture()
+def event_schema(schema=EVENT_SCHEMA):
+    '''Return an event schema'''
+    with open(schema) as f:
+        return json.load(f)
+
+# Output
+@pytest.fixture()
+def mock_expected_output(output=OUTPUT) -> Output:
+    '''Return a function output'''
+    with open(output) as f:
+        return Output(**json.load(f))
+
+@pytest.fixture()
+def expected_output_schema(output_schema=OUTPUT_SCHEMA):
+    '''Return an output schema'''
+    with open(output_schema) as f:
+        return json.load(f)
+
+# Response
+@pytest.fixture()
+def mock_expected_response(response=RESPONSE) -> ResponseBody:
+    '''Return response'''
+    with open(response) as f:
+        return _response_body(json.load(f))
+
+@pytest.fixture()
+def expected_response_schema(response_schema=RESPONSE_SCHEMA):
+    '''Return an output schema'''
+    with open(response_schema) as f:
+        return json.load(f)
+
+
+# AWS Clients
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'pk',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'sk',
+                'KeyType': 'RANGE'
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'pk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'sk',
+                'AttributeType': 'S'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+    yield ddb_table
+
+# Function
+@pytest.fixture()
+def mock_fn(
+    mocked_aws,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+) -> Generator[ModuleType, None, None]:
+    '''Patch the environment variables for the function'''
+    import src.handlers.BatchCreateThingItems.function as fn
+
+    mocker.patch(
+        'src.handlers.BatchCreateThingItems.function.DDB_TABLE',
+        mock_ddb_table_client
+    )
+    mocker.patch(
+        'src.handlers.BatchCreateThingItems.function.create_keys',
+        side_effect=[
+            ThingItemKeys(**{'pk': 'Thing#1234', 'sk': 'Thing#1234'}),
+            ThingItemKeys(**{'pk': 'Thing#5678', 'sk': 'Thing#5678'}),
+        ]
+    )
+    mocker.patch('common.util.aioddb.backoff_delay', return_value=0)
+    yield fn
+
+
+### Data validation
+def test_validate_data(mock_data, data_schema):
+    '''Test data against schema'''
+    jsonschema.Draft7Validator(mock_data, data_schema)
+
+def test_validate_event(mock_event, event_schema):
+    '''Test event against schema'''
+    jsonschema.Draft7Validator(mock_event._data, event_schema)
+
+def test_validate_expected_data(mock_expected_output, expected_output_schema):
+    '''Test output against schema'''
+    jsonschema.Draft7Validator(asdict(mock_expected_output), expected_output_schema)
+
+def test_validate_expected_response(mock_expected_response, expected_response_schema):
+    '''Test response against schema'''
+    jsonschema.Draft7Validator(asdict(mock_expected_response), expected_response_schema)
+
+
+### Tests
+def test_handler(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+    mock_data: dict,
+    mock_expected_output: Output,
+    mock_expected_response: ResponseBody,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test calling handler'''
+    # Insert data into event
+    mock_event._data['body'] = json.dumps(mock_data)
+    output = mock_fn.handler(mock_event, mock_context)
+
+    output_obj = Output(**output)
+    assert output_obj.statusCode == mock_expected_output.statusCode
+
+    response_obj = _response_body(json.loads(output_obj.body))
+    assert response_obj == mock_expected_response
+
+    # Check items were created
+    for result in response_obj.items:
+        key = 'Thing#{}'.format(result.id)
+        r = mock_ddb_table_client.get_item(Key={'pk': key, 'sk': key})
+        assert r.get('Item') == {
+            'pk': key,
+            'sk': key,
+            'id': result.id,
+            'collection': COLLECTION_NAME,
+            'etag': content_hash({'id': result.id})
+        }
+
+
+def test_handler_reports_invalid_items(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+):
+    '''Test invalid entries are reported as failures without failing the batch'''
+    mock_event._data['body'] = json.dumps({'items': [{}, 'not-a-thing']})
+    output = mock_fn.handler(mock_event, mock_context)
+
+    output_obj = Output(**output)
+    assert output_obj.statusCode == 207
+
+    response_obj = _response_body(json.loads(output_obj.body))
+    assert response_obj.items == [BatchItemResult(0, '1234')]
+    assert [f.index for f in response_obj.failures] == [1]
+    assert response_obj.failures[0].error == 'InvalidItem'
+
+
+def test_handler_fails_when_batch_too_large(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+):
+    '''Test oversized batches are rejected'''
+    mock_event._data['body'] = json.dumps({'items': [{}] * (mock_fn.MAX_BATCH_ITEMS + 1)})
+    output = mock_fn.handler(mock_event, mock_context)
+
+    output_obj = Output(**output)
+    assert output_obj.statusCode == 400
+    assert json.loads(output_obj.body)['error'] == 'BatchTooLarge'
+
+
+def test__batch_write_items_chunks_requests(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test items are written in BatchWriteItem sized chunks'''
+    items = [
+        mock_fn.ThingItem(**{'pk': 'Thing#{}'.format(i), 'sk': 'Thing#{}'.format(i), 'id': str(i)})
+        for i in range(60)
+    ]
+    spy = mocker.spy(mock_fn.DDB_TABLE, 'batch_write_item')
+
+    failed = mock_fn._batch_write_items(items)
+
+    assert failed == {}
+    assert spy.call_count == 3
+    assert mock_ddb_table_client.scan()['Count'] == 60
+
+
+def test__batch_write_items_retries_unprocessed_items(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test unprocessed items are retried and reported when never written'''
+    item = mock_fn.ThingItem(**{'pk': 'Thing#1', 'sk': 'Thing#1', 'id': '1'})
+    unprocessed = {
+        'UnprocessedItems': {
+            mock_ddb_table_client.name: [{'PutRequest': {'Item': asdict(item)}}]
+        }
+    }
+    mocker.patch.object(mock_fn.DDB_TABLE, 'batch_write_item', return_value=unprocessed)
+
+    failed = mock_fn._batch_write_items([item])
+
+    assert failed == {'1': 'UnprocessedItem'}
+    assert mock_fn.DDB_TABLE.batch_write_item.call_count == mock_fn.MAX_BATCH_WRITE_ATTEMPTS
+
+
+def test__batch_write_items_discards_blobs_of_failed_items(
+    mock_fn: ModuleType,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test an offloaded item that is not written leaves no blob'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+    item = mock_fn.ThingItem(**{
+        'pk': 'Thing#1',
+        'sk': 'Thing#1',
+        'id': '1',
+        'extra': {'description': 'lorem ipsum ' * 200}
+    })
+    put = mocker.spy(store, 'put')
+    mocker.patch.object(
+        mock_fn.DDB_TABLE,
+        'batch_write_item',
+        side_effect=lambda RequestItems: {'UnprocessedItems': RequestItems}
+    )
+
+    failed = mock_fn._batch_write_items([item])
+
+    assert failed == {'1': 'UnprocessedItem'}
+    put.assert_called_once()
+    assert not os.listdir(os.path.join(tmp_path, '1'))
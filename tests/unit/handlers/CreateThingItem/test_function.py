@@ -12,12 +12,15 @@ from pytest_mock import MockerFixture
 
 import boto3
 from moto import mock_aws
-from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource, Table
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
-from common.model.thing import ThingData, ThingItemKeys
+from common.model.thing import COLLECTION_NAME, ThingData, ThingItemKeys, content_hash
 from common.test.aws import create_lambda_function_context
+from common.util.blobstore import LocalBlobStore
+from common.util.ddb import DdbTable
+from common.util.idempotency import IDEMPOTENCY_CACHE
 
 from src.handlers.CreateThingItem.function import Output, ResponseBody
 
@@ -45,7 +48,7 @@ def mock_context(function_name=FN_NAME):
 def mock_data(data=DATA) -> ThingData:
     '''Return function event data'''
     with open(data) as f:
-        return ThingData(**json.load(f))
+        return ThingData.from_dict(json.load(f))
 
 @pytest.fixture()
 def data_schema(data_schema=DATA_SCHEMA):
@@ -109,7 +112,7 @@ def mocked_aws(aws_credentials):
         yield
 
 @pytest.fixture()
-def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
     '''Return the DDB table client'''
     ddb_table_name = 'MockDdbTable'
     ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
@@ -140,14 +143,14 @@ def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
             'WriteCapacityUnits': 5
         }
     )
-    ddb_table = ddb_resource.Table(ddb_table_name)
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
     yield ddb_table
 
 # Function
 @pytest.fixture()
 def mock_fn(
     mocked_aws,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
     mocker: MockerFixture,
 ) -> Generator[ModuleType, None, None]:
     '''Patch the environment variables for the function'''
@@ -172,7 +175,7 @@ def mock_fn(
 ### Data validation
 def test_validate_data(mock_data, data_schema):
     '''Test data against schema'''
-    jsonschema.Draft7Validator(asdict(mock_data), data_schema)
+    jsonschema.Draft7Validator(mock_data.to_public(), data_schema)
 
 def test_validate_event(mock_event, event_schema):
     '''Test event against schema'''
@@ -199,7 +202,7 @@ def test_handler(
 ):
     '''Test calling handler'''
     # Insert data into event
-    mock_event._data['body'] = json.dumps(asdict(mock_data))
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
     output = mock_fn.handler(mock_event, mock_context)
 
     output_obj = Output(**output)
@@ -212,7 +215,7 @@ def test_handler(
 def test__create_item(
     mock_fn: ModuleType,
     mock_data: ThingData,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test create item'''
     item_keys = ThingItemKeys(**{'pk': 'Thing#1234', 'sk': 'Thing#1234'})
@@ -221,13 +224,18 @@ def test__create_item(
 
     # Check item was created
     r = mock_ddb_table_client.get_item(Key=asdict(item_keys))
-    assert r.get('Item') == { **asdict(item_keys), **asdict(item_data) }
+    assert r.get('Item') == {
+        **asdict(item_keys),
+        **item_data.to_public(),
+        'collection': COLLECTION_NAME,
+        'etag': content_hash(item_data.to_public())
+    }
 
 
 def test__create_item_fails_if_item_exists(
     mock_fn: ModuleType,
     mock_data: ThingData,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test create item'''
     # Create item to fail
@@ -242,6 +250,108 @@ def test__create_item_fails_if_item_exists(
     item_data = mock_data
 
     with pytest.raises(
-        mock_ddb_table_client.meta.client.exceptions.ConditionalCheckFailedException
+        mock_ddb_table_client.client.exceptions.ConditionalCheckFailedException
     ):
-        mock_fn._create_item(item_data)
\ No newline at end of file
+        mock_fn._create_item(item_data)
+
+
+def test__create_item_discards_blob_when_put_fails(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test an offloaded Thing that is not written leaves no blob'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+    put = mocker.spy(store, 'put')
+    mock_ddb_table_client.put_item(Item={'pk': 'Thing#1234', 'sk': 'Thing#1234'})
+    item_data = ThingData(mock_data.id, {'description': 'lorem ipsum ' * 200})
+
+    with pytest.raises(
+        mock_ddb_table_client.client.exceptions.ConditionalCheckFailedException
+    ):
+        mock_fn._create_item(item_data)
+
+    put.assert_called_once()
+    assert not os.listdir(os.path.join(tmp_path, item_data.id))
+
+@pytest.fixture()
+def idempotency_cache() -> Generator[None, None, None]:
+    '''Start with an empty idempotency cache'''
+    IDEMPOTENCY_CACHE.clear()
+    yield
+    IDEMPOTENCY_CACHE.clear()
+
+
+def test_handler_replays_idempotent_request(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+    idempotency_cache,
+    mocker: MockerFixture,
+):
+    '''Test a retried request returns the first response without writing again'''
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
+    mock_event._data['headers']['Idempotency-Key'] = 'retry-1'
+    first = Output(**mock_fn.handler(mock_event, mock_context))
+
+    create_keys = mocker.patch.object(mock_fn, 'create_keys')
+    put_item = mocker.spy(mock_ddb_table_client, 'put_item')
+    transact_write_items = mocker.spy(mock_ddb_table_client, 'transact_write_items')
+    get_item = mocker.spy(mock_ddb_table_client, 'get_item')
+    second = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert first.statusCode == second.statusCode == 201
+    assert json.loads(second.body) == json.loads(first.body) == {'id': '1234'}
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    create_keys.assert_not_called()
+    put_item.assert_not_called()
+    transact_write_items.assert_not_called()
+    # Answered from the in-memory cache
+    get_item.assert_not_called()
+
+    # A cold container reads the saved response
+    IDEMPOTENCY_CACHE.clear()
+    third = Output(**mock_fn.handler(mock_event, mock_context))
+    assert json.loads(third.body) == {'id': '1234'}
+    get_item.assert_called_once()
+    transact_write_items.assert_not_called()
+
+
+def test_handler_rejects_reused_idempotency_key(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: ThingData,
+    idempotency_cache,
+):
+    '''Test a key sent again with a different body is rejected'''
+    mock_event._data['headers']['Idempotency-Key'] = 'retry-1'
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
+    mock_fn.handler(mock_event, mock_context)
+
+    mock_event._data['body'] = json.dumps({**mock_data.to_public(), 'other': 'value'})
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 422
+    assert json.loads(output.body)['error'] == 'IdempotencyKeyReused'
+
+
+def test_handler_rejects_invalid_idempotency_key(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: ThingData,
+):
+    '''Test an idempotency key that is too long is rejected'''
+    mock_event._data['headers']['Idempotency-Key'] = 'x' * 256
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 400
+    assert json.loads(output.body)['error'] == 'InvalidIdempotencyKey'
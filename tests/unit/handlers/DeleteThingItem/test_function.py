@@ -12,12 +12,14 @@ from pytest_mock import MockerFixture
 
 import boto3
 from moto import mock_aws
-from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource, Table
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from common.model.thing import ThingItemKeys, get_keys_from_id
 from common.test.aws import create_lambda_function_context
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
 
 from src.handlers.DeleteThingItem.function import Output, ResponseBody
 
@@ -95,7 +97,7 @@ def mocked_aws(aws_credentials):
         yield
 
 @pytest.fixture()
-def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
     '''Return the DDB table client'''
     ddb_table_name = 'MockDdbTable'
     ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
@@ -126,14 +128,14 @@ def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
             'WriteCapacityUnits': 5
         }
     )
-    ddb_table = ddb_resource.Table(ddb_table_name)
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
     yield ddb_table
 
 # Function
 @pytest.fixture()
 def mock_fn(
     mocked_aws,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
     mocker: MockerFixture,
 ) -> Generator[ModuleType, None, None]:
     '''Patch the environment variables for the function'''
@@ -143,6 +145,10 @@ def mock_fn(
         'src.handlers.DeleteThingItem.function.DDB_TABLE',
         mock_ddb_table_client
     )
+    mocker.patch(
+        'src.handlers.DeleteThingItem.function.THING_CACHE',
+        LruTtlCache(capacity=16, ttl=60)
+    )
     yield fn
 
 
@@ -168,7 +174,7 @@ def test_handler(
     mocked_aws,
     mock_expected_output: Output,
     mock_expected_response: ResponseBody,
-    mock_ddb_table_client: Table
+    mock_ddb_table_client: DdbTable
 ):
     '''Test calling handler'''
     # Create item to delete
@@ -194,7 +200,7 @@ def test_handler(
 
 def test__delete_item(
     mock_fn: ModuleType,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test delete item'''
 
@@ -207,21 +213,23 @@ def test__delete_item(
         }
     )
     item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_fn.THING_CACHE.set(item_keys.pk, {'id': '1234'})
     mock_fn._delete_item(item_keys)
 
     # Check item was deleted
     item = mock_ddb_table_client.get_item(Key=asdict(item_keys))
     assert item.get('Item') is None
+    assert mock_fn.THING_CACHE.get(item_keys.pk) is None
 
 
 def test__delete_item_fails_when_not_present(
     mock_fn: ModuleType,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test delete item'''
     item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
 
     with pytest.raises(
-        mock_ddb_table_client.meta.client.exceptions.ConditionalCheckFailedException
+        mock_ddb_table_client.client.exceptions.ConditionalCheckFailedException
     ):
         mock_fn._delete_item(item_keys)
@@ -1,6 +1,8 @@
 '''Test GetThingItem'''
 
+import base64
 from dataclasses import asdict
+import gzip
 import json
 import jsonschema
 import os
@@ -12,12 +14,17 @@ from pytest_mock import MockerFixture
 
 import boto3
 from moto import mock_aws
-from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource, Table
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
-from common.model.thing import ThingData, ThingItemKeys, get_keys_from_id, get_id_from_keys
+from common.model.thing import ThingData, ThingItem, ThingItemKeys, content_hash, get_keys_from_id, get_id_from_keys
 from common.test.aws import create_lambda_function_context
+from common.util.blobstore import LocalBlobStore
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
+from common.util import deadline
+from common.util.overflow import to_storage_item
 
 from src.handlers.GetThingItem.function import Output, ResponseBody, ErrorResponseBody
 
@@ -45,7 +52,7 @@ def mock_context(function_name=FN_NAME):
 def mock_data(data=DATA) -> ThingData:
     '''Return function event data'''
     with open(data) as f:
-        return ThingData(**json.load(f))
+        return ThingData.from_dict(json.load(f))
 
 @pytest.fixture()
 def data_schema(data_schema=DATA_SCHEMA):
@@ -109,7 +116,7 @@ def mocked_aws(aws_credentials):
         yield
 
 @pytest.fixture()
-def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
     '''Return the DDB table client'''
     ddb_table_name = 'MockDdbTable'
     ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
@@ -140,14 +147,14 @@ def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
             'WriteCapacityUnits': 5
         }
     )
-    ddb_table = ddb_resource.Table(ddb_table_name)
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
     yield ddb_table
 
 # Function
 @pytest.fixture()
 def mock_fn(
     mocked_aws,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
     mocker: MockerFixture,
 ) -> Generator[ModuleType, None, None]:
     '''Patch the environment variables for the function'''
@@ -157,13 +164,17 @@ def mock_fn(
         'src.handlers.GetThingItem.function.DDB_TABLE',
         mock_ddb_table_client
     )
+    mocker.patch(
+        'src.handlers.GetThingItem.function.THING_CACHE',
+        LruTtlCache(capacity=16, ttl=60)
+    )
     yield fn
 
 
 ### Data validation
 def test_validate_data(mock_data, data_schema):
     '''Test data against schema'''
-    jsonschema.Draft7Validator(asdict(mock_data), data_schema)
+    jsonschema.Draft7Validator(mock_data.to_public(), data_schema)
 
 def test_validate_event(mock_event, event_schema):
     '''Test event against schema'''
@@ -178,6 +189,12 @@ def test_validate_expected_response(mock_expected_response, expected_response_sc
     jsonschema.Draft7Validator(asdict(mock_expected_response), expected_response_schema)
 
 
+def _set_accept_encoding(event: APIGatewayProxyEvent, accept_encoding: str) -> None:
+    '''Replace the event's Accept-Encoding header'''
+    event._data['headers']['Accept-Encoding'] = accept_encoding
+    event._data['multiValueHeaders']['Accept-Encoding'] = [accept_encoding]
+
+
 ### Tests
 def test_handler(
     mock_fn: ModuleType,
@@ -187,7 +204,7 @@ def test_handler(
     mock_data: ThingData,
     mock_expected_output: Output,
     mock_expected_response: ResponseBody,
-    mock_ddb_table_client: Table
+    mock_ddb_table_client: DdbTable
 ):
     '''Test calling handler'''
     # Create item to get
@@ -233,21 +250,39 @@ def test_handler_fails_when_non_existing(
     assert response_obj.error == 'ThingNotfound'
 
 
+
+def test_handler_fails_fast_without_time_left(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_ddb_table_client: DdbTable
+):
+    '''Test a read there is no time left for is answered 503 with Retry-After'''
+    deadline.register(mock_ddb_table_client.client)
+    context = create_lambda_function_context(FN_NAME, remaining_time_in_millis=deadline.RESERVE_MS)
+
+    output_obj = Output(**mock_fn.handler(mock_event, context))
+
+    assert output_obj.statusCode == 503
+    assert output_obj.headers['Retry-After'] == str(deadline.RETRY_AFTER_SECONDS)
+    response_obj = ErrorResponseBody(**json.loads(output_obj.body))
+    assert response_obj.error == 'DeadlineExceeded'
+
 def test__get_item(
     mock_fn: ModuleType,
     mock_data: ThingData,
-    mock_ddb_table_client: Table
+    mock_ddb_table_client: DdbTable
 ):
     '''Test get item'''
     item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
     mock_item = {
         **asdict(item_keys),
-        **asdict(mock_data),
+        **mock_data.to_public(),
     }
     mock_ddb_table_client.put_item(Item=mock_item)
 
     item = mock_fn._get_item(item_keys)
-    assert item == mock_data
+    assert json.loads(item.body) == mock_data.to_public()
+    assert item.etag == content_hash(mock_data.to_public())
 
 
 def test__get_item_when_non_existing(
@@ -257,3 +292,150 @@ def test__get_item_when_non_existing(
     item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
     item = mock_fn._get_item(item_keys)
     assert item == None
+
+
+def test__get_item_reads_through_cache(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test repeat gets are served from the cache'''
+    item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_ddb_table_client.put_item(Item={**asdict(item_keys), **mock_data.to_public()})
+    spy = mocker.spy(mock_fn.DDB_TABLE, 'get_item')
+
+    body = mock_fn._get_item(item_keys)
+    assert json.loads(body.body) == mock_data.to_public()
+    assert mock_fn._get_item(item_keys) is body
+
+    assert spy.call_count == 1
+    assert mock_fn.THING_CACHE.stats.hits == 1
+    assert mock_fn.THING_CACHE.stats.misses == 1
+
+
+def test_handler_returns_etag(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable
+):
+    '''Test the ETag stored on write is returned'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'name': 'thing'}))
+    mock_ddb_table_client.put_item(Item=item.to_item())
+
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 200
+    assert output_obj.headers['ETag'] == '"{}"'.format(item.etag)
+
+
+def test_handler_returns_304_when_etag_matches(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test a matching If-None-Match is answered from a projection read'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'name': 'thing'}))
+    mock_ddb_table_client.put_item(Item=item.to_item())
+    spy = mocker.spy(mock_fn.DDB_TABLE, 'get_item')
+
+    mock_event._data['headers']['If-None-Match'] = 'W/"{}"'.format(item.etag)
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 304
+    assert output_obj.body == ''
+    assert spy.call_count == 1
+    assert spy.call_args.kwargs['ProjectionExpression'] == 'pk, sk, etag'
+
+
+def test_handler_returns_200_when_etag_differs(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test a stale If-None-Match gets the current Thing'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'name': 'thing'}))
+    mock_ddb_table_client.put_item(Item=item.to_item())
+
+    mock_event._data['headers']['If-None-Match'] = '"stale"'
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 200
+    assert json.loads(output_obj.body) == item.to_public()
+
+
+def test_handler_reads_compressed_things(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable
+):
+    '''Test Things stored with a compressed payload are returned whole'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'description': 'lorem ipsum ' * 200}))
+    mock_ddb_table_client.put_item(Item=item.to_item(compression_threshold=1024))
+
+    _set_accept_encoding(mock_event, 'identity')
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 200
+    assert json.loads(output_obj.body) == item.to_public()
+
+
+def test_handler_reads_offloaded_things(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test Things offloaded to the blob store are streamed back and not cached'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'description': 'lorem ipsum ' * 200}))
+    ddb_item = to_storage_item(item)
+    assert 'blob' in ddb_item
+    mock_ddb_table_client.put_item(Item=ddb_item)
+
+    _set_accept_encoding(mock_event, 'identity')
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 200
+    assert output_obj.headers['ETag'] == '"{}"'.format(item.etag)
+    assert json.loads(output_obj.body) == item.to_public()
+    assert len(mock_fn.THING_CACHE) == 0
+
+
+def test_handler_compresses_large_things(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable
+):
+    '''Test large Things are gzipped for clients that accept it'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    item = ThingItem.from_data(keys, ThingData(get_id_from_keys(keys), {'description': 'lorem ipsum ' * 200}))
+    mock_ddb_table_client.put_item(Item=item.to_item())
+
+    _set_accept_encoding(mock_event, 'gzip, deflate')
+    output = mock_fn.handler(mock_event, mock_context)
+
+    assert output['isBase64Encoded'] is True
+    assert output['headers']['Content-Encoding'] == 'gzip'
+    assert output['headers']['ETag'] == 'W/"{}"'.format(item.etag)
+    assert json.loads(gzip.decompress(base64.b64decode(output['body']))) == item.to_public()
+
+    mock_event._data['headers']['If-None-Match'] = output['headers']['ETag']
+    assert mock_fn.handler(mock_event, mock_context)['statusCode'] == 304
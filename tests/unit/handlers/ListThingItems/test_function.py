@@ -0,0 +1,341 @@
+'''Test ListThingItems'''
+
+from dataclasses import asdict
+import json
+import jsonschema
+import os
+from types import ModuleType
+from typing import Any, cast, Dict, Generator, List, Tuple
+
+import pytest
+from pytest_mock import MockerFixture
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import COLLECTION_INDEX_NAME, ThingData, ThingItem, get_keys_from_id
+from common.test.aws import create_lambda_function_context
+from common.util.ddb import DdbTable
+
+from src.handlers.ListThingItems.function import Output, ResponseBody, ErrorResponseBody
+
+FN_NAME = 'ListThingItems'
+DATA_DIR = './data'
+FUNC_DATA_DIR = os.path.join(DATA_DIR, 'handlers', FN_NAME)
+EVENT = os.path.join(FUNC_DATA_DIR, 'event.json')
+EVENT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'event.schema.json')
+DATA = os.path.join(FUNC_DATA_DIR, 'data.json')
+DATA_SCHEMA = os.path.join(FUNC_DATA_DIR, 'data.schema.json')
+OUTPUT = os.path.join(FUNC_DATA_DIR, 'output.json')
+OUTPUT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'output.schema.json')
+RESPONSE = os.path.join(FUNC_DATA_DIR, 'response.json')
+RESPONSE_SCHEMA = os.path.join(FUNC_DATA_DIR, 'response.schema.json')
+
+
+def _response_body(body: dict) -> ResponseBody:
+    '''Build a ResponseBody from a decoded response'''
+    return ResponseBody(
+        items=body['items'],
+        cursor=body['cursor']
+    )
+
+
+### Fixtures
+@pytest.fixture()
+def mock_context(function_name=FN_NAME):
+    '''context object'''
+    return create_lambda_function_context(function_name)
+
+# Data
+@pytest.fixture()
+def mock_data(data=DATA) -> List[ThingData]:
+    '''Return function event data'''
+    with open(data) as f:
+        return [ThingData.from_dict(d) for d in json.load(f)['items']]
+
+@pytest.fixture()
+def data_schema(data_schema=DATA_SCHEMA):
+    '''Return a data schema'''
+    with open(data_schema) as f:
+        return json.load(f)
+# Event
+@pytest.fixture()
+def mock_event(e=EVENT) -> APIGatewayProxyEvent:
+    '''Return a function event'''
+    with open(e) as f:
+        return APIGatewayProxyEvent(json.load(f))
+
+@pytest.fixture()
+def event_schema(schema=EVENT_SCHEMA):
+    '''Return an event schema'''
+    with open(schema) as f:
+        return json.load(f)
+
+# Output
+@pytest.fixture()
+def mock_expected_output(output=OUTPUT) -> Output:
+    '''Return a function output'''
+    with open(output) as f:
+        return Output(**json.load(f))
+
+@pytest.fixture()
+def expected_output_schema(output_schema=OUTPUT_SCHEMA):
+    '''Return an output schema'''
+    with open(output_schema) as f:
+        return json.load(f)
+
+# Response
+@pytest.fixture()
+def mock_expected_response(response=RESPONSE) -> ResponseBody:
+    '''Return response'''
+    with open(response) as f:
+        return _response_body(json.load(f))
+
+@pytest.fixture()
+def expected_response_schema(response_schema=RESPONSE_SCHEMA):
+    '''Return an output schema'''
+    with open(response_schema) as f:
+        return json.load(f)
+
+
+# AWS Clients
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'pk',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'sk',
+                'KeyType': 'RANGE'
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'pk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'sk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'collection',
+                'AttributeType': 'S'
+            }
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': COLLECTION_INDEX_NAME,
+                'KeySchema': [
+                    {
+                        'AttributeName': 'collection',
+                        'KeyType': 'HASH'
+                    },
+                    {
+                        'AttributeName': 'sk',
+                        'KeyType': 'RANGE'
+                    }
+                ],
+                'Projection': {
+                    'ProjectionType': 'ALL'
+                },
+                'ProvisionedThroughput': {
+                    'ReadCapacityUnits': 5,
+                    'WriteCapacityUnits': 5
+                }
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+    yield ddb_table
+
+# Function
+@pytest.fixture()
+def mock_fn(
+    mocked_aws,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+) -> Generator[ModuleType, None, None]:
+    '''Patch the environment variables for the function'''
+    import src.handlers.ListThingItems.function as fn
+
+    mocker.patch(
+        'src.handlers.ListThingItems.function.DDB_TABLE',
+        mock_ddb_table_client
+    )
+    mocker.patch(
+        'src.handlers.ListThingItems.function.CURSOR_SIGNING_KEY',
+        b'testing'
+    )
+    yield fn
+
+
+def _put_things(table: DdbTable, things: List[ThingData]) -> None:
+    '''Insert Things into the table'''
+    for data in things:
+        keys = get_keys_from_id(data.id)
+        table.put_item(Item=ThingItem.from_data(keys, data).to_item())
+
+
+### Data validation
+def test_validate_data(mock_data, data_schema):
+    '''Test data against schema'''
+    jsonschema.Draft7Validator({'items': [d.to_public() for d in mock_data]}, data_schema)
+
+def test_validate_event(mock_event, event_schema):
+    '''Test event against schema'''
+    jsonschema.Draft7Validator(mock_event._data, event_schema)
+
+def test_validate_expected_data(mock_expected_output, expected_output_schema):
+    '''Test output against schema'''
+    jsonschema.Draft7Validator(asdict(mock_expected_output), expected_output_schema)
+
+def test_validate_expected_response(mock_expected_response, expected_response_schema):
+    '''Test response against schema'''
+    jsonschema.Draft7Validator(asdict(mock_expected_response), expected_response_schema)
+
+
+### Tests
+def test_handler(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+    mock_data: List[ThingData],
+    mock_expected_output: Output,
+    mock_expected_response: ResponseBody,
+    mock_ddb_table_client: DdbTable
+):
+    '''Test calling handler'''
+    _put_things(mock_ddb_table_client, mock_data)
+
+    output = mock_fn.handler(mock_event, mock_context)
+
+    output_obj = Output(**output)
+    assert output_obj.statusCode == mock_expected_output.statusCode
+
+    response_obj = _response_body(json.loads(output_obj.body))
+    assert response_obj.items == mock_expected_response.items
+    assert response_obj.cursor is not None
+
+
+def test_handler_pages_through_collection(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+    mock_data: List[ThingData],
+    mock_ddb_table_client: DdbTable
+):
+    '''Test following cursors returns every Thing exactly once'''
+    _put_things(mock_ddb_table_client, mock_data)
+    # Items outside the collection are not listed
+    mock_ddb_table_client.put_item(Item={'pk': 'other#1', 'sk': 'other#1'})
+
+    seen: List[Dict[str, Any]] = []
+    cursor = None
+    while True:
+        mock_event._data['queryStringParameters'] = {'limit': '2'}
+        if cursor:
+            mock_event._data['queryStringParameters']['cursor'] = cursor
+        output = Output(**mock_fn.handler(mock_event, mock_context))
+        assert output.statusCode == 200
+
+        response_obj = _response_body(json.loads(output.body))
+        seen.extend(response_obj.items)
+        cursor = response_obj.cursor
+        if cursor is None:
+            break
+
+    assert seen == [d.to_public() for d in mock_data]
+
+
+def test_handler_fails_with_tampered_cursor(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+):
+    '''Test cursors not signed by the function are rejected'''
+    cursor = mock_fn.encode_cursor({'pk': 'thing#1', 'sk': 'thing#1', 'collection': 'thing'}, b'other')
+    mock_event._data['queryStringParameters'] = {'cursor': cursor}
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 400
+    assert ErrorResponseBody(**json.loads(output.body)).message == 'Invalid cursor'
+
+
+
+def test_handler_fails_closed_without_signing_key(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocker: MockerFixture,
+):
+    '''Test nothing is listed and no cursor accepted when the signing key is not set'''
+    mocker.patch.object(mock_fn, 'CURSOR_SIGNING_KEY', b'')
+    spy = mocker.spy(mock_fn.DDB_TABLE, 'query')
+    with pytest.raises(ValueError):
+        mock_fn.encode_cursor({'pk': 'thing#1'}, b'')
+    mock_event._data['queryStringParameters'] = {'cursor': 'e30.'}
+
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 500
+    spy.assert_not_called()
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', '101'])
+def test_handler_fails_with_invalid_limit(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+    limit: str,
+):
+    '''Test out of range limits are rejected'''
+    mock_event._data['queryStringParameters'] = {'limit': limit}
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 400
+
+
+def test__list_items(
+    mock_fn: ModuleType,
+    mock_data: List[ThingData],
+    mock_ddb_table_client: DdbTable
+):
+    '''Test list items'''
+    _put_things(mock_ddb_table_client, mock_data)
+
+    items, last_evaluated_key = mock_fn._list_items(10)
+    assert items == [d.to_public() for d in mock_data]
+    assert last_evaluated_key is None
@@ -0,0 +1,468 @@
+'''Test PatchThingItem'''
+
+from dataclasses import asdict
+import json
+import jsonschema
+import os
+from types import ModuleType
+from typing import Any, cast, Dict, Generator, Tuple
+
+import pytest
+from pytest_mock import MockerFixture
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from common.model.thing import ThingData, ThingItem, get_keys_from_id
+from common.test.aws import create_lambda_function_context
+from common.util.blobstore import BlobNotFoundError, LocalBlobStore
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
+from common.util.deadline import DeadlineExceeded
+from common.util.overflow import resolve, to_storage_item
+
+from src.handlers.PatchThingItem.function import Output, ErrorResponseBody
+
+FN_NAME = 'PatchThingItem'
+DATA_DIR = './data'
+FUNC_DATA_DIR = os.path.join(DATA_DIR, 'handlers', FN_NAME)
+EVENT = os.path.join(FUNC_DATA_DIR, 'event.json')
+EVENT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'event.schema.json')
+DATA = os.path.join(FUNC_DATA_DIR, 'data.json')
+DATA_SCHEMA = os.path.join(FUNC_DATA_DIR, 'data.schema.json')
+OUTPUT = os.path.join(FUNC_DATA_DIR, 'output.json')
+OUTPUT_SCHEMA = os.path.join(FUNC_DATA_DIR, 'output.schema.json')
+RESPONSE = os.path.join(FUNC_DATA_DIR, 'response.json')
+RESPONSE_SCHEMA = os.path.join(FUNC_DATA_DIR, 'response.schema.json')
+
+
+### Fixtures
+@pytest.fixture()
+def mock_context(function_name=FN_NAME):
+    '''context object'''
+    return create_lambda_function_context(function_name)
+
+# Data
+@pytest.fixture()
+def mock_data(data=DATA) -> Dict[str, Any]:
+    '''Return function event data'''
+    with open(data) as f:
+        return json.load(f)
+
+@pytest.fixture()
+def data_schema(data_schema=DATA_SCHEMA):
+    '''Return a data schema'''
+    with open(data_schema) as f:
+        return json.load(f)
+# Event
+@pytest.fixture()
+def mock_event(e=EVENT) -> APIGatewayProxyEvent:
+    '''Return a function event'''
+    with open(e) as f:
+        return APIGatewayProxyEvent(json.load(f))
+
+@pytest.fixture()
+def event_schema(schema=EVENT_SCHEMA):
+    '''Return an event schema'''
+    with open(schema) as f:
+        return json.load(f)
+
+# Output
+@pytest.fixture()
+def mock_expected_output(output=OUTPUT) -> Output:
+    '''Return a function output'''
+    with open(output) as f:
+        return Output(**json.load(f))
+
+@pytest.fixture()
+def expected_output_schema(output_schema=OUTPUT_SCHEMA):
+    '''Return an output schema'''
+    with open(output_schema) as f:
+        return json.load(f)
+
+# Response
+@pytest.fixture()
+def mock_expected_response(response=RESPONSE) -> Dict[str, Any]:
+    '''Return response'''
+    with open(response) as f:
+        return json.load(f)
+
+@pytest.fixture()
+def expected_response_schema(response_schema=RESPONSE_SCHEMA):
+    '''Return an output schema'''
+    with open(response_schema) as f:
+        return json.load(f)
+
+
+# AWS Clients
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {
+                'AttributeName': 'pk',
+                'KeyType': 'HASH'
+            },
+            {
+                'AttributeName': 'sk',
+                'KeyType': 'RANGE'
+            }
+        ],
+        AttributeDefinitions=[
+            {
+                'AttributeName': 'pk',
+                'AttributeType': 'S'
+            },
+            {
+                'AttributeName': 'sk',
+                'AttributeType': 'S'
+            }
+        ],
+        ProvisionedThroughput={
+            'ReadCapacityUnits': 5,
+            'WriteCapacityUnits': 5
+        }
+    )
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+    yield ddb_table
+
+# Function
+@pytest.fixture()
+def mock_fn(
+    mocked_aws,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+) -> Generator[ModuleType, None, None]:
+    '''Patch the environment variables for the function'''
+    import src.handlers.PatchThingItem.function as fn
+
+    mocker.patch(
+        'src.handlers.PatchThingItem.function.DDB_TABLE',
+        mock_ddb_table_client
+    )
+    mocker.patch(
+        'src.handlers.PatchThingItem.function.THING_CACHE',
+        LruTtlCache(capacity=16, ttl=60)
+    )
+    yield fn
+
+
+### Data validation
+def test_validate_data(mock_data, data_schema):
+    '''Test data against schema'''
+    jsonschema.Draft7Validator(mock_data, data_schema)
+
+def test_validate_event(mock_event, event_schema):
+    '''Test event against schema'''
+    jsonschema.Draft7Validator(mock_event._data, event_schema)
+
+def test_validate_expected_data(mock_expected_output, expected_output_schema):
+    '''Test output against schema'''
+    jsonschema.Draft7Validator(asdict(mock_expected_output), expected_output_schema)
+
+def test_validate_expected_response(mock_expected_response, expected_response_schema):
+    '''Test response against schema'''
+    jsonschema.Draft7Validator(mock_expected_response, expected_response_schema)
+
+
+def _put_thing(table: DdbTable, _id: str, extra: Dict[str, Any]) -> ThingItem:
+    '''Insert a Thing into the table'''
+    item = ThingItem.from_data(get_keys_from_id(_id), ThingData(_id, extra))
+    table.put_item(Item=item.to_item())
+    return item
+
+
+### Tests
+def test_handler(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mocked_aws,
+    mock_data: Dict[str, Any],
+    mock_expected_output: Output,
+    mock_expected_response: Dict[str, Any],
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test calling handler'''
+    _id = mock_event.path_parameters.get('id')
+    item = _put_thing(mock_ddb_table_client, _id, {'name': 'original', 'color': 'red', 'size': 10})
+
+    mock_event._data['body'] = json.dumps(mock_data)
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == mock_expected_output.statusCode
+    assert json.loads(output_obj.body) == mock_expected_response
+
+    stored = mock_ddb_table_client.get_item(Key=get_keys_from_id(_id).to_item())['Item']
+    assert stored['name'] == 'patched'
+    assert stored['size'] == 10
+    assert 'color' not in stored
+    assert stored['etag'] != item.etag
+    assert output_obj.headers['ETag'] == '"{}"'.format(stored['etag'])
+
+
+def test_handler_fails_when_item_does_not_exist(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: Dict[str, Any],
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test patching a missing Thing returns 404'''
+    mock_event._data['body'] = json.dumps(mock_data)
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 404
+    assert ErrorResponseBody(**json.loads(output_obj.body)).error == 'ThingNotfound'
+
+
+@pytest.mark.parametrize(
+    'patch',
+    [
+        [],
+        {},
+        {'id': '1234'},
+        {'id': 'other', 'name': 'patched'},
+        {'pk': 'thing#other'},
+        {'etag': 'forged'},
+        {'_ttl': 1600000000},
+    ]
+)
+def test_handler_rejects_invalid_patches(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable,
+    patch: Any,
+):
+    '''Test patches that cannot be applied are rejected'''
+    _put_thing(mock_ddb_table_client, '1234', {'name': 'original'})
+
+    mock_event._data['body'] = json.dumps(patch)
+    output_obj = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output_obj.statusCode == 400
+
+
+def test__patch_item_returns_changed_attributes(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test only the changed attributes are returned'''
+    _put_thing(mock_ddb_table_client, '1234', {'name': 'original', 'color': 'red', 'size': 10})
+
+    changed = mock_fn._patch_item(get_keys_from_id('1234'), {'size': 11, 'color': None})
+
+    assert set(changed) == {'size', 'color', 'etag'}
+    assert changed['size'] == 11
+    assert changed['color'] is None
+
+
+def test__patch_item_invalidates_cache(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test patch drops the cached Thing'''
+    _put_thing(mock_ddb_table_client, '1234', {'name': 'original'})
+    keys = get_keys_from_id('1234')
+    mock_fn.THING_CACHE.set(keys.pk, 'stale')
+
+    mock_fn._patch_item(keys, {'name': 'patched'})
+
+    assert mock_fn.THING_CACHE.get(keys.pk) is None
+
+
+
+def test__patch_item_merges_nested_objects(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test a nested null removes only that key and sibling keys are kept'''
+    _put_thing(mock_ddb_table_client, '1234', {'attrs': {'a': 1, 'b': 2, 'inner': {'x': 1, 'y': 2}}, 'name': 'original'})
+    keys = get_keys_from_id('1234')
+    rewrite = mocker.spy(mock_fn, '_rewrite_item')
+
+    changed = mock_fn._patch_item(keys, {'attrs': {'b': None, 'c': 3, 'inner': {'x': None}}})
+
+    expected = {'a': 1, 'c': 3, 'inner': {'y': 2}}
+    assert changed['attrs'] == expected
+    assert set(changed) == {'attrs', 'etag'}
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.extra == {'attrs': expected, 'name': 'original'}
+    assert stored.etag == changed['etag']
+    rewrite.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    'extra',
+    [
+        {'name': 'original'},
+        {'name': 'original', 'attrs': 'not an object'},
+    ]
+)
+def test__patch_item_merges_objects_into_missing_maps(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    extra: Dict[str, Any],
+):
+    '''Test an object merged into a missing or non object attribute replaces it, without its nulls'''
+    _put_thing(mock_ddb_table_client, '1234', extra)
+    keys = get_keys_from_id('1234')
+    rewrite = mocker.spy(mock_fn, '_rewrite_item')
+
+    changed = mock_fn._patch_item(keys, {'attrs': {'a': 1, 'b': None}})
+
+    assert changed['attrs'] == {'a': 1}
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.extra == {'name': 'original', 'attrs': {'a': 1}}
+    rewrite.assert_called_once()
+
+def test__patch_item_rewrites_compressed_things(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test patches to Things stored with a compressed payload are applied'''
+    keys = get_keys_from_id('1234')
+    item = ThingItem.from_data(keys, ThingData('1234', {'description': 'lorem ipsum ' * 200, 'color': 'red'}))
+    mock_ddb_table_client.put_item(Item=item.to_item(compression_threshold=1024))
+
+    changed = mock_fn._patch_item(keys, {'color': None, 'size': 11})
+
+    assert changed['color'] is None
+    assert changed['size'] == 11
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.extra == {'description': 'lorem ipsum ' * 200, 'size': 11}
+    assert stored.etag == changed['etag']
+
+
+def test__patch_item_rewrites_offloaded_things(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test patches to offloaded Things are applied and the old blob is deleted'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+
+    keys = get_keys_from_id('1234')
+    item = ThingItem.from_data(keys, ThingData('1234', {'description': 'lorem ipsum ' * 200, 'color': 'red'}))
+    old_item = to_storage_item(item)
+    mock_ddb_table_client.put_item(Item=old_item)
+
+    changed = mock_fn._patch_item(keys, {'color': None})
+
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.blob is not None and stored.blob != old_item['blob']
+    assert stored.etag == changed['etag']
+    assert resolve(stored).extra == {'description': 'lorem ipsum ' * 200}
+    with pytest.raises(BlobNotFoundError):
+        list(store.stream(old_item['blob']))
+
+
+def _change_before_first_put(mocker: MockerFixture, table: DdbTable, item: ThingItem):
+    '''Store item just before the first put_item on table, as a concurrent patch would'''
+    put_item = table.put_item
+    calls = []
+
+    def put_after_change(**kwargs):
+        if not calls:
+            put_item(Item=item.to_item(compression_threshold=1024))
+        calls.append(kwargs)
+        return put_item(**kwargs)
+
+    mocker.patch.object(table, 'put_item', side_effect=put_after_change)
+    return calls
+
+
+def test__patch_item_rewrite_keeps_concurrent_changes(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test a Thing changed between the read and the put of a rewrite is patched again, losing neither change'''
+    keys = get_keys_from_id('1234')
+    item = ThingItem.from_data(keys, ThingData('1234', {'description': 'lorem ipsum ' * 200, 'color': 'red'}))
+    mock_ddb_table_client.put_item(Item=item.to_item(compression_threshold=1024))
+    concurrent = ThingItem(keys.pk, keys.sk, '1234', item.collection, 'concurrent', {**item.extra, 'size': 11})
+    calls = _change_before_first_put(mocker, mock_ddb_table_client, concurrent)
+
+    changed = mock_fn._patch_item(keys, {'color': 'blue'})
+
+    assert len(calls) == 2
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.extra == {'description': 'lorem ipsum ' * 200, 'color': 'blue', 'size': 11}
+    assert stored.etag == changed['etag']
+
+
+def test_handler_answers_conflict_when_rewrites_keep_failing(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+):
+    '''Test a rewrite whose Thing changes on every attempt answers 409 without overwriting the change'''
+    mocker.patch.object(mock_fn, 'MAX_REWRITE_ATTEMPTS', 1)
+    _id = mock_event.path_parameters.get('id')
+    keys = get_keys_from_id(_id)
+    item = ThingItem.from_data(keys, ThingData(_id, {'description': 'lorem ipsum ' * 200, 'color': 'red'}))
+    mock_ddb_table_client.put_item(Item=item.to_item(compression_threshold=1024))
+    concurrent = ThingItem(keys.pk, keys.sk, _id, item.collection, 'concurrent', {**item.extra, 'size': 11})
+    _change_before_first_put(mocker, mock_ddb_table_client, concurrent)
+    mock_event._data['body'] = json.dumps({'color': 'blue'})
+
+    output = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert output.statusCode == 409
+    assert json.loads(output.body)['error'] == 'Conflict'
+    stored = ThingItem.from_item(mock_ddb_table_client.get_item(Key=keys.to_item())['Item'])
+    assert stored.extra == concurrent.extra
+
+
+def test__patch_item_discards_blob_when_rewrite_fails(
+    mock_fn: ModuleType,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test a rewrite whose put fails deletes the blob offloaded for it and keeps the old one'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+
+    keys = get_keys_from_id('1234')
+    item = ThingItem.from_data(keys, ThingData('1234', {'description': 'lorem ipsum ' * 200, 'color': 'red'}))
+    old_item = to_storage_item(item)
+    mock_ddb_table_client.put_item(Item=old_item)
+    mocker.patch.object(mock_ddb_table_client, 'put_item', side_effect=DeadlineExceeded('0ms left'))
+
+    with pytest.raises(DeadlineExceeded):
+        mock_fn._patch_item(keys, {'color': None})
+
+    assert os.listdir(os.path.join(tmp_path, '1234')) == [os.path.basename(old_item['blob'])]
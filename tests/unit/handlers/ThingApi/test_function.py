@@ -0,0 +1,157 @@
+'''Test ThingApi'''
+
+import json
+import os
+from types import ModuleType
+from typing import Any, Dict, Generator
+
+import pytest
+from pytest_mock import MockerFixture
+
+import boto3
+from moto import mock_aws
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
+
+from common.test.aws import create_lambda_function_context
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
+
+from src.handlers.ThingApi.function import ROUTES
+
+FN_NAME = 'ThingApi'
+DATA_DIR = './data'
+HANDLERS_DATA_DIR = os.path.join(DATA_DIR, 'handlers')
+
+
+### Fixtures
+@pytest.fixture()
+def mock_context(function_name=FN_NAME):
+    '''context object'''
+    return create_lambda_function_context(function_name)
+
+
+def _load_event(fn_name: str) -> Dict[str, Any]:
+    '''Return a route handler's test event'''
+    with open(os.path.join(HANDLERS_DATA_DIR, fn_name, 'event.json')) as f:
+        return json.load(f)
+
+
+# AWS Clients
+@pytest.fixture()
+def aws_credentials() -> None:
+    '''Mocked AWS Credentials for moto.'''
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SECURITY_TOKEN"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+@pytest.fixture()
+def mocked_aws(aws_credentials):
+    '''Mock all AWS interactions'''
+    with mock_aws():
+        yield
+
+@pytest.fixture()
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable, None, None]:
+    '''Return the DDB table client'''
+    ddb_table_name = 'MockDdbTable'
+    ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
+    ddb_resource.create_table(
+        TableName=ddb_table_name,
+        KeySchema=[
+            {'AttributeName': 'pk', 'KeyType': 'HASH'},
+            {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'pk', 'AttributeType': 'S'},
+            {'AttributeName': 'sk', 'AttributeType': 'S'}
+        ],
+        ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+    )
+    yield DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
+
+# Function
+@pytest.fixture()
+def mock_fn(
+    mocked_aws,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+) -> Generator[ModuleType, None, None]:
+    '''Patch the table and cache of the item routes behind the router'''
+    import src.handlers.ThingApi.function as fn
+
+    cache: LruTtlCache = LruTtlCache(capacity=16, ttl=60)
+    for name in ('CreateThingItem', 'GetThingItem', 'UpsertThingItem', 'DeleteThingItem'):
+        module = fn._load_handler(name)
+        mocker.patch.object(module, 'DDB_TABLE', mock_ddb_table_client)
+        if hasattr(module, 'THING_CACHE'):
+            mocker.patch.object(module, 'THING_CACHE', cache)
+    yield fn
+
+
+### Tests
+@pytest.mark.parametrize('fn_name', sorted(set(ROUTES.values())))
+def test_handler_routes_events(mocker: MockerFixture, mock_context, fn_name: str):
+    '''Test every handler's event is dispatched to that handler'''
+    import src.handlers.ThingApi.function as fn
+
+    route_module = mocker.Mock()
+    route_module.handler.return_value = {'statusCode': 200, 'body': ''}
+    load_handler = mocker.patch.object(fn, '_load_handler', return_value=route_module)
+    event = _load_event(fn_name)
+
+    assert fn.handler(event, mock_context) == {'statusCode': 200, 'body': ''}
+    load_handler.assert_called_once_with(fn_name)
+    route_module.handler.assert_called_once_with(event, mock_context)
+
+
+def test_handler_imports_route_handlers(mock_context):
+    '''Test route handler packages resolve from the router's package'''
+    import src.handlers.ThingApi.function as fn
+    import src.handlers.GetThingItem.function as get_fn
+
+    assert fn._load_handler('GetThingItem') is get_fn
+
+
+@pytest.mark.parametrize(
+    'method,resource,status_code',
+    [
+        ('GET', '/v1/other', 404),
+        ('POST', '/v1/thing/{id}', 405),
+    ]
+)
+def test_handler_rejects_unknown_routes(mock_context, method: str, resource: str, status_code: int):
+    '''Test requests without a route are answered by the router'''
+    import src.handlers.ThingApi.function as fn
+
+    event = {**_load_event('GetThingItem'), 'httpMethod': method, 'resource': resource}
+    output = fn.handler(event, mock_context)
+
+    assert output['statusCode'] == status_code
+
+
+def test_handler_serves_routes_end_to_end(mock_fn: ModuleType, mock_context):
+    '''Test a Thing created through the router can be read, replaced and deleted through it'''
+    create_event = _load_event('CreateThingItem')
+    create_event['body'] = json.dumps({'name': 'thing'})
+    created = mock_fn.handler(create_event, mock_context)
+    assert created['statusCode'] == 201
+    _id = json.loads(created['body'])['id']
+
+    get_event = _load_event('GetThingItem')
+    get_event['pathParameters'] = {'id': _id}
+    got = mock_fn.handler(get_event, mock_context)
+    assert got['statusCode'] == 200
+    assert json.loads(got['body']) == {'id': _id, 'name': 'thing'}
+
+    upsert_event = _load_event('UpsertThingItem')
+    upsert_event['pathParameters'] = {'id': _id}
+    upsert_event['body'] = json.dumps({'id': _id, 'name': 'replaced'})
+    assert mock_fn.handler(upsert_event, mock_context)['statusCode'] == 201
+    assert json.loads(mock_fn.handler(get_event, mock_context)['body'])['name'] == 'replaced'
+
+    delete_event = _load_event('DeleteThingItem')
+    delete_event['pathParameters'] = {'id': _id}
+    assert mock_fn.handler(delete_event, mock_context)['statusCode'] == 200
+    assert mock_fn.handler(get_event, mock_context)['statusCode'] == 404
@@ -12,12 +12,15 @@ from pytest_mock import MockerFixture
 
 import boto3
 from moto import mock_aws
-from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource, Table
+from mypy_boto3_dynamodb.service_resource import DynamoDBServiceResource
 from aws_lambda_powertools.utilities.data_classes import APIGatewayProxyEvent
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
 from common.model.thing import ThingData, ThingItemKeys, get_keys_from_id
 from common.test.aws import create_lambda_function_context
+from common.util.blobstore import LocalBlobStore
+from common.util.cache import LruTtlCache
+from common.util.ddb import DdbTable
 
 from src.handlers.UpsertThingItem.function import Output, ResponseBody
 
@@ -45,7 +48,7 @@ def mock_context(function_name=FN_NAME):
 def mock_data(data=DATA) -> ThingData:
     '''Return function event data'''
     with open(data) as f:
-        return ThingData(**json.load(f))
+        return ThingData.from_dict(json.load(f))
 
 @pytest.fixture()
 def data_schema(data_schema=DATA_SCHEMA):
@@ -109,7 +112,7 @@ def mocked_aws(aws_credentials):
         yield
 
 @pytest.fixture()
-def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
+def mock_ddb_table_client(mocked_aws) -> Generator[DdbTable , None, None]:
     '''Return the DDB table client'''
     ddb_table_name = 'MockDdbTable'
     ddb_resource: DynamoDBServiceResource = boto3.resource('dynamodb', 'us-east-1')
@@ -140,14 +143,14 @@ def mock_ddb_table_client(mocked_aws) -> Generator[Table , None, None]:
             'WriteCapacityUnits': 5
         }
     )
-    ddb_table = ddb_resource.Table(ddb_table_name)
+    ddb_table = DdbTable(ddb_table_name, boto3.client('dynamodb', 'us-east-1'))
     yield ddb_table
 
 # Function
 @pytest.fixture()
 def mock_fn(
     mocked_aws,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
     mocker: MockerFixture,
 ) -> Generator[ModuleType, None, None]:
     '''Patch the environment variables for the function'''
@@ -157,13 +160,17 @@ def mock_fn(
         'src.handlers.UpsertThingItem.function.DDB_TABLE',
         mock_ddb_table_client
     )
+    mocker.patch(
+        'src.handlers.UpsertThingItem.function.THING_CACHE',
+        LruTtlCache(capacity=16, ttl=60)
+    )
     yield fn
 
 
 ### Data validation
 def test_validate_data(mock_data, data_schema):
     '''Test data against schema'''
-    jsonschema.Draft7Validator(asdict(mock_data), data_schema)
+    jsonschema.Draft7Validator(mock_data.to_public(), data_schema)
 
 def test_validate_event(mock_event, event_schema):
     '''Test event against schema'''
@@ -187,11 +194,11 @@ def test_handler(
     mock_data: ThingData,
     mock_expected_output: Output,
     mock_expected_response: ResponseBody,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test calling handler'''
     # Insert data into event
-    mock_event._data['body'] = json.dumps(asdict(mock_data))
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
     mock_expected_response.request_id = mock_context.aws_request_id
 
     keys = get_keys_from_id(mock_event.path_parameters.get('id'))
@@ -215,7 +222,7 @@ def test_handler(
 def test__upsert_item(
     mock_fn: ModuleType,
     mock_data: ThingData,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test upsert item'''
     # Insert data into table
@@ -234,12 +241,125 @@ def test__upsert_item(
 def test__upsert_item_fails_when_item_does_not_exist(
     mock_fn: ModuleType,
     mock_data: ThingData,
-    mock_ddb_table_client: Table,
+    mock_ddb_table_client: DdbTable,
 ):
     '''Test upsert item'''
     item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
     item_data = mock_data
     with pytest.raises(
-        mock_ddb_table_client.meta.client.exceptions.ConditionalCheckFailedException
+        mock_ddb_table_client.client.exceptions.ConditionalCheckFailedException
     ):
         mock_fn._upsert_item(item_keys, item_data)
+
+
+def test__upsert_item_invalidates_cache(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test upsert drops the cached Thing'''
+    mock_ddb_table_client.put_item(Item={'pk': '1234', 'sk': '1234'})
+    mock_fn.THING_CACHE.set('1234', {'id': 'stale'})
+
+    item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_fn._upsert_item(item_keys, mock_data)
+
+    assert mock_fn.THING_CACHE.get('1234') is None
+
+
+def test__upsert_item_skips_unchanged_data(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test an identical upsert does not write'''
+    item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_ddb_table_client.put_item(Item={'pk': '1234', 'sk': '1234'})
+
+    assert mock_fn._upsert_item(item_keys, mock_data) is True
+    mock_fn.THING_CACHE.set('1234', {'id': 'cached'})
+
+    assert mock_fn._upsert_item(item_keys, mock_data) is False
+    assert mock_fn.THING_CACHE.get('1234') == {'id': 'cached'}
+
+    changed_data = ThingData(mock_data.id, {'name': 'changed'})
+    assert mock_fn._upsert_item(item_keys, changed_data) is True
+    assert mock_ddb_table_client.get_item(Key=asdict(item_keys))['Item']['name'] == 'changed'
+
+
+def test_handler_reports_unchanged_upsert(
+    mock_fn: ModuleType,
+    mock_event: APIGatewayProxyEvent,
+    mock_context,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+):
+    '''Test re-PUTting identical data is reported as unchanged'''
+    keys = get_keys_from_id(mock_event.path_parameters.get('id'))
+    mock_ddb_table_client.put_item(Item={'pk': keys.pk, 'sk': keys.sk})
+    mock_event._data['body'] = json.dumps(mock_data.to_public())
+
+    first = Output(**mock_fn.handler(mock_event, mock_context))
+    second = Output(**mock_fn.handler(mock_event, mock_context))
+
+    assert first.statusCode == 201
+    assert json.loads(first.body)['changed'] is True
+    assert second.statusCode == 200
+    assert json.loads(second.body)['changed'] is False
+
+
+def test__upsert_item_replaces_offloaded_things(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test upserting an offloaded Thing deletes its old blob'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+
+    item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_ddb_table_client.put_item(Item={'pk': '1234', 'sk': '1234'})
+    large_data = ThingData(mock_data.id, {'description': 'lorem ipsum ' * 200})
+
+    assert mock_fn._upsert_item(item_keys, large_data) is True
+    old_blob = mock_ddb_table_client.get_item(Key=asdict(item_keys))['Item']['blob']
+    assert mock_fn._upsert_item(item_keys, large_data) is False
+    assert list(store.stream(old_blob))
+
+    assert mock_fn._upsert_item(item_keys, mock_data) is True
+    assert 'blob' not in mock_ddb_table_client.get_item(Key=asdict(item_keys))['Item']
+    assert not os.listdir(os.path.join(tmp_path, mock_data.id))
+
+
+def test__upsert_item_does_not_offload_unchanged_things(
+    mock_fn: ModuleType,
+    mock_data: ThingData,
+    mock_ddb_table_client: DdbTable,
+    mocker: MockerFixture,
+    tmp_path,
+):
+    '''Test an identical upsert of a large Thing writes no blob, and leaves none behind when raced'''
+    store = LocalBlobStore(str(tmp_path))
+    mocker.patch('common.util.overflow.get_blob_store', return_value=store)
+    put = mocker.spy(store, 'put')
+
+    item_keys = ThingItemKeys(**{'pk': '1234', 'sk': '1234'})
+    mock_ddb_table_client.put_item(Item={'pk': '1234', 'sk': '1234'})
+    large_data = ThingData(mock_data.id, {'description': 'lorem ipsum ' * 200})
+
+    # Stored inline, then large enough to offload
+    assert mock_fn._upsert_item(item_keys, large_data) is True
+    mocker.patch('common.util.overflow.OFFLOAD_THRESHOLD_BYTES', 1024)
+
+    assert mock_fn._upsert_item(item_keys, large_data) is False
+    put.assert_not_called()
+
+    # The same data written between the etag check and the put
+    mocker.patch.object(mock_fn, '_stored_etag', return_value=None)
+    assert mock_fn._upsert_item(item_keys, large_data) is False
+    put.assert_called_once()
+    assert 'blob' not in mock_ddb_table_client.get_item(Key=asdict(item_keys))['Item']
+    assert not os.listdir(os.path.join(tmp_path, mock_data.id))